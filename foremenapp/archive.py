@@ -0,0 +1,212 @@
+"""
+Archival of completed chit groups.
+
+Installments and InstallmentPayments only grow, and completed groups sit in the same
+tables and indexes that active-group queries use. Once every installment of a group is
+marked isCompleted, its installments and payments can be moved to ArchivedInstallments /
+ArchivedInstallmentPayments (same columns), so the hot tables only hold active groups.
+
+The group itself and its enrollments stay where they are. For each archived enrollment a
+row in EnrollmentSummaries keeps the totals (installments paid, amount paid, last payment,
+auctions won); Subscriber Details reads an archived group's totals from it instead of
+scanning the archive.
+
+Archived data stays readable: the read helpers in foremenapp2.py accept include_archived=True
+and then look in the archive tables for groups listed in ArchivedGroups.
+
+Archiving runs against the central MySQL database only: a branch SQLite store would push
+the moves to the central database as plain deletes (the archive tables are not synced),
+so archive_completed_groups() refuses to run on one. Branches receive the moves as deletes
+and sync.py copies ArchivedGroups to them, so is_group_archived() still stops a clerk from
+generating installments again for an archived group. Run from the foremenapp folder (uses the [mysql] section of
+.streamlit/secrets.toml):
+    python archive.py --dry-run    # list the groups that would be archived
+    python archive.py              # archive them (one transaction per group)
+    python archive.py --tenant acme  # in one tenant's database (see tenants.py)
+"""
+
+import argparse
+import datetime
+
+from mysql.connector import Error
+
+import storage
+from transactions import UnitOfWork
+
+# Hot table -> archive table with the same columns
+ARCHIVE_TABLES = {
+    "Installments": "ArchivedInstallments",
+    "InstallmentPayments": "ArchivedInstallmentPayments",
+}
+
+INSTALLMENT_COLUMNS = "id, groupId, monthNumber, dueDate, isAuctionConducted, auctionPrizeAmount, auctionWinnerId, isCompleted"
+PAYMENT_COLUMNS = "id, installmentId, subscriberId, paymentDate, amountPaid, notes"
+
+
+def installment_tables(archived):
+    """Returns the (installments, payments) table names to read from for a live or an archived group."""
+    if archived:
+        return ARCHIVE_TABLES["Installments"], ARCHIVE_TABLES["InstallmentPayments"]
+    return "Installments", "InstallmentPayments"
+
+
+def is_group_archived(cursor, group_id_bytes):
+    """Checks whether a group's installments have been moved to the archive tables."""
+    cursor.execute("SELECT 1 FROM ArchivedGroups WHERE groupId = %s", (group_id_bytes,))
+    return cursor.fetchone() is not None
+
+
+def is_installment_archived(cursor, installment_id_bytes):
+    """Checks whether an installment (and its payments) is in the archive tables."""
+    cursor.execute("SELECT 1 FROM ArchivedInstallments WHERE id = %s", (installment_id_bytes,))
+    return cursor.fetchone() is not None
+
+
+def find_archivable_groups(conn):
+    """Returns (name, id) of groups that have installments and all of them are completed."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""SELECT g.name, g.id
+                          FROM ChitGroups g
+                          JOIN Installments i ON i.groupId = g.id
+                          GROUP BY g.id, g.name
+                          HAVING MIN(i.isCompleted) = 1
+                          ORDER BY g.name""")
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def write_enrollment_summaries(cursor, group_id_bytes):
+    """Write operation: (re)builds the EnrollmentSummaries rows of an archived group from the archive tables."""
+    cursor.execute("DELETE FROM EnrollmentSummaries WHERE groupId = %s", (group_id_bytes,))
+    cursor.execute("""
+        INSERT INTO EnrollmentSummaries
+            (enrollmentId, groupId, subscriberId, assignedChitNumber, installmentsPaid, totalPaid, lastPaymentDate, auctionsWon)
+        SELECT
+            e.id,
+            e.groupId,
+            e.subscriberId,
+            e.assignedChitNumber,
+            COUNT(DISTINCT ip.installmentId),
+            COALESCE(SUM(ip.amountPaid), 0),
+            MAX(ip.paymentDate),
+            (SELECT COUNT(*) FROM ArchivedInstallments w WHERE w.groupId = e.groupId AND w.auctionWinnerId = e.subscriberId)
+        FROM Enrollments e
+        LEFT JOIN (
+            SELECT p.installmentId, p.subscriberId, p.amountPaid, p.paymentDate
+            FROM ArchivedInstallmentPayments p
+            JOIN ArchivedInstallments i ON p.installmentId = i.id
+            WHERE i.groupId = %s
+        ) ip ON ip.subscriberId = e.subscriberId
+        WHERE e.groupId = %s
+        GROUP BY e.id, e.groupId, e.subscriberId, e.assignedChitNumber""", (group_id_bytes, group_id_bytes))
+    return cursor.rowcount
+
+
+def write_archive_group(cursor, group_id_bytes):
+    """
+    Write operation: moves a completed group's installments and payments to the archive tables
+    and builds its enrollment summaries. Returns the number of payments archived, or None if the
+    group still has open installments (nothing is changed then).
+    """
+    # Re-check inside the transaction: an installment may have been reopened since the group was listed
+    cursor.execute("SELECT COUNT(*), COALESCE(MIN(isCompleted), 0) FROM Installments WHERE groupId = %s", (group_id_bytes,))
+    installment_count, all_completed = cursor.fetchone()
+    if installment_count == 0 or not all_completed:
+        return None
+
+    # Parents first when copying (archived payments reference archived installments)
+    in_group = "installmentId IN (SELECT id FROM Installments WHERE groupId = %s)"
+    cursor.execute(f"""INSERT INTO ArchivedInstallments ({INSTALLMENT_COLUMNS})
+                       SELECT {INSTALLMENT_COLUMNS} FROM Installments WHERE groupId = %s""", (group_id_bytes,))
+    cursor.execute(f"""INSERT INTO ArchivedInstallmentPayments ({PAYMENT_COLUMNS})
+                       SELECT {PAYMENT_COLUMNS} FROM InstallmentPayments WHERE {in_group}""", (group_id_bytes,))
+    payment_count = cursor.rowcount
+    write_enrollment_summaries(cursor, group_id_bytes)
+
+    # Children first (the payments reference the installments)
+    cursor.execute(f"DELETE FROM InstallmentPayments WHERE {in_group}", (group_id_bytes,))
+    cursor.execute("DELETE FROM Installments WHERE groupId = %s", (group_id_bytes,))
+    cursor.execute("""INSERT INTO ArchivedGroups (groupId, archivedDate, installmentCount, paymentCount)
+                      VALUES (%s, %s, %s, %s)""",
+                   (group_id_bytes, datetime.datetime.now(), installment_count, payment_count))
+    return payment_count
+
+
+def write_restore_group(cursor, group_id_bytes):
+    """Write operation: moves an archived group's installments and payments back to the live tables."""
+    in_group = "installmentId IN (SELECT id FROM ArchivedInstallments WHERE groupId = %s)"
+    cursor.execute(f"""INSERT INTO Installments ({INSTALLMENT_COLUMNS})
+                       SELECT {INSTALLMENT_COLUMNS} FROM ArchivedInstallments WHERE groupId = %s""", (group_id_bytes,))
+    cursor.execute(f"""INSERT INTO InstallmentPayments ({PAYMENT_COLUMNS})
+                       SELECT {PAYMENT_COLUMNS} FROM ArchivedInstallmentPayments WHERE {in_group}""", (group_id_bytes,))
+    payment_count = cursor.rowcount
+    cursor.execute(f"DELETE FROM ArchivedInstallmentPayments WHERE {in_group}", (group_id_bytes,))
+    cursor.execute("DELETE FROM ArchivedInstallments WHERE groupId = %s", (group_id_bytes,))
+    cursor.execute("DELETE FROM EnrollmentSummaries WHERE groupId = %s", (group_id_bytes,))
+    cursor.execute("DELETE FROM ArchivedGroups WHERE groupId = %s", (group_id_bytes,))
+    return payment_count
+
+
+def archive_completed_groups(conn, dry_run=False):
+    """
+    Archives every completed group, one transaction per group so a failure only affects that group.
+    Returns a list of (group name, group id, payments archived or None if skipped).
+    Raises ValueError on a branch database (see the module docstring).
+    """
+    if storage.tracks_changes(conn):
+        raise ValueError("Archiving runs on the central database only, not on a branch database synced by sync.py")
+    archived = []
+    for name, group_id_bytes in find_archivable_groups(conn):
+        group_id_bytes = bytes(group_id_bytes)
+        if dry_run:
+            archived.append((name, group_id_bytes, None))
+            continue
+        with UnitOfWork(conn) as uow:
+            uow.add(write_archive_group, group_id_bytes)
+        archived.append((name, group_id_bytes, uow.results[0]))
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move completed chit groups' installments and payments to the archive tables.")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the groups that would be archived")
+    parser.add_argument("--tenant", help="Archive in this tenant's database instead of the [mysql] database (see tenants.py)")
+    args = parser.parse_args()
+
+    import getpass
+    import streamlit as st # Only needed to read .streamlit/secrets.toml
+    import audit
+    if args.tenant:
+        import tenants
+        try:
+            backend = tenants.tenant_backend_from_secrets(st.secrets, args.tenant)
+        except Error as e:
+            parser.error(str(e))
+    else:
+        backend = storage.mysql_backend_from_secrets(st.secrets)
+    conn = backend.connect()
+    audit_buffer = audit.AuditBuffer(audit.DatabaseSink(backend.connect), fallback=audit.FileSink(audit.DEFAULT_FALLBACK_PATH))
+    try:
+        results = archive_completed_groups(conn, dry_run=args.dry_run)
+        for name, group_id_bytes, payment_count in results:
+            if args.dry_run:
+                print(f"Would archive: {name}")
+            elif payment_count is None:
+                print(f"Skipped (installments reopened): {name}")
+            else:
+                audit_buffer.record(f"{getpass.getuser()} (archive.py)", "archive", "ChitGroups", group_id_bytes,
+                                    after={"paymentsArchived": payment_count})
+                print(f"Archived: {name} ({payment_count} payments)")
+        if not results:
+            print("No completed groups to archive.")
+    except Error as e:
+        print(f"Archiving failed: {e}")
+    finally:
+        audit_buffer.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""
+Append-only audit trail for Foremen Choice Digital Records Manager.
+
+Every committed write (group, subscriber, enrollment, installments, payment, archive) is
+recorded as an event: time, user, action, table, row id and the row's state before and
+after the change (JSON). Writing each event with its own INSERT and commit would double
+the commits on collection day, so events are collected in an in-process AuditBuffer and
+written behind the app's back by a background thread:
+
+- in batches (one executemany + one commit) to the AuditLog table (DatabaseSink), or
+- appended as compact JSON lines to a local log file (FileSink, fsynced per batch).
+
+The buffer is flushed when it holds max_batch events or every flush_interval seconds,
+whichever comes first, and once more when the process exits (atexit). If the database
+can't be reached, the batch goes to the fallback log file instead, so nothing is lost;
+load such a file into AuditLog later with:
+    python audit.py --replay audit_fallback.log
+
+A database sink can also be paused, e.g. while a tenant's database is read-only during a
+move to another server (see tenants.py): the events then stay in the buffer and are written
+once the database accepts writes again (or go to the fallback file if the app exits first).
+
+Events still in the buffer are lost only if the process is killed outright (kill -9,
+power loss): at most flush_interval seconds of events. Lower flush_interval (or use the
+file sink) where that matters.
+
+Configure in .streamlit/secrets.toml (all optional):
+    [audit]
+    sink = "database"                   # or "file"
+    file_path = "audit.log"             # log file of the file sink
+    fallback_path = "audit_fallback.log"
+    max_batch = 500
+    flush_interval = 2.0                # seconds
+"""
+
+import argparse
+import atexit
+import datetime
+import decimal
+import json
+import logging
+import os
+import threading
+import uuid
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 500
+DEFAULT_FLUSH_INTERVAL = 2.0 # Seconds
+DEFAULT_FILE_PATH = "audit.log"
+DEFAULT_FALLBACK_PATH = "audit_fallback.log"
+
+INSERT_EVENTS = """INSERT INTO AuditLog (eventTime, userName, action, tableName, rowId, beforeState, afterState)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)"""
+
+
+def _json_default(value):
+    # BINARY(16) ids as UUID strings, dates as ISO strings, DECIMAL amounts as exact strings
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)) and len(value) == 16:
+        return str(uuid.UUID(bytes=bytes(value)))
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    if isinstance(value, (datetime.date, datetime.datetime, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"Cannot audit value of type {type(value).__name__}")
+
+
+def to_json(state):
+    """Compact JSON of a row state (None stays None)."""
+    if state is None:
+        return None
+    return json.dumps(state, default=_json_default, separators=(",", ":"))
+
+
+# --- Sinks ---
+
+class SinkPaused(Exception):
+    """Raised by a sink that can't take events for now; AuditBuffer keeps them and tries again later."""
+
+
+class DatabaseSink:
+    """
+    Writes event batches to the AuditLog table over its own connection (not the app's shared one).
+    target is an optional function returning where the events belong right now (e.g. a tenant's
+    route), or None while they can't be written (SinkPaused). The sink reconnects when it changes.
+    """
+
+    def __init__(self, connect, target=None):
+        self.connect = connect # Function returning a new connection, e.g. backend.connect
+        self.target = target
+        self.conn = None
+        self._connected_target = None
+
+    def write(self, events):
+        if self.target is not None:
+            target = self.target()
+            if target is None:
+                raise SinkPaused("The audit database does not accept writes right now")
+            if target != self._connected_target:
+                self.close()
+                self._connected_target = target
+        if self.conn is None:
+            self.conn = self.connect()
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(INSERT_EVENTS, events)
+            self.conn.commit()
+        except Error:
+            # Reconnect for the next batch (the connection may have dropped)
+            try:
+                self.conn.close()
+            except Error:
+                pass
+            self.conn = None
+            raise
+        finally:
+            try:
+                cursor.close()
+            except Error:
+                pass
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Error:
+                pass
+            self.conn = None
+
+
+class FileSink:
+    """Appends event batches as JSON lines to a local file, fsynced once per batch."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, events):
+        lines = []
+        for event_time, user, action, table, row_id, before, after in events:
+            lines.append(json.dumps([event_time.isoformat(), user, action, table,
+                                     row_id.hex() if row_id else None, before, after], separators=(",", ":")))
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def close(self):
+        pass
+
+
+def read_log_file(path):
+    """Reads a FileSink log back into event tuples (as written to AuditLog)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                event_time, user, action, table, row_id, before, after = json.loads(line)
+                yield (datetime.datetime.fromisoformat(event_time), user, action, table,
+                       bytes.fromhex(row_id) if row_id else None, before, after)
+
+
+# --- Buffer ---
+
+class AuditBuffer:
+    """
+    Thread-safe write-behind buffer of audit events. record() only appends to a list;
+    a daemon thread hands full batches (or whatever is buffered every flush_interval
+    seconds) to the sink. Batches the sink fails to write go to the fallback sink.
+    """
+
+    def __init__(self, sink, max_batch=DEFAULT_MAX_BATCH, flush_interval=DEFAULT_FLUSH_INTERVAL, fallback=None):
+        self.sink = sink
+        self.fallback = fallback
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.flushed = 0 # Events written by the sink
+        self.fallback_events = 0 # Events written to the fallback sink instead
+        self.last_error = None
+        self._events = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock() # One flush at a time, so batches stay in order
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close) # Flush what is left when the app shuts down
+
+    def record(self, user, action, table, row_id, before=None, after=None):
+        """Buffers one event. before/after are dicts of the row's columns (None for a create/delete)."""
+        event = (datetime.datetime.now(), user, action, table,
+                 bytes(row_id) if row_id is not None else None, to_json(before), to_json(after))
+        with self._condition:
+            self._events.append(event)
+            if len(self._events) >= self.max_batch:
+                self._condition.notify()
+            closed = self._closed
+        if closed: # No flusher thread any more (e.g. a session still held a released buffer)
+            self.flush()
+
+    def pending(self):
+        with self._condition:
+            return len(self._events)
+
+    def _run(self):
+        held_back = False # The last flush kept the events (sink paused or failing without a fallback)
+        while True:
+            with self._condition:
+                if self._closed:
+                    return
+                if held_back or len(self._events) < self.max_batch:
+                    self._condition.wait(timeout=self.flush_interval)
+            held_back = self.flush() == 0 and self.pending() > 0
+
+    def flush(self):
+        """Writes all buffered events now. Returns the number of events flushed."""
+        with self._flush_lock:
+            with self._condition:
+                events, self._events = self._events, []
+            if not events:
+                return 0
+            try:
+                self.sink.write(events)
+                self.flushed += len(events)
+            except SinkPaused:
+                if not self._closed or self.fallback is None:
+                    with self._condition:
+                        self._events[:0] = events # Written once the sink takes events again
+                    return 0
+                self.fallback.write(events) # Shutting down: don't lose them
+                self.fallback_events += len(events)
+            except Exception as e: # Any sink failure: keep the events
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning("Audit flush failed (%s), %d events", self.last_error, len(events))
+                if self.fallback is None:
+                    with self._condition:
+                        self._events[:0] = events # Retried with the next flush
+                    return 0
+                self.fallback.write(events)
+                self.fallback_events += len(events)
+            return len(events)
+
+    def close(self):
+        """Stops the flusher thread and writes the remaining events (called at exit)."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+        atexit.unregister(self.close) # Released buffers (one per tenant) are not kept alive until exit
+        self.sink.close()
+
+
+def buffer_from_config(config, backend, target=None):
+    """
+    Creates an AuditBuffer from the [audit] section of secrets.toml (a dict, may be empty).
+    target is passed to the DatabaseSink (see there).
+    """
+    fallback = FileSink(config.get("fallback_path", DEFAULT_FALLBACK_PATH))
+    if config.get("sink", "database") == "file":
+        sink, fallback = FileSink(config.get("file_path", DEFAULT_FILE_PATH)), None
+    else:
+        sink = DatabaseSink(backend.connect, target)
+    return AuditBuffer(sink,
+                       max_batch=int(config.get("max_batch", DEFAULT_MAX_BATCH)),
+                       flush_interval=float(config.get("flush_interval", DEFAULT_FLUSH_INTERVAL)),
+                       fallback=fallback)
+
+
+# --- Search ---
+
+def search_events(conn, table=None, user=None, action=None, row_id=None, start=None, end=None, limit=200):
+    """
+    Returns the newest audit events matching the filters (all optional) as dicts.
+    Every filter combination is served by an index: (rowId, eventTime), (tableName, eventTime),
+    (userName, eventTime) or (eventTime).
+    """
+    conditions, params = [], []
+    for column, value in (("rowId", row_id), ("tableName", table), ("userName", user), ("action", action)):
+        if value is not None:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+    if start is not None:
+        conditions.append("eventTime >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("eventTime < %s")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""SELECT id, eventTime, userName, action, tableName, rowId, beforeState, afterState
+                           FROM AuditLog {where}
+                           ORDER BY eventTime DESC, id DESC
+                           LIMIT %s""", (*params, limit))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def replay_log_file(conn, path, batch_size=DEFAULT_MAX_BATCH):
+    """Loads a FileSink log into AuditLog in batches and renames the file to <path>.replayed. Returns the event count."""
+    events = list(read_log_file(path))
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(events), batch_size):
+            cursor.executemany(INSERT_EVENTS, events[start:start + batch_size])
+        conn.commit() # All or nothing, so a failed replay can simply be run again
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    os.replace(path, path + ".replayed") # Not loaded twice
+    return len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load an audit log file (file sink or database fallback) into the AuditLog table.")
+    parser.add_argument("--replay", required=True, help="Log file to load")
+    parser.add_argument("--sqlite", help="Use this SQLite file instead of the database in secrets.toml")
+    args = parser.parse_args()
+
+    import storage
+    if args.sqlite:
+        backend = storage.SQLiteBackend(args.sqlite, mode="rw") # An existing app database, schema left as it is
+    else:
+        import streamlit as st # Only needed to read .streamlit/secrets.toml
+        backend = storage.backend_from_secrets(st.secrets)
+    conn = backend.connect()
+    try:
+        print(f"Loaded {replay_log_file(conn, args.replay)} audit events from {args.replay}.")
+    except Error as e:
+        print(f"Replay failed: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: money aggregates on floats (the old DOUBLE path) vs. Decimal vs. integer paise.
+
+Generates synthetic payments (amounts with paise, e.g. 3333.33 monthly shares) spread over
+groups and computes the per-group totals and dues the app shows, four ways:
+
+- float loop  : Python floats summed per group in a dict (how the app summed DOUBLE columns)
+- float numpy : numpy float64 bincount
+- Decimal     : Python Decimal summed per group in a dict (exact, what DECIMAL columns return)
+- paise       : money.py, int64 paise arrays (exact); timed with and without converting the rows
+
+Every variant is compared with the exact Decimal totals: "groups off" counts groups whose
+total (rounded to paise for display) differs, "drift" is the largest raw error in paise.
+Needs no database.
+
+Run from the foremenapp folder:
+    python bench_money.py --payments 1000000 --groups 2000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from decimal import Decimal
+
+import numpy as np
+
+import money
+
+
+def generate(payments, groups, seed):
+    """Returns (group keys, amounts in paise, group values in paise, durations, installments due) as lists."""
+    rng = random.Random(seed)
+    durations = [rng.choice((12, 20, 25, 30, 40, 50)) for _ in range(groups)]
+    values = [rng.choice((1, 2, 3, 5, 10, 25)) * 100000 * 100 for _ in range(groups)] # 1 to 25 lakh, in paise
+    due = [rng.randint(1, duration) for duration in durations]
+    keys = [rng.randrange(groups) for _ in range(payments)]
+    # Mostly the monthly share (value / duration, often with paise), sometimes a part payment
+    amounts = [money.installment_paise(values[key], durations[key]) if rng.random() < 0.8
+               else rng.randrange(1, 500000) for key in keys]
+    return keys, amounts, values, durations, due
+
+
+def time_runs(function, runs):
+    """Returns the median seconds of several runs and the last result."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare float, Decimal and integer paise money aggregates.")
+    parser.add_argument("--payments", type=int, default=1000000)
+    parser.add_argument("--groups", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per variant (median is shown)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    keys, amounts_paise, values_paise, durations, due = generate(args.payments, args.groups, args.seed)
+    # The rows as each backend returns them: floats from DOUBLE columns, Decimals from DECIMAL columns
+    float_amounts = [paise / 100 for paise in amounts_paise]
+    decimal_amounts = [money.from_paise(paise) for paise in amounts_paise]
+    float_values = [paise / 100 for paise in values_paise]
+    decimal_values = [money.from_paise(paise) for paise in values_paise]
+    key_array = np.asarray(keys, dtype=np.intp)
+    float_array = np.asarray(float_amounts, dtype=np.float64)
+    paise_amounts = money.paise_array(decimal_amounts)
+
+    def float_loop():
+        totals = [0.0] * args.groups
+        for key, amount in zip(keys, float_amounts):
+            totals[key] += amount
+        dues = [max(0, d * round(v / n, 2) - t) for v, n, d, t in zip(float_values, durations, due, totals)]
+        return totals, dues
+
+    def float_numpy():
+        totals = np.bincount(key_array, weights=float_array, minlength=args.groups)
+        dues = np.maximum(np.asarray(due) * np.round(np.asarray(float_values) / np.asarray(durations), 2) - totals, 0)
+        return totals, dues
+
+    def decimal_loop():
+        totals = [Decimal(0)] * args.groups
+        for key, amount in zip(keys, decimal_amounts):
+            totals[key] += amount
+        dues = [max(Decimal(0), d * money.to_decimal(v / n) - t)
+                for v, n, d, t in zip(decimal_values, durations, due, totals)]
+        return totals, dues
+
+    def paise_from_rows():
+        totals = money.group_totals_paise(key_array, money.paise_array(decimal_amounts), args.groups)
+        return totals, money.dues_paise(money.paise_array(decimal_values), durations, due, totals)
+
+    def paise_arrays():
+        totals = money.group_totals_paise(key_array, paise_amounts, args.groups)
+        return totals, money.dues_paise(values_paise, durations, due, totals)
+
+    variants = [("float loop", float_loop), ("float numpy", float_numpy), ("Decimal", decimal_loop),
+                ("paise (rows)", paise_from_rows), ("paise (arrays)", paise_arrays)]
+    exact_seconds, (exact_totals, exact_dues) = time_runs(decimal_loop, args.runs)
+    exact_totals = [money.to_paise(total) for total in exact_totals]
+    exact_dues = [money.to_paise(amount) for amount in exact_dues]
+
+    print(f"{args.payments} payments in {args.groups} groups, median of {args.runs} runs")
+    print(f"{'variant':<16}{'time':>10}{'vs float':>10}{'groups off':>12}{'dues off':>10}{'drift (paise)':>15}")
+    float_seconds = None
+    for label, function in variants:
+        seconds, (totals, dues) = (exact_seconds, (None, None)) if function is decimal_loop else time_runs(function, args.runs)
+        float_seconds = float_seconds or seconds
+        if totals is None:
+            off_totals = off_dues = drift = 0
+        else:
+            exact = label.startswith("paise")
+            # Raw error of the sums before rounding, in paise
+            raw = [abs(float(total) * (1 if exact else 100) - expected) for total, expected in zip(totals, exact_totals)]
+            drift = max(raw)
+            to_paise = (lambda amount: int(amount)) if exact else money.to_paise
+            off_totals = sum(1 for total, expected in zip(totals, exact_totals) if to_paise(total) != expected)
+            off_dues = sum(1 for amount, expected in zip(dues, exact_dues) if to_paise(amount) != expected)
+        print(f"{label:<16}{seconds * 1000:>8.1f}ms{float_seconds / seconds:>9.2f}x{off_totals:>12}{off_dues:>10}{drift:>15.6f}")
+
+
+if __name__ == "__main__":
+    main()
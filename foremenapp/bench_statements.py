@@ -0,0 +1,155 @@
+"""
+Benchmark: text queries with dictionary cursors vs. registered prepared statements.
+
+Seeds a throw-away group (subscribers, enrollments, installments, payments) in the database
+from the [mysql] section of .streamlit/secrets.toml, then times each hot query per call:
+
+- text + dict : the original way (query text sent and parsed every call, a dict built per row)
+- prepared    : statements.REGISTRY (prepared once per connection, tuple rows)
+
+for the pure Python connector and, when installed, the C extension.
+The seeded rows are deleted again at the end.
+
+Run from the foremenapp folder against a local MySQL created from chitfunddatabase.sql:
+    python bench_statements.py --members 50 --calls 500
+"""
+
+import argparse
+import datetime
+import statistics
+import time
+import uuid
+
+from mysql.connector import HAVE_CEXT
+
+import storage
+from statements import SQL, StatementRegistry
+
+
+def seed(conn, members, months):
+    """Creates one group with the given number of members, installments and a payment per member per month."""
+    cursor = conn.cursor()
+    group_id = uuid.uuid4().bytes
+    start = datetime.date.today()
+    cursor.execute("""INSERT INTO ChitGroups (id, name, value, numberOfSubscribers, duration, startDate, isActive)
+                      VALUES (%s, %s, %s, %s, %s, %s, TRUE)""",
+                   (group_id, f"Benchmark {group_id.hex()[:8]}", 100000.0, members, months, start))
+    subscriber_ids = [uuid.uuid4().bytes for _ in range(members)]
+    cursor.executemany("""INSERT INTO Subscribers (id, name, phoneNumber, address, createdDate, isActive)
+                          VALUES (%s, %s, %s, NULL, %s, TRUE)""",
+                       [(sid, f"Member {n}", f"bench-{sid.hex()[:16]}", datetime.datetime.now())
+                        for n, sid in enumerate(subscriber_ids)])
+    cursor.executemany("""INSERT INTO Enrollments (id, subscriberId, groupId, assignedChitNumber, joinDate)
+                          VALUES (%s, %s, %s, %s, %s)""",
+                       [(uuid.uuid4().bytes, sid, group_id, n + 1, start) for n, sid in enumerate(subscriber_ids)])
+    installment_ids = [uuid.uuid4().bytes for _ in range(months)]
+    cursor.executemany("""INSERT INTO Installments (id, groupId, monthNumber, dueDate, isAuctionConducted, isCompleted)
+                          VALUES (%s, %s, %s, %s, FALSE, FALSE)""",
+                       [(iid, group_id, n + 1, start) for n, iid in enumerate(installment_ids)])
+    cursor.executemany(SQL["insert_payment"],
+                       [(uuid.uuid4().bytes, iid, sid, datetime.datetime.now(), 1000.0, "")
+                        for iid in installment_ids for sid in subscriber_ids])
+    conn.commit()
+    cursor.close()
+    return group_id, subscriber_ids, installment_ids
+
+
+def cleanup(conn, group_id, subscriber_ids):
+    """Deletes the seeded rows (cascades to enrollments, installments and payments)."""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM ChitGroups WHERE id = %s", (group_id,))
+    cursor.executemany("DELETE FROM Subscribers WHERE id = %s", [(sid,) for sid in subscriber_ids])
+    conn.commit()
+    cursor.close()
+
+
+def time_calls(function, calls, after=None):
+    """Returns the median and p95 per-call latency in microseconds. after() runs untimed after every call."""
+    function() # Warm up (prepares the statement for the prepared variant)
+    if after:
+        after()
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1e6)
+        if after:
+            after()
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))]
+
+
+def bench_connection(conn, group_id, subscriber_ids, installment_ids, calls):
+    """Times every hot query both ways on one connection. Returns rows of (query, text_us, prepared_us)."""
+    registry = StatementRegistry()
+    read_params = {
+        "enrollments_for_group": (group_id,),
+        "installments_for_group": (group_id,),
+        "installment_by_month": (group_id, 1),
+        "payment_status": (installment_ids[0], group_id),
+    }
+    results = []
+    for name, params in read_params.items():
+        query_text = SQL[name]
+
+        def text_dict():
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query_text, params)
+            cursor.fetchall()
+            cursor.close()
+
+        def prepared():
+            registry.fetchall(conn, name, params)
+
+        results.append((name, time_calls(text_dict, calls), time_calls(prepared, calls)))
+
+    # The INSERT: one new payment per call, each rolled back (untimed) so both variants insert
+    # into the same table state and neither pays for the other's growing transaction
+    def insert_params():
+        return (uuid.uuid4().bytes, installment_ids[0], subscriber_ids[0], datetime.datetime.now(), 1.0, "")
+
+    def text_insert():
+        cursor = conn.cursor()
+        cursor.execute(SQL["insert_payment"], insert_params())
+        cursor.close()
+
+    def prepared_insert():
+        registry.execute(conn, "insert_payment", insert_params())
+
+    results.append(("insert_payment", time_calls(text_insert, calls, after=conn.rollback),
+                    time_calls(prepared_insert, calls, after=conn.rollback)))
+    registry.discard(conn)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare text/dict queries with prepared statements on a local MySQL.")
+    parser.add_argument("--members", type=int, default=50, help="Subscribers in the seeded group")
+    parser.add_argument("--months", type=int, default=20, help="Installments in the seeded group")
+    parser.add_argument("--calls", type=int, default=500, help="Timed calls per query and variant")
+    args = parser.parse_args()
+
+    import streamlit as st # Only needed to read .streamlit/secrets.toml
+    backend = storage.mysql_backend_from_secrets(st.secrets)
+
+    setup_conn = backend.connect()
+    group_id, subscriber_ids, installment_ids = seed(setup_conn, args.members, args.months)
+    try:
+        variants = [("pure Python", True)] + ([("C extension", False)] if HAVE_CEXT else [])
+        for label, use_pure in variants:
+            conn = storage.MySQLBackend(**dict(backend.connect_args, use_pure=use_pure)).connect()
+            print(f"\n{label} connector ({args.members} members, {args.months} months, {args.calls} calls)")
+            print(f"{'query':<26}{'text+dict p50':>15}{'prepared p50':>15}{'p95 text/prep (us)':>22}{'speedup':>10}")
+            for name, (text_p50, text_p95), (prep_p50, prep_p95) in bench_connection(
+                    conn, group_id, subscriber_ids, installment_ids, args.calls):
+                print(f"{name:<26}{text_p50:>13.0f}us{prep_p50:>13.0f}us{text_p95:>12.0f}/{prep_p95:<9.0f}{text_p50 / prep_p50:>9.2f}x")
+            conn.close()
+        if not HAVE_CEXT:
+            print("\nC extension not installed: only the pure Python connector was measured.")
+    finally:
+        cleanup(setup_conn, group_id, subscriber_ids)
+        setup_conn.close()
+
+
+if __name__ == "__main__":
+    main()
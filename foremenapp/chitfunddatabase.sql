@@ -14,7 +14,9 @@ CREATE TABLE Subscribers (
     phoneNumber VARCHAR(20) UNIQUE NOT NULL, -- Phone number, unique for each subscriber
     address TEXT, -- Optional address, using TEXT for potentially longer strings
     createdDate DATETIME NOT NULL, -- When the subscriber record was created
-    isActive BOOLEAN NOT NULL DEFAULT TRUE -- Flag to indicate if the subscriber is active
+    isActive BOOLEAN NOT NULL DEFAULT TRUE, -- Flag to indicate if the subscriber is active
+    lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), -- Last change time, used by sync.py to pull changes
+    INDEX idx_subscribers_lastModified (lastModified, id)
 
     -- No direct relationships here in SQL; Many-to-Many is handled by the Enrollments table.
     -- One-to-Many to InstallmentPayments handled by FK in InstallmentPayments table.
@@ -27,12 +29,14 @@ CREATE TABLE Subscribers (
 CREATE TABLE ChitGroups (
     id BINARY(16) PRIMARY KEY, -- UUID for the group
     name VARCHAR(255) NOT NULL, -- Name of the group (e.g., "Evening Chit 10 Lakhs")
-    value DOUBLE NOT NULL, -- Total value of the chit (use DECIMAL for precise currency if needed)
+    value DECIMAL(14,2) NOT NULL, -- Total value of the chit (exact rupees and paise)
     numberOfSubscribers SMALLINT NOT NULL, -- Total number of slots in the group
     duration SMALLINT NOT NULL, -- Total number of installments (months)
     startDate DATE NOT NULL, -- The start date of the group
     foremanCommissionPercentage DOUBLE, -- Optional foreman commission percentage
-    isActive BOOLEAN NOT NULL DEFAULT TRUE -- Flag to indicate if the group is active
+    isActive BOOLEAN NOT NULL DEFAULT TRUE, -- Flag to indicate if the group is active
+    lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), -- Last change time, used by sync.py to pull changes
+    INDEX idx_groups_lastModified (lastModified, id)
 
     -- One-to-Many relationships to Installments and Enrollments handled by FKs in those tables.
 );
@@ -48,6 +52,8 @@ CREATE TABLE Enrollments (
     groupId BINARY(16) NOT NULL, -- Foreign Key referencing the ChitGroups table
     assignedChitNumber SMALLINT NOT NULL, -- The unique slot number assigned to the subscriber in THIS group
     joinDate DATE NOT NULL, -- The date the subscriber was enrolled in this group
+    lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), -- Last change time, used by sync.py to pull changes
+    INDEX idx_enrollments_lastModified (lastModified, id),
 
     -- Constraints to enforce the Many-to-Many logic and uniqueness:
     -- Ensure a subscriber can only have ONE enrollment record per group.
@@ -72,9 +78,12 @@ CREATE TABLE Installments (
     monthNumber SMALLINT NOT NULL, -- The sequential number of the installment (1, 2, ..., duration)
     dueDate DATE NOT NULL, -- The date the payment for this installment is due
     isAuctionConducted BOOLEAN NOT NULL DEFAULT FALSE, -- Flag if the auction for this month has occurred
-    auctionPrizeAmount DOUBLE, -- Optional: The amount won in the auction for this installment
+    auctionPrizeAmount DECIMAL(14,2), -- Optional: The amount won in the auction for this installment
     auctionWinnerId BINARY(16), -- Optional Foreign Key referencing the Subscribers table (the winner)
     isCompleted BOOLEAN NOT NULL DEFAULT FALSE, -- Flag if this installment is considered fully collected/closed
+    lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), -- Last change time, used by sync.py to pull changes
+    INDEX idx_installments_lastModified (lastModified, id),
+    INDEX idx_installments_due (dueDate), -- Upcoming installments for dues reminders (see reminders.py)
 
     -- Constraint to ensure each month number is unique within a specific group.
     UNIQUE KEY unique_month_per_group (groupId, monthNumber),
@@ -95,8 +104,11 @@ CREATE TABLE InstallmentPayments (
     installmentId BINARY(16) NOT NULL, -- Foreign Key referencing the Installments table (which month this payment is for)
     subscriberId BINARY(16) NOT NULL, -- Foreign Key referencing the Subscribers table (who made the payment)
     paymentDate DATETIME NOT NULL, -- The date and time the payment was recorded
-    amountPaid DOUBLE NOT NULL, -- The amount paid in this transaction
+    amountPaid DECIMAL(14,2) NOT NULL, -- The amount paid in this transaction
     notes TEXT, -- Optional: Any notes about the payment (e.g., partial payment reason)
+    lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), -- Last change time, used by sync.py to pull changes
+    INDEX idx_payments_lastModified (lastModified, id),
+    INDEX idx_payments_date (paymentDate), -- Recomputing the dashboard counters (see counters.py)
 
     -- Define Foreign Key constraints with ON DELETE rules:
     -- If the parent Installment is deleted, automatically delete its associated payment records.
@@ -119,8 +131,192 @@ CREATE TABLE InstallmentPayments (
 
 -- INDEX for quickly finding payments for a specific installment
 -- CREATE INDEX idx_payments_installment ON InstallmentPayments(installmentId);
--- INDEX for quickly finding payments made by a specific subscriber
--- CREATE INDEX idx_payments_subscriber ON InstallmentPayments(subscriberId);
+-- INDEX for quickly finding payments made by a specific subscriber, newest first
+-- (used by the Subscriber Details page; enrollments by subscriber already use unique_enrollment_per_group)
+CREATE INDEX idx_payments_subscriber_date ON InstallmentPayments(subscriberId, paymentDate);
+
+-- -------------------------------------------------------------------
+-- Archive of completed groups (see archive.py)
+-- Installments and payments of groups whose installments are all isCompleted are moved
+-- here so the live tables and their indexes only hold active groups.
+-- (Archive tables instead of MySQL partitions: InnoDB does not allow partitioned tables
+--  to have foreign keys, and the live tables rely on them.)
+-- -------------------------------------------------------------------
+CREATE TABLE ArchivedGroups (
+    groupId BINARY(16) PRIMARY KEY, -- Group whose installments/payments are in the archive tables
+    archivedDate DATETIME NOT NULL, -- When the group was archived
+    installmentCount SMALLINT NOT NULL, -- Number of installments moved
+    paymentCount INT NOT NULL, -- Number of payments moved
+    FOREIGN KEY (groupId) REFERENCES ChitGroups(id) ON DELETE CASCADE
+);
+
+-- Same columns as Installments
+CREATE TABLE ArchivedInstallments (
+    id BINARY(16) PRIMARY KEY,
+    groupId BINARY(16) NOT NULL,
+    monthNumber SMALLINT NOT NULL,
+    dueDate DATE NOT NULL,
+    isAuctionConducted BOOLEAN NOT NULL DEFAULT FALSE,
+    auctionPrizeAmount DECIMAL(14,2),
+    auctionWinnerId BINARY(16),
+    isCompleted BOOLEAN NOT NULL DEFAULT FALSE,
+    UNIQUE KEY unique_archived_month_per_group (groupId, monthNumber),
+    INDEX idx_archived_installments_winner (auctionWinnerId),
+    FOREIGN KEY (groupId) REFERENCES ChitGroups(id) ON DELETE CASCADE
+);
+
+-- Same columns as InstallmentPayments
+CREATE TABLE ArchivedInstallmentPayments (
+    id BINARY(16) PRIMARY KEY,
+    installmentId BINARY(16) NOT NULL,
+    subscriberId BINARY(16) NOT NULL,
+    paymentDate DATETIME NOT NULL,
+    amountPaid DECIMAL(14,2) NOT NULL,
+    notes TEXT,
+    INDEX idx_archived_payments_installment (installmentId),
+    INDEX idx_archived_payments_subscriber_date (subscriberId, paymentDate),
+    FOREIGN KEY (installmentId) REFERENCES ArchivedInstallments(id) ON DELETE CASCADE
+);
+
+-- Per-enrollment totals for archived groups, rebuilt by archive.py
+CREATE TABLE EnrollmentSummaries (
+    enrollmentId BINARY(16) PRIMARY KEY, -- The archived enrollment
+    groupId BINARY(16) NOT NULL,
+    subscriberId BINARY(16) NOT NULL,
+    assignedChitNumber SMALLINT NOT NULL,
+    installmentsPaid SMALLINT NOT NULL, -- Installments with at least one payment
+    totalPaid DECIMAL(14,2) NOT NULL, -- Sum of all payments in the group
+    lastPaymentDate DATETIME, -- NULL if the subscriber never paid
+    auctionsWon SMALLINT NOT NULL,
+    INDEX idx_summaries_group (groupId),
+    INDEX idx_summaries_subscriber (subscriberId),
+    FOREIGN KEY (enrollmentId) REFERENCES Enrollments(id) ON DELETE CASCADE
+);
+
+-- -------------------------------------------------------------------
+-- Table: ReminderOutbox
+-- Dues reminders waiting to be sent / already sent (see reminders.py).
+-- Rows are queued in bulk with INSERT ... SELECT and sent by a batched dispatcher.
+-- -------------------------------------------------------------------
+CREATE TABLE ReminderOutbox (
+    id BINARY(16) PRIMARY KEY, -- UUID for the reminder
+    installmentId BINARY(16) NOT NULL, -- The installment the member is reminded about
+    enrollmentId BINARY(16) NOT NULL, -- The member's enrollment in the group
+    subscriberId BINARY(16) NOT NULL,
+    subscriberName VARCHAR(255) NOT NULL, -- Contact details and amounts as they were when queued
+    phoneNumber VARCHAR(20) NOT NULL,
+    groupName VARCHAR(255) NOT NULL,
+    monthNumber SMALLINT NOT NULL,
+    dueDate DATE NOT NULL,
+    amountDue DECIMAL(14,2) NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending', -- pending, sending, sent, failed or cancelled
+    attempts SMALLINT NOT NULL DEFAULT 0, -- Send attempts so far
+    nextAttemptAt DATETIME NOT NULL, -- When a pending reminder may be sent (later for retries); claim time while sending
+    claimToken BINARY(16), -- Batch that claimed the reminder
+    lastError TEXT, -- Error of the last failed attempt
+    createdDate DATETIME NOT NULL,
+    sentDate DATETIME,
+
+    -- At most one reminder per member per installment
+    UNIQUE KEY unique_reminder_per_installment (installmentId, enrollmentId),
+    INDEX idx_outbox_due (status, nextAttemptAt),
+    INDEX idx_outbox_claim (claimToken),
+    FOREIGN KEY (installmentId) REFERENCES Installments(id) ON DELETE CASCADE,
+    FOREIGN KEY (enrollmentId) REFERENCES Enrollments(id) ON DELETE CASCADE
+);
+
+-- -------------------------------------------------------------------
+-- Table: AuditLog
+-- Append-only record of every write made through the app (see audit.py).
+-- Events are buffered by the app and inserted in batches; never updated or deleted.
+-- -------------------------------------------------------------------
+CREATE TABLE AuditLog (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY, -- Insert order (ties on eventTime)
+    eventTime DATETIME(6) NOT NULL, -- When the write was committed
+    userName VARCHAR(100) NOT NULL, -- Who made the change
+    action VARCHAR(20) NOT NULL, -- create, update, delete, archive
+    tableName VARCHAR(64) NOT NULL, -- Table of the changed row
+    rowId BINARY(16), -- UUID of the changed row
+    beforeState JSON, -- Row before the change (NULL for a create)
+    afterState JSON, -- Row after the change (NULL for a delete)
+
+    -- Indexes for the Audit Trail page: by row, table, user or just time, newest first
+    INDEX idx_audit_time (eventTime),
+    INDEX idx_audit_row (rowId, eventTime),
+    INDEX idx_audit_table (tableName, eventTime),
+    INDEX idx_audit_user (userName, eventTime)
+);
+
+-- -------------------------------------------------------------------
+-- Table: DashboardCounters
+-- Single row of live Dashboard figures (see counters.py). Every payment updates it in its
+-- own transaction; counters.py recomputes it from the tables periodically.
+-- -------------------------------------------------------------------
+CREATE TABLE DashboardCounters (
+    id TINYINT PRIMARY KEY, -- Always 1
+    collectedDate DATE, -- Day of collectedToday / paymentsToday
+    collectedToday DECIMAL(14,2) NOT NULL DEFAULT 0,
+    paymentsToday INT NOT NULL DEFAULT 0,
+    monthStart DATE, -- Month of collectedMonth
+    collectedMonth DECIMAL(14,2) NOT NULL DEFAULT 0,
+    hourStart DATETIME, -- Hour of paymentsThisHour (paymentsLastHour is the hour before)
+    paymentsThisHour INT NOT NULL DEFAULT 0,
+    paymentsLastHour INT NOT NULL DEFAULT 0,
+    overdueAmount DECIMAL(14,2) NOT NULL DEFAULT 0, -- Unpaid monthly shares of installments past their due date
+    groupsNearingCompletion INT NOT NULL DEFAULT 0, -- Active groups with few open installments left
+    refreshedAt DATETIME(6), -- Last full recompute
+    updatedAt DATETIME(6), -- Last change (payment or recompute)
+    CHECK (id = 1)
+);
+INSERT INTO DashboardCounters (id) VALUES (1);
+
+-- -------------------------------------------------------------------
+-- Table: DeletedRows
+-- Log of rows deleted from the synced tables, filled by the triggers below.
+-- Branches pull it (see sync.py) so rows deleted centrally are deleted locally too.
+-- MySQL does not fire triggers for ON DELETE CASCADE, so only the deleted parent is
+-- logged; branches have the same cascades and remove the children themselves.
+-- Entries older than the longest time a branch stays offline can be removed.
+-- -------------------------------------------------------------------
+CREATE TABLE DeletedRows (
+    seq BIGINT AUTO_INCREMENT PRIMARY KEY, -- Insert order (ties on deletedAt)
+    tableName VARCHAR(64) NOT NULL, -- Table of the deleted row
+    rowId BINARY(16) NOT NULL, -- UUID of the deleted row
+    deletedAt TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6), -- Pulled by sync.py like lastModified
+    INDEX idx_deleted_time (deletedAt, seq)
+);
+CREATE TRIGGER trg_Subscribers_deleted AFTER DELETE ON Subscribers FOR EACH ROW INSERT INTO DeletedRows (tableName, rowId) VALUES ('Subscribers', OLD.id);
+CREATE TRIGGER trg_ChitGroups_deleted AFTER DELETE ON ChitGroups FOR EACH ROW INSERT INTO DeletedRows (tableName, rowId) VALUES ('ChitGroups', OLD.id);
+CREATE TRIGGER trg_Enrollments_deleted AFTER DELETE ON Enrollments FOR EACH ROW INSERT INTO DeletedRows (tableName, rowId) VALUES ('Enrollments', OLD.id);
+CREATE TRIGGER trg_Installments_deleted AFTER DELETE ON Installments FOR EACH ROW INSERT INTO DeletedRows (tableName, rowId) VALUES ('Installments', OLD.id);
+CREATE TRIGGER trg_InstallmentPayments_deleted AFTER DELETE ON InstallmentPayments FOR EACH ROW INSERT INTO DeletedRows (tableName, rowId) VALUES ('InstallmentPayments', OLD.id);
+
+-- -------------------------------------------------------------------
+-- Branch sync support (see storage.py / sync.py)
+-- Every table has a lastModified column maintained by MySQL. Branches running in
+-- offline mode pull rows changed since their last sync using (lastModified, id).
+-- For databases created before this column existed, run once:
+-- -------------------------------------------------------------------
+-- ALTER TABLE Subscribers ADD COLUMN lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), ADD INDEX idx_subscribers_lastModified (lastModified, id);
+-- ALTER TABLE ChitGroups ADD COLUMN lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), ADD INDEX idx_groups_lastModified (lastModified, id);
+-- ALTER TABLE Enrollments ADD COLUMN lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), ADD INDEX idx_enrollments_lastModified (lastModified, id);
+-- ALTER TABLE Installments ADD COLUMN lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), ADD INDEX idx_installments_lastModified (lastModified, id);
+-- ALTER TABLE InstallmentPayments ADD COLUMN lastModified TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6), ADD INDEX idx_payments_lastModified (lastModified, id);
+-- For databases created before deletes were synced, also create the DeletedRows table and its triggers above.
+-- For databases created before the dues reminders, also run once:
+-- ALTER TABLE Installments ADD INDEX idx_installments_due (dueDate);
+-- For databases created before the live dashboard, also run once:
+-- ALTER TABLE InstallmentPayments ADD INDEX idx_payments_date (paymentDate);
+-- For databases created with DOUBLE amounts, check first which values would be rounded
+-- (python money.py --check-migration), then run once:
+-- ALTER TABLE ChitGroups MODIFY value DECIMAL(14,2) NOT NULL;
+-- ALTER TABLE Installments MODIFY auctionPrizeAmount DECIMAL(14,2);
+-- ALTER TABLE InstallmentPayments MODIFY amountPaid DECIMAL(14,2) NOT NULL;
+-- ALTER TABLE ArchivedInstallments MODIFY auctionPrizeAmount DECIMAL(14,2);
+-- ALTER TABLE ArchivedInstallmentPayments MODIFY amountPaid DECIMAL(14,2) NOT NULL;
+-- ALTER TABLE EnrollmentSummaries MODIFY totalPaid DECIMAL(14,2) NOT NULL;
+-- ALTER TABLE ReminderOutbox MODIFY amountDue DECIMAL(14,2) NOT NULL;
+-- ALTER TABLE DashboardCounters MODIFY collectedToday DECIMAL(14,2) NOT NULL DEFAULT 0, MODIFY collectedMonth DECIMAL(14,2) NOT NULL DEFAULT 0, MODIFY overdueAmount DECIMAL(14,2) NOT NULL DEFAULT 0;
 SELECT @@hostname;
 ALTER USER 'foremen'@'localhost' IDENTIFIED BY 'new_password';
 FLUSH PRIVILEGES;
@@ -0,0 +1,222 @@
+"""
+Dashboard counters for Foremen Choice Digital Records Manager.
+
+The live Dashboard shows collection-day figures: collected today, collected this month,
+overdue amount, payments per hour and groups nearing completion. Computing them from
+InstallmentPayments on every refresh would scan the payments again and again, so they
+are kept in ONE row of the DashboardCounters table:
+
+- Every payment updates the row right after it commits, in its own short transaction
+  (write_payment_counters, one UPDATE by primary key). Keeping it out of the payment's
+  transaction means payments don't queue behind each other on the row lock of this one
+  row. Day, month and hour totals roll over by themselves: a payment in a new
+  day/month/hour starts the total again. A counter update that fails after its payment
+  committed only leaves the figures behind until the next refresh.
+- A payment reads refreshedAt before its transaction (read_refreshed_at) and its counter
+  update only applies while refreshedAt is unchanged. A refresh that ran in between may
+  already have counted the payment, so the update is skipped rather than counted twice;
+  if the refresh ran just before the payment committed, the payment is missing from the
+  figures until the next refresh.
+- write_refresh_counters recomputes everything from the base tables. It runs when the
+  row has never been filled, on the first refresh of a day (installments that became
+  overdue overnight), and every FULL_REFRESH_SECONDS to correct drift from writes that
+  don't go through the app (sync from branches, archiving).
+
+Reading the dashboard is then a single-row primary key read (read_counters).
+
+Recompute from the command line (e.g. from cron), from the foremenapp folder:
+    python counters.py --refresh
+    python counters.py --refresh --tenant acme     # one tenant's database (see tenants.py)
+"""
+
+import argparse
+import datetime
+
+from mysql.connector import Error
+
+import money
+from statements import SQL
+
+NEARING_COMPLETION_INSTALLMENTS = 2 # A group with this many open installments or fewer is nearing completion
+FULL_REFRESH_SECONDS = 15 * 60
+
+COUNTER_COLUMNS = ("collectedDate", "collectedToday", "paymentsToday", "monthStart", "collectedMonth",
+                   "hourStart", "paymentsThisHour", "paymentsLastHour", "overdueAmount",
+                   "groupsNearingCompletion", "refreshedAt", "updatedAt")
+
+
+def _buckets(now):
+    """Returns (today, month start, hour start, previous hour start) for a point in time."""
+    hour_start = now.replace(minute=0, second=0, microsecond=0)
+    return now.date(), now.date().replace(day=1), hour_start, hour_start - datetime.timedelta(hours=1)
+
+
+def payment_counter_params(installment_id_bytes, subscriber_id_bytes, amount_paid, refreshed_at, now):
+    """Parameters of statements.SQL["payment_counters"] for one payment."""
+    today, month_start, hour_start, previous_hour_start = _buckets(now)
+    return (today, amount_paid, amount_paid,
+            today, today,
+            month_start, amount_paid, amount_paid, month_start,
+            hour_start, previous_hour_start, hour_start, hour_start,
+            installment_id_bytes, today, subscriber_id_bytes, subscriber_id_bytes,
+            now, refreshed_at)
+
+
+def read_refreshed_at(conn):
+    """The counters' refreshedAt, read before a payment's transaction and passed to write_payment_counters."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT refreshedAt FROM DashboardCounters WHERE id = 1")
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        cursor.close()
+
+
+def write_payment_counters(cursor, installment_id_bytes, subscriber_id_bytes, amount_paid, refreshed_at, now=None):
+    """
+    Write operation: adds one payment to the dashboard counters. Runs in its own transaction
+    AFTER the payment's INSERT has committed (the overdue amount checks whether it is the
+    member's first payment). refreshed_at is read_refreshed_at() from before the payment's
+    transaction; nothing is changed if a refresh ran since (it may have counted the payment).
+    Returns True if the payment was added.
+    """
+    cursor.execute(SQL["payment_counters"],
+                   payment_counter_params(installment_id_bytes, subscriber_id_bytes, amount_paid, refreshed_at,
+                                          now or datetime.datetime.now()))
+    return cursor.rowcount > 0
+
+
+def write_refresh_counters(cursor, now=None):
+    """Write operation: recomputes every counter from the base tables."""
+    now = now or datetime.datetime.now()
+    today, month_start, hour_start, previous_hour_start = _buckets(now)
+    day_start = datetime.datetime.combine(today, datetime.time.min)
+
+    # Take the row lock (MySQL row lock, SQLite write lock) before reading the totals, and
+    # change refreshedAt: counter updates waiting on the lock then find it changed and skip
+    # their payment, which committed before these totals are read and is counted in them
+    cursor.execute("UPDATE DashboardCounters SET refreshedAt = %s WHERE id = 1", (now,))
+    if cursor.rowcount == 0:
+        cursor.execute("INSERT INTO DashboardCounters (id, refreshedAt) VALUES (1, %s)", (now,))
+
+    cursor.execute("""SELECT
+                          COALESCE(SUM(CASE WHEN paymentDate >= %s THEN amountPaid ELSE 0 END), 0),
+                          COALESCE(SUM(CASE WHEN paymentDate >= %s THEN 1 ELSE 0 END), 0),
+                          COALESCE(SUM(amountPaid), 0),
+                          COALESCE(SUM(CASE WHEN paymentDate >= %s THEN 1 ELSE 0 END), 0),
+                          COALESCE(SUM(CASE WHEN paymentDate >= %s AND paymentDate < %s THEN 1 ELSE 0 END), 0)
+                      FROM InstallmentPayments
+                      WHERE paymentDate >= %s""",
+                   (day_start, day_start, hour_start, previous_hour_start, hour_start,
+                    datetime.datetime.combine(month_start, datetime.time.min)))
+    collected_today, payments_today, collected_month, payments_this_hour, payments_last_hour = cursor.fetchone()
+
+    # Monthly share of every member who has not paid an installment that is past due
+    cursor.execute("""SELECT COALESCE(SUM(ROUND(g.value / g.duration, 2)), 0)
+                      FROM Installments i
+                      JOIN ChitGroups g ON g.id = i.groupId
+                      JOIN Enrollments e ON e.groupId = i.groupId
+                      WHERE i.dueDate < %s
+                        AND i.isCompleted = FALSE
+                        AND g.isActive = TRUE
+                        AND NOT EXISTS (
+                            SELECT 1 FROM InstallmentPayments p
+                            WHERE p.installmentId = i.id AND p.subscriberId = e.subscriberId
+                        )""", (today,))
+    overdue_amount = cursor.fetchone()[0]
+
+    cursor.execute("""SELECT COUNT(*) FROM (
+                          SELECT i.groupId
+                          FROM Installments i
+                          JOIN ChitGroups g ON g.id = i.groupId
+                          WHERE g.isActive = TRUE
+                          GROUP BY i.groupId
+                          HAVING SUM(CASE WHEN i.isCompleted THEN 0 ELSE 1 END) BETWEEN 1 AND %s
+                      ) nearing""", (NEARING_COMPLETION_INSTALLMENTS,))
+    groups_nearing_completion = cursor.fetchone()[0]
+
+    cursor.execute("""UPDATE DashboardCounters SET
+                          collectedDate = %s, collectedToday = %s, paymentsToday = %s,
+                          monthStart = %s, collectedMonth = %s,
+                          hourStart = %s, paymentsThisHour = %s, paymentsLastHour = %s,
+                          overdueAmount = %s, groupsNearingCompletion = %s, updatedAt = %s
+                      WHERE id = 1""",
+                   (today, money.to_decimal(collected_today), int(payments_today),
+                    month_start, money.to_decimal(collected_month),
+                    hour_start, int(payments_this_hour), int(payments_last_hour),
+                    money.to_decimal(overdue_amount), int(groups_nearing_completion), now))
+
+
+def read_counters(conn):
+    """Reads the counters row as a dict (None if it doesn't exist yet)."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT {', '.join(COUNTER_COLUMNS)} FROM DashboardCounters WHERE id = 1")
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def needs_refresh(counters, now=None):
+    """True if the counters were never computed, were computed before today, or longer than FULL_REFRESH_SECONDS ago."""
+    now = now or datetime.datetime.now()
+    refreshed_at = counters["refreshedAt"] if counters else None
+    return (refreshed_at is None or refreshed_at.date() != now.date()
+            or (now - refreshed_at).total_seconds() > FULL_REFRESH_SECONDS)
+
+
+def current_figures(counters, now=None):
+    """
+    The dashboard figures from a counters row. Day, month and hour totals belong to the
+    bucket they were last updated in, so they count as 0 once that bucket has passed.
+    """
+    now = now or datetime.datetime.now()
+    today, month_start, hour_start, previous_hour_start = _buckets(now)
+    same_hour = counters["hourStart"] == hour_start
+    return {
+        "collectedToday": money.to_decimal(counters["collectedToday"] if counters["collectedDate"] == today else 0),
+        "paymentsToday": counters["paymentsToday"] if counters["collectedDate"] == today else 0,
+        "collectedMonth": money.to_decimal(counters["collectedMonth"] if counters["monthStart"] == month_start else 0),
+        "paymentsThisHour": counters["paymentsThisHour"] if same_hour else 0,
+        "paymentsLastHour": (counters["paymentsLastHour"] if same_hour
+                             else counters["paymentsThisHour"] if counters["hourStart"] == previous_hour_start else 0),
+        "overdueAmount": money.to_decimal(max(counters["overdueAmount"], 0)),
+        "groupsNearingCompletion": counters["groupsNearingCompletion"],
+        "updatedAt": counters["updatedAt"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the dashboard counters from the base tables.")
+    parser.add_argument("--refresh", action="store_true", required=True)
+    parser.add_argument("--sqlite", help="Use this SQLite file instead of the database in secrets.toml")
+    parser.add_argument("--tenant", help="Use this tenant's database instead of the database in secrets.toml (see tenants.py)")
+    args = parser.parse_args()
+
+    import storage
+    from transactions import UnitOfWork
+    if args.sqlite:
+        conn = storage.SQLiteBackend(args.sqlite).connect()
+    else:
+        import streamlit as st # Only needed to read .streamlit/secrets.toml
+        if args.tenant:
+            import tenants
+            try:
+                conn = tenants.tenant_backend_from_secrets(st.secrets, args.tenant).connect()
+            except Error as e:
+                parser.error(str(e))
+        else:
+            conn = storage.backend_from_secrets(st.secrets).connect()
+    try:
+        with UnitOfWork(conn) as uow:
+            uow.add(write_refresh_counters)
+        print(f"Dashboard counters: {current_figures(read_counters(conn))}")
+    except Error as e:
+        print(f"Refresh failed: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""
+Date helpers shared by the app and the command line tools.
+"""
+
+import calendar
+import datetime
+
+
+def add_months(sourcedate, months):
+    """
+    Adds months to a date, keeping the day of the month where the target month has it and
+    using the month's last day otherwise (Jan 31 + 1 month = Feb 28/29). This is the rule
+    used for the due dates of generated installments.
+    """
+    month = sourcedate.month - 1 + months
+    year = sourcedate.year + month // 12
+    month = month % 12 + 1
+    day = min(sourcedate.day, calendar.monthrange(year, month)[1])
+    return datetime.date(year, month, day)
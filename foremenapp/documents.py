@@ -0,0 +1,350 @@
+"""
+Receipts and monthly statements for Foremen Choice Digital Records Manager.
+
+After a collection day this batch job writes:
+
+- a receipt for every InstallmentPayments row of the day, and
+- a monthly statement for every enrollment in an active group (payments of the month,
+  total paid to date and outstanding dues), for the month of that day.
+
+Each kind of document is read with ONE streaming query (rows are fetched in batches, never
+all at once). The rows are handed in chunks to a process pool that renders them to HTML
+(or PDF) files. Every worker loads the templates and stylesheet from templates/ once, when
+it starts, and reuses them (and, for PDF, the parsed stylesheet and fonts) for every
+document it renders. Chunks in flight are limited, so memory stays flat however many
+documents a run produces.
+
+Output, under --out (existing files are overwritten, so a run can simply be repeated):
+    <out>/<date>/receipts/receipt-<payment id>.html
+    <out>/<date>/statements/statement-<YYYY-MM>-<enrollment id>.html
+    <out>/<date>/manifest.csv          # kind, row id, subscriber, phone, file
+
+PDF output needs WeasyPrint (pip install weasyprint); HTML needs nothing extra.
+
+Run from the foremenapp folder (database from .streamlit/secrets.toml, or --sqlite):
+    python documents.py                                   # today's receipts and this month's statements
+    python documents.py --date 2025-06-10 --out documents --processes 8
+    python documents.py --receipts-only --format pdf
+    python documents.py --tenant acme                     # one tenant's database (see tenants.py)
+"""
+
+import argparse
+import csv
+import datetime
+import html
+import os
+import string
+import time
+import uuid
+from collections import deque
+from multiprocessing import Pool
+
+from mysql.connector import Error
+
+import money
+import storage
+
+try:
+    import weasyprint # Optional: only needed for --format pdf
+    from weasyprint.text.fonts import FontConfiguration
+    HAVE_WEASYPRINT = True
+except ImportError:
+    HAVE_WEASYPRINT = False
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+DEFAULT_BUSINESS_NAME = "Foremen Choice"
+DEFAULT_CHUNK_SIZE = 200 # Documents per task
+FORMATS = ("html", "pdf")
+
+RECEIPTS_QUERY = """
+    SELECT p.id AS paymentId, p.paymentDate, p.amountPaid, p.notes,
+           s.name AS subscriberName, s.phoneNumber,
+           g.name AS groupName, i.monthNumber, i.dueDate, e.assignedChitNumber
+    FROM InstallmentPayments p
+    JOIN Installments i ON i.id = p.installmentId
+    JOIN ChitGroups g ON g.id = i.groupId
+    JOIN Subscribers s ON s.id = p.subscriberId
+    LEFT JOIN Enrollments e ON e.groupId = i.groupId AND e.subscriberId = p.subscriberId
+    WHERE p.paymentDate >= %s AND p.paymentDate < %s
+    ORDER BY p.paymentDate, p.id"""
+
+# One row per payment of the month (or one row with NULL payment columns for an enrollment
+# without payments), ordered by enrollment so the rows of a statement arrive together.
+STATEMENTS_QUERY = """
+    SELECT e.id AS enrollmentId, e.assignedChitNumber,
+           s.name AS subscriberName, s.phoneNumber, s.address,
+           g.name AS groupName, g.value, g.duration,
+           (SELECT COUNT(*) FROM Installments d WHERE d.groupId = e.groupId AND d.dueDate < %s) AS installmentsDue,
+           (SELECT COALESCE(SUM(t.amountPaid), 0)
+            FROM InstallmentPayments t
+            JOIN Installments ti ON ti.id = t.installmentId
+            WHERE t.subscriberId = e.subscriberId AND ti.groupId = e.groupId AND t.paymentDate < %s) AS paidToDate,
+           p.id AS paymentId, p.paymentDate, p.amountPaid, p.notes, i.monthNumber
+    FROM Enrollments e
+    JOIN ChitGroups g ON g.id = e.groupId
+    JOIN Subscribers s ON s.id = e.subscriberId
+    LEFT JOIN (InstallmentPayments p JOIN Installments i ON i.id = p.installmentId)
+        ON i.groupId = e.groupId AND p.subscriberId = e.subscriberId
+       AND p.paymentDate >= %s AND p.paymentDate < %s
+    WHERE g.isActive = TRUE
+    ORDER BY e.id, p.paymentDate"""
+
+
+def _uuid(value):
+    return str(uuid.UUID(bytes=bytes(value)))
+
+
+def _text(value):
+    """Escaped text for the templates ('' for None)."""
+    return html.escape("" if value is None else str(value))
+
+
+def _amount(value):
+    return f"{money.to_decimal(value):,.2f}"
+
+
+def _month_bounds(day):
+    """(first day of the month, first day of the next month) of a date."""
+    start = day.replace(day=1)
+    return start, (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+# --- Worker Side ---
+# Templates, stylesheet and (for PDF) the parsed stylesheet and font configuration are
+# loaded once per worker process and shared by every document it renders.
+
+_templates = None
+_options = None
+
+
+def _init_worker(template_dir, output_format, business_name):
+    global _templates, _options
+    def load(name):
+        with open(os.path.join(template_dir, name), encoding="utf-8") as f:
+            return f.read()
+    css = load("style.css")
+    _templates = {
+        "receipt": string.Template(load("receipt.html")),
+        "statement": string.Template(load("statement.html")),
+        "statement_row": string.Template(load("statement_row.html")),
+    }
+    _options = {"format": output_format, "business_name": html.escape(business_name)}
+    if output_format == "pdf":
+        _options["fonts"] = FontConfiguration()
+        _options["stylesheets"] = [weasyprint.CSS(string=css, font_config=_options["fonts"])]
+        _options["style"] = "" # Applied as the pre-parsed stylesheet instead
+    else:
+        _options["style"] = f"<style>\n{css}</style>" # Inlined, so every file is self-contained
+
+
+def _write(path, document):
+    if _options["format"] == "pdf":
+        weasyprint.HTML(string=document).write_pdf(path, stylesheets=_options["stylesheets"],
+                                                   font_config=_options["fonts"])
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(document)
+
+
+def render_receipt(payment):
+    """Fills the receipt template for one payment row."""
+    payment_id = _uuid(payment["paymentId"])
+    return _templates["receipt"].substitute(
+        style=_options["style"], businessName=_options["business_name"],
+        receiptNumber=f"R-{payment['paymentDate']:%Y%m%d}-{payment_id[:8].upper()}",
+        paymentId=payment_id,
+        paymentDate=f"{payment['paymentDate']:%d %b %Y %H:%M}",
+        subscriberName=_text(payment["subscriberName"]), phoneNumber=_text(payment["phoneNumber"]),
+        groupName=_text(payment["groupName"]), chitNumber=_text(payment["assignedChitNumber"] or "-"),
+        monthNumber=payment["monthNumber"], dueDate=f"{payment['dueDate']:%d %b %Y}",
+        notes=_text(payment["notes"] or "-"), amountPaid=_amount(payment["amountPaid"]))
+
+
+def render_statement(statement):
+    """Fills the statement template for one enrollment (dict with the enrollment's columns and its 'payments')."""
+    value_paise = money.to_paise(statement["value"])
+    installment = money.installment_paise(value_paise, statement["duration"])
+    paid_to_date = money.to_paise(statement["paidToDate"])
+    dues = max(installment * statement["installmentsDue"] - paid_to_date, 0)
+    rows = "".join(_templates["statement_row"].substitute(
+        paymentDate=f"{payment['paymentDate']:%d %b %Y}", monthNumber=payment["monthNumber"],
+        notes=_text(payment["notes"]), amountPaid=_amount(payment["amountPaid"]))
+        for payment in statement["payments"])
+    paid_this_month = money.paise_array(payment["amountPaid"] for payment in statement["payments"]).sum()
+    return _templates["statement"].substitute(
+        style=_options["style"], businessName=_options["business_name"],
+        period=f"{statement['periodStart']:%B %Y}", periodEnd=f"{statement['periodEnd']:%d %b %Y}",
+        subscriberName=_text(statement["subscriberName"]), phoneNumber=_text(statement["phoneNumber"]),
+        address=_text(statement["address"] or "-"),
+        groupName=_text(statement["groupName"]), chitNumber=statement["assignedChitNumber"],
+        value=_amount(statement["value"]), duration=statement["duration"], installment=_amount(money.from_paise(installment)),
+        paymentRows=rows.rstrip("\n") or '  <tr><td colspan="4">No payments this month</td></tr>',
+        paidThisMonth=_amount(money.from_paise(paid_this_month)),
+        installmentsDue=statement["installmentsDue"],
+        paidToDate=_amount(money.from_paise(paid_to_date)), dues=_amount(money.from_paise(dues)))
+
+
+def render_chunk(task):
+    """Renders one chunk of receipts or statements to files. Returns the manifest rows of the files written."""
+    kind, directory, items = task
+    written = []
+    for item in items:
+        if kind == "receipt":
+            row_id = _uuid(item["paymentId"])
+            path = os.path.join(directory, f"receipt-{row_id}.{_options['format']}")
+            _write(path, render_receipt(item))
+        else:
+            row_id = _uuid(item["enrollmentId"])
+            path = os.path.join(directory, f"statement-{item['periodStart']:%Y-%m}-{row_id}.{_options['format']}")
+            _write(path, render_statement(item))
+        written.append((kind, row_id, item["subscriberName"], item["phoneNumber"], path))
+    return written
+
+
+# --- Streaming ---
+
+def stream_rows(conn, query, params, batch_size):
+    """Yields the rows of a query as dicts, fetched batch_size at a time."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def day_payments(conn, day, batch_size=DEFAULT_CHUNK_SIZE):
+    """Streams the payments recorded on a day (receipt rows)."""
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return stream_rows(conn, RECEIPTS_QUERY, (start, start + datetime.timedelta(days=1)), batch_size)
+
+
+def month_statements(conn, day, batch_size=DEFAULT_CHUNK_SIZE):
+    """Streams one statement per enrollment for the month of a day, with the month's payments grouped in."""
+    period_start, next_month = _month_bounds(day)
+    month_start = datetime.datetime.combine(period_start, datetime.time.min)
+    month_end = datetime.datetime.combine(next_month, datetime.time.min)
+    statement = None
+    for row in stream_rows(conn, STATEMENTS_QUERY, (next_month, month_end, month_start, month_end), batch_size):
+        if statement is None or statement["enrollmentId"] != row["enrollmentId"]:
+            if statement is not None:
+                yield statement
+            statement = {key: row[key] for key in ("enrollmentId", "assignedChitNumber", "subscriberName", "phoneNumber",
+                                                   "address", "groupName", "value", "duration", "installmentsDue", "paidToDate")}
+            statement.update(periodStart=period_start, periodEnd=next_month - datetime.timedelta(days=1), payments=[])
+        if row["paymentId"] is not None:
+            statement["payments"].append({key: row[key] for key in ("paymentDate", "monthNumber", "notes", "amountPaid")})
+    if statement is not None:
+        yield statement
+
+
+def chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_documents(backend, day, out_dir, receipts=True, statements=True, output_format="html",
+                       processes=None, chunk_size=DEFAULT_CHUNK_SIZE, business_name=DEFAULT_BUSINESS_NAME,
+                       template_dir=TEMPLATE_DIR, progress=None):
+    """
+    Writes the day's receipts and/or the month's statements under out_dir/<day>/ in parallel.
+    Returns the manifest rows (kind, row id, subscriber, phone, file) of all documents written.
+    progress(documents written) is called after every chunk.
+    """
+    day_dir = os.path.join(out_dir, day.isoformat())
+    jobs = []
+    if receipts:
+        jobs.append(("receipt", os.path.join(day_dir, "receipts"), day_payments))
+    if statements:
+        jobs.append(("statement", os.path.join(day_dir, "statements"), month_statements))
+    processes = processes or os.cpu_count()
+    max_in_flight = processes * 2 # Chunks queued ahead of the workers: keeps them busy without buffering the whole day
+
+    manifest = []
+    conn = backend.connect()
+    try:
+        with Pool(processes, initializer=_init_worker, initargs=(template_dir, output_format, business_name)) as pool:
+            for kind, directory, source in jobs:
+                os.makedirs(directory, exist_ok=True)
+                in_flight = deque()
+                for chunk in chunks(source(conn, day, chunk_size), chunk_size):
+                    in_flight.append(pool.apply_async(render_chunk, ((kind, directory, chunk),)))
+                    while len(in_flight) >= max_in_flight or (in_flight and in_flight[0].ready()):
+                        manifest.extend(in_flight.popleft().get())
+                        if progress:
+                            progress(len(manifest))
+                while in_flight:
+                    manifest.extend(in_flight.popleft().get())
+                    if progress:
+                        progress(len(manifest))
+                conn.rollback() # End the read transaction of this query
+    finally:
+        conn.close()
+
+    with open(os.path.join(day_dir, "manifest.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["kind", "id", "subscriber", "phone", "file"])
+        writer.writerows(manifest)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate receipts for a day's payments and monthly statements per enrollment.")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help="Collection day, YYYY-MM-DD (default today); statements are for its month")
+    parser.add_argument("--out", default="documents", help="Output folder")
+    parser.add_argument("--format", choices=FORMATS, default="html")
+    kinds = parser.add_mutually_exclusive_group()
+    kinds.add_argument("--receipts-only", action="store_true")
+    kinds.add_argument("--statements-only", action="store_true")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Rendering worker processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Documents per task")
+    parser.add_argument("--business-name", default=DEFAULT_BUSINESS_NAME, help="Name printed on every document")
+    parser.add_argument("--templates", default=TEMPLATE_DIR, help="Folder with receipt.html, statement.html, statement_row.html and style.css")
+    parser.add_argument("--sqlite", help="Use this SQLite file instead of the database in secrets.toml")
+    parser.add_argument("--tenant", help="Use this tenant's database instead of the database in secrets.toml (see tenants.py)")
+    args = parser.parse_args()
+    if args.format == "pdf" and not HAVE_WEASYPRINT:
+        parser.error("--format pdf needs WeasyPrint: pip install weasyprint")
+
+    if args.sqlite:
+        backend = storage.SQLiteBackend(args.sqlite, mode="ro") # Read only: the file is not changed
+    else:
+        import streamlit as st # Only needed to read .streamlit/secrets.toml
+        if args.tenant:
+            import tenants
+            try:
+                backend = tenants.tenant_backend_from_secrets(st.secrets, args.tenant)
+            except Error as e:
+                parser.error(str(e))
+        else:
+            backend = storage.backend_from_secrets(st.secrets)
+
+    started = time.perf_counter()
+    try:
+        manifest = generate_documents(backend, args.date, args.out,
+                                      receipts=not args.statements_only, statements=not args.receipts_only,
+                                      output_format=args.format, processes=args.processes, chunk_size=args.chunk_size,
+                                      business_name=args.business_name, template_dir=args.templates,
+                                      progress=lambda done: print(f"\rWrote {done} documents", end="", flush=True))
+    except Error as e:
+        print(f"\nGeneration failed: {e}")
+        return
+    seconds = time.perf_counter() - started
+    receipts = sum(1 for row in manifest if row[0] == "receipt")
+    print(f"\n{receipts} receipts and {len(manifest) - receipts} statements in {seconds:.1f}s "
+          f"({len(manifest) / seconds if seconds else 0:.0f} documents/s) under {os.path.join(args.out, args.date.isoformat())}")
+
+
+if __name__ == "__main__":
+    main()
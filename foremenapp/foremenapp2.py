@@ -1,4 +1,4 @@
-# --- Da
+"""
 Streamlit application for Foremen Choice Digital Records Manager.
 Connects to a MySQL database.
 """
@@ -8,68 +8,243 @@ import mysql.connector
 from mysql.connector import Error
 import uuid # Required for generating UUIDs
 import datetime # Required for date/time handling
-# You might need dateutil for more robust date calculations (e.g., adding months precisely)
-# pip install python-dateutil
-# from dateutil.relativedelta import relativedelta
+import time # Used for read-your-writes routing
+import storage # Database backends (central MySQL or local SQLite branch store)
+import archive # Archive tables for completed groups
+import audit # Write-behind audit trail
+import counters # Live dashboard counters
+from dates import add_months # Due dates of generated installments
+import money # Exact money arithmetic (integer paise)
+import reminders # Dues reminder outbox
+import statements # Prepared statements for the hot queries
+import tenants # Tenant to shard routing
+from statements import REGISTRY as STATEMENTS
+from transactions import UnitOfWork, METRICS as TRANSACTION_METRICS # Batched, retried write transactions
 
 # --- Database Connection ---
 
 @st.cache_resource # Cache the database connection to avoid reconnecting on every rerun
-def get_db_connection():
+def get_single_database_connection():
     """
-    Establishes and caches the connection to the MySQL database.
+    Establishes and caches the connection to the database.
     This function should ONLY connect and return the connection object.
     Database operations (cursor, execute, commit, fetch, close) happen elsewhere.
     Credentials are read from .streamlit/secrets.toml
+
+    By default this is the central MySQL server ([mysql] section). Branches with a poor
+    link can set backend = "sqlite" in the [storage] section to write to a local SQLite
+    file instead, and run sync.py to exchange changes with the central server.
     """
     try:
-        # Connect to the MySQL database using credentials from Streamlit Secrets
+        # Pick the backend (central MySQL or local SQLite) from Streamlit Secrets
         # Ensure you have a .streamlit/secrets.toml file with your database credentials
         # Access secrets using st.secrets["section_name"]["key_name"]
-        conn = mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],     # Get host from secrets
-            database=st.secrets["mysql"]["database"], # Get database name from secrets
-            user=st.secrets["mysql"]["user"],     # Get user from secrets
-            password=st.secrets["mysql"]["password"], # Get password from secrets
-            # Optional: Uncomment the line below and add port if needed in secrets.toml
-            # port=st.secrets["mysql"]["port"]
-        )
+        backend = storage.backend_from_secrets(st.secrets)
+        conn = backend.connect()
         # Check if connection was successful
         if conn.is_connected():
-            print("Successfully connected to MySQL database") # Optional: Log success
+            print(f"Successfully connected to {backend.dialect} database") # Optional: Log success
             return conn # <<< ONLY return the connection object
 
         else:
             # This case might occur if connect() didn't raise an exception but isn't connected
-            print("Failed to connect to MySQL database (is_connected() is False)") # Optional: Log failure
+            print("Failed to connect to database (is_connected() is False)") # Optional: Log failure
             # Display error in Streamlit
             st.error("Database connection failed.")
             return None # <<< Return None if connection failed without exception
 
     except Error as e:
         # Handle connection errors (e.g., incorrect credentials, DB not running)
-        print(f"Error connecting to MySQL database: {e}") # Optional: Log error details
+        print(f"Error connecting to database: {e}") # Optional: Log error details
         st.error(f"Database connection error: Unable to connect. Please check your credentials and database status. Details: {e}")
         return None # <<< Return None on exception
 
     # No finally block needed here as we are not managing cursor/transaction within this function
 
+def get_db_connection():
+    """
+    Returns the connection all data functions use: the logged-in tenant's database when
+    tenants are configured (see Tenant Routing below), otherwise the single database above.
+    """
+    if "tenants" not in st.secrets:
+        return get_single_database_connection()
+    route = current_tenant_route()
+    if route is None:
+        return None
+    try:
+        return get_tenant_connection(route)
+    except Error as e:
+        print(f"Error connecting to tenant database {route.database} on {route.shard}: {e}") # Optional: Log error
+        st.error(f"Database connection error: Unable to connect to your records. Details: {e}")
+        return None
+
 
-# --- Helper Function for Date Calculation (Simplified) ---
-# Note: This is a basic function. For production, consider using the 'dateutil' library
-# (install via pip install python-dateutil) for more accurate month addition,
-# especially when dealing with end-of-month dates.
-def add_months(sourcedate, months):
-    """Adds months to a given date (simplified)."""
-    import calendar
-    month = sourcedate.month - 1 + months
-    year = sourcedate.year + month // 12
-    month = month % 12 + 1
-    day = min(sourcedate.day, calendar.monthrange(year,month)[1])
-    return datetime.date(year, month, day)
-    # Alternative using dateutil:
-    # from dateutil.relativedelta import relativedelta
-    # return sourcedate + relativedelta(months=+months)
+# --- Tenant Routing ---
+# One deployment can serve several foremen (tenants), each with its own database on one of
+# several MySQL servers (shards). Configured by the [tenants], [tenant_directory] and
+# [shards.*] sections of .streamlit/secrets.toml (see tenants.py, which also provisions and
+# moves tenants). The logged-in user's email picks the tenant; connections come from a pool
+# per shard and are cached per tenant like the single database connection.
+
+# Tenants with an open connection in this process (least recently used are released). Released
+# connections go back to their shard's pool after tenants.RETIRE_GRACE_SECONDS, so the pool must
+# be larger than this (see tenants.DEFAULT_POOL_SIZE).
+MAX_CACHED_TENANT_CONNECTIONS = 20
+
+@st.cache_resource # One router (directory cache and shard pools) per process
+def get_tenant_router():
+    """Creates the tenant router from secrets."""
+    router = tenants.router_from_secrets(st.secrets)
+    if router.pool_size <= MAX_CACHED_TENANT_CONNECTIONS:
+        print(f"[tenants] pool_size {router.pool_size} is not above the {MAX_CACHED_TENANT_CONNECTIONS} cached tenant "
+              f"connections: tenants on a busy shard will wait for connections") # Optional: Log warning
+    return router
+
+def current_tenant_route():
+    """The logged-in user's tenant (tenants.Route), or None with an error shown if there is none."""
+    router = get_tenant_router()
+    try:
+        if st.user.get("is_logged_in"):
+            tenant_id = router.tenant_for_user(st.user.get("email") or "")
+        else:
+            tenant_id = st.secrets["tenants"].get("default_tenant")
+        route = router.route(tenant_id) if tenant_id else None
+    except Error as e:
+        st.error(f"Tenant directory error: {e}")
+        return None
+    if route is None:
+        st.error("Your login is not linked to a foreman's records. Please log in with a registered account.")
+    return route
+
+def release_tenant_connection(conn):
+    """Called when a cached tenant connection is evicted: forgets its prepared statements and returns it to the pool."""
+    STATEMENTS.discard(conn)
+    get_tenant_router().retire(conn)
+
+@st.cache_resource(max_entries=MAX_CACHED_TENANT_CONNECTIONS, on_release=release_tenant_connection)
+def get_tenant_connection(route):
+    """A pooled connection to the tenant's database, shared by the tenant's sessions."""
+    conn = get_tenant_router().connect(route)
+    print(f"Connected to tenant {route.tenant_id} ({route.database} on {route.shard})") # Optional: Log success
+    return conn
+
+
+# --- Read Replica Routing ---
+# Listing, status and report queries (the get_* helpers and the Dashboard) can be served by a
+# MySQL read replica so they don't compete with payment inserts on the primary.
+# Configure it with an optional [mysql_replica] section in .streamlit/secrets.toml:
+#     [mysql_replica]
+#     host = "replica-host"
+#     port = 3307
+#     database = "foremen"
+#     user = "foremen_ro"
+#     password = "..."
+#     max_lag_seconds = 5      # Use the primary when the replica is further behind than this
+# Without that section (or in SQLite branch mode) every query uses get_db_connection().
+
+REPLICA_HEALTH_CHECK_SECONDS = 5 # How long a replica health check result is reused
+
+def setup_replica_session(conn):
+    """Session settings for a replica connection. A reconnect starts a new session, so it is run again after every reconnect."""
+    # Autocommit so every read sees the latest replicated data instead of an old transaction snapshot
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET SESSION TRANSACTION READ ONLY") # Guard against writes reaching the replica
+    finally:
+        cursor.close()
+
+@st.cache_resource # One cached replica connection, like get_db_connection()
+def get_replica_connection():
+    """Connects to the read replica. Returns None if no replica is configured or it is unreachable."""
+    if "mysql_replica" not in st.secrets or "tenants" in st.secrets or storage.backend_from_secrets(st.secrets).dialect != "mysql":
+        return None # The replica belongs to the single [mysql] database
+    try:
+        conn = storage.mysql_backend_from_secrets(st.secrets, section="mysql_replica").connect()
+        setup_replica_session(conn)
+        print("Successfully connected to MySQL read replica") # Optional: Log success
+        return conn
+    except Error as e:
+        # Not fatal: reads fall back to the primary
+        print(f"Error connecting to MySQL read replica, using primary for reads: {e}") # Optional: Log error
+        return None
+
+@st.cache_data(ttl=REPLICA_HEALTH_CHECK_SECONDS) # Don't check replication status on every query
+def replica_is_usable():
+    """Checks the replica is connected and replicating with acceptable lag."""
+    conn = get_replica_connection()
+    if conn is None:
+        return False
+    max_lag = st.secrets["mysql_replica"].get("max_lag_seconds", 5)
+    try:
+        if not conn.is_connected():
+            conn.reconnect(attempts=1, delay=0)
+            setup_replica_session(conn)
+        lag = storage.replica_lag_seconds(conn)
+    except Error as e:
+        print(f"Read replica unavailable, using primary for reads: {e}") # Optional: Log error
+        return False
+    if lag is None or lag > max_lag:
+        print(f"Read replica lag is {lag} seconds, using primary for reads") # Optional: Log lag
+        return False
+    return True
+
+def mark_write():
+    """Records that this session just wrote to the primary (see get_read_connection)."""
+    st.session_state["last_write_at"] = time.time()
+
+def get_read_connection():
+    """
+    Returns the connection read-only queries should use: the read replica when it is
+    healthy, otherwise the primary. A session that wrote recently keeps reading from the
+    primary for max_lag_seconds so it always sees its own changes (read-your-writes).
+    """
+    if not replica_is_usable():
+        return get_db_connection()
+    max_lag = st.secrets["mysql_replica"].get("max_lag_seconds", 5)
+    if time.time() - st.session_state.get("last_write_at", 0) < max_lag:
+        return get_db_connection()
+    return get_replica_connection()
+
+
+# --- Audit Trail ---
+# Every committed write is recorded in the audit trail (see audit.py). Events are buffered in
+# this process and written in batches by a background thread, so auditing adds no commits
+# to the write path. Optional settings go in an [audit] section of .streamlit/secrets.toml.
+
+def close_audit_buffer(buffer):
+    """Called when a tenant's cached audit buffer is evicted: writes what is left and stops its thread."""
+    buffer.close()
+
+# One buffer (and flusher thread) shared by all sessions, per tenant with tenants. Keyed by tenant,
+# not by route: the buffer's sink follows the tenant to a new shard and waits out a move.
+@st.cache_resource(max_entries=MAX_CACHED_TENANT_CONNECTIONS, on_release=close_audit_buffer)
+def get_audit_buffer(tenant_id=None):
+    """Creates the process-wide audit buffer, writing to the tenant's database when a tenant id is given."""
+    config = dict(st.secrets.get("audit", {}))
+    if tenant_id is None:
+        return audit.buffer_from_config(config, storage.backend_from_secrets(st.secrets))
+    # Each tenant's log files are kept apart (replay them into that tenant's database)
+    config["file_path"] = f"{tenant_id}_{config.get('file_path', audit.DEFAULT_FILE_PATH)}"
+    config["fallback_path"] = f"{tenant_id}_{config.get('fallback_path', audit.DEFAULT_FALLBACK_PATH)}"
+    backend = get_tenant_router().backend(tenant_id)
+    # Paused (events kept in the buffer) while the tenant is read-only during a move
+    return audit.buffer_from_config(config, backend, target=backend.writable_route)
+
+def current_tenant_id():
+    """The logged-in user's tenant id, or None without tenants (or without a tenant)."""
+    route = current_tenant_route() if "tenants" in st.secrets else None
+    return route.tenant_id if route else None
+
+def current_user():
+    """Name recorded in the audit trail: the logged-in user with Streamlit authentication, otherwise the name entered in the sidebar."""
+    if st.user.get("is_logged_in"):
+        return st.user.get("email") or st.user.get("name") or "unknown"
+    return st.session_state.get("audit_user_name") or "unknown"
+
+def audit_write(action, table, row_id, before=None, after=None):
+    """Records a committed write in the audit trail (buffered, never blocks on the database)."""
+    get_audit_buffer(current_tenant_id()).record(current_user(), action, table, row_id, before=before, after=after)
 
 
 # --- Database Interaction Functions ---
@@ -78,52 +253,56 @@ def add_months(sourcedate, months):
 
 # --- ChitGroup Functions ---
 
+def write_group(cursor, name, value, num_subscribers, duration, start_date, commission):
+    """Write operation: inserts a Chit Group using the given cursor (no commit). Returns the new group ID."""
+    # Generate a UUID for the new group
+    group_id = uuid.uuid4().bytes # Use .bytes for BINARY(16) in MySQL
+
+    # SQL query to insert data into the ChitGroups table
+    query = """INSERT INTO ChitGroups (id, name, value, numberOfSubscribers, duration, startDate, foremanCommissionPercentage, isActive)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
+    # Prepare the values tuple, ensuring types match SQL columns
+    values = (
+        group_id, # BINARY(16)
+        name, # VARCHAR
+        value, # DECIMAL(14,2)
+        num_subscribers, # SMALLINT
+        duration, # SMALLINT
+        start_date, # DATE (Python date/datetime objects are usually handled by connector)
+        commission, # DOUBLE (Optional, can be None)
+        True # BOOLEAN
+    )
+    # Execute the query with the values
+    cursor.execute(query, values)
+    return group_id
+
 def insert_group(name, value, num_subscribers, duration, start_date, commission):
     """Inserts a new Chit Group into the database."""
     conn = get_db_connection()
     if conn is None:
         return False # Indicate failure if connection failed
+    value = money.to_decimal(value) # Exact rupees and paise (the form returns a float)
 
-    cursor = None # Initialize cursor to None
     try:
-        cursor = conn.cursor()
-        # Generate a UUID for the new group
-        group_id = uuid.uuid4().bytes # Use .bytes for BINARY(16) in MySQL
-
-        # SQL query to insert data into the ChitGroups table
-        query = """INSERT INTO ChitGroups (id, name, value, numberOfSubscribers, duration, startDate, foremanCommissionPercentage, isActive)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-        # Prepare the values tuple, ensuring types match SQL columns
-        values = (
-            group_id, # BINARY(16)
-            name, # VARCHAR
-            value, # DOUBLE
-            num_subscribers, # SMALLINT
-            duration, # SMALLINT
-            start_date, # DATE (Python date/datetime objects are usually handled by connector)
-            commission, # DOUBLE (Optional, can be None)
-            True # BOOLEAN
-        )
-        # Execute the query with the values
-        cursor.execute(query, values)
-        conn.commit() # Commit the transaction to save changes to the database
+        # Run the insert as its own transaction (committed, retried on deadlocks/lock waits)
+        with UnitOfWork(conn) as uow:
+            uow.add(write_group, name, value, num_subscribers, duration, start_date, commission)
+        mark_write() # Keep this session's reads on the primary for a moment (read-your-writes)
+        audit_write("create", "ChitGroups", uow.results[0], after={
+            "name": name, "value": value, "numberOfSubscribers": num_subscribers, "duration": duration,
+            "startDate": start_date, "foremanCommissionPercentage": commission, "isActive": True})
         st.success(f"Chit Group '{name}' added successfully!") # Display success message in Streamlit
         return True # Indicate success
     except Error as e:
         # Handle specific MySQL errors if needed (e.g., duplicate entry)
         # print(f"Error adding Chit Group: {e}") # Optional: Log the error
+        # The transaction has already been rolled back by run_transaction
         st.error(f"Error adding Chit Group: {e}") # Display error in Streamlit
-        if conn:
-            conn.rollback() # Rollback changes if the transaction failed
         return False # Indicate failure
-    finally:
-        # Ensure the cursor is closed even if an error occurs
-        if cursor:
-            cursor.close()
 
 def get_all_chit_groups():
     """Fetches all active Chit Groups from the database."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return [] # Return empty list if connection failed
 
@@ -152,18 +331,17 @@ def get_all_chit_groups():
 
 def get_group_names_and_ids():
     """Fetches names and IDs of active Chit Groups for use in dropdowns/select boxes."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return []
 
     cursor = None
     try:
-        cursor = conn.cursor(dictionary=True)
-        query = "SELECT id, name FROM ChitGroups WHERE isActive = TRUE ORDER BY name"
+        cursor = conn.cursor() # Plain tuples: no dict needed to build (name, id) pairs
+        query = "SELECT name, id FROM ChitGroups WHERE isActive = TRUE ORDER BY name"
         cursor.execute(query)
-        results = cursor.fetchall()
          # Return a list of tuples [(name, id)] which is suitable for Streamlit selectbox options
-        return [(group['name'], group['id']) for group in results]
+        return [(name, bytes(group_id)) for name, group_id in cursor.fetchall()]
     except Error as e:
         st.error(f"Error fetching group names: {e}")
         return []
@@ -173,7 +351,7 @@ def get_group_names_and_ids():
 
 def get_group_details_by_id(group_id):
     """Fetches details for a single group by its ID."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return None
 
@@ -196,29 +374,35 @@ def get_group_details_by_id(group_id):
 
 # --- Subscriber Functions ---
 
+def write_subscriber(cursor, name, phone, address):
+    """Write operation: inserts a Subscriber using the given cursor (no commit). Returns the new subscriber ID."""
+    subscriber_id = uuid.uuid4().bytes
+    # Use NOW() or CURRENT_TIMESTAMP() in SQL, or pass Python datetime.datetime.now()
+    query = """INSERT INTO Subscribers (id, name, phoneNumber, address, createdDate, isActive)
+               VALUES (%s, %s, %s, %s, %s, %s)"""
+    values = (
+        subscriber_id, # BINARY(16)
+        name, # VARCHAR
+        phone, # VARCHAR
+        address, # TEXT (Optional)
+        datetime.datetime.now(), # DATETIME
+        True # BOOLEAN
+    )
+    cursor.execute(query, values)
+    return subscriber_id
+
 def insert_subscriber(name, phone, address):
     """Inserts a new Subscriber into the database."""
     conn = get_db_connection()
     if conn is None:
         return False
 
-    cursor = None
     try:
-        cursor = conn.cursor()
-        subscriber_id = uuid.uuid4().bytes
-        # Use NOW() or CURRENT_TIMESTAMP() in SQL, or pass Python datetime.datetime.now()
-        query = """INSERT INTO Subscribers (id, name, phoneNumber, address, createdDate, isActive)
-                   VALUES (%s, %s, %s, %s, %s, %s)"""
-        values = (
-            subscriber_id, # BINARY(16)
-            name, # VARCHAR
-            phone, # VARCHAR
-            address, # TEXT (Optional)
-            datetime.datetime.now(), # DATETIME
-            True # BOOLEAN
-        )
-        cursor.execute(query, values)
-        conn.commit()
+        with UnitOfWork(conn) as uow:
+            uow.add(write_subscriber, name, phone, address)
+        mark_write()
+        audit_write("create", "Subscribers", uow.results[0], after={
+            "name": name, "phoneNumber": phone, "address": address, "isActive": True})
         st.success(f"Subscriber '{name}' added successfully!")
         return True
     except Error as e:
@@ -228,16 +412,12 @@ def insert_subscriber(name, phone, address):
         else:
             st.error(f"Error adding Subscriber: {e}")
             # print(f"Error adding Subscriber: {e}") # Optional log
-        if conn: conn.rollback()
         return False
-    finally:
-        if cursor:
-            cursor.close()
 
 
 def get_all_subscribers():
     """Fetches all active Subscribers from the database."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return []
 
@@ -262,18 +442,17 @@ def get_all_subscribers():
 
 def get_subscriber_names_and_ids():
     """Fetches names and IDs of active Subscribers for dropdowns."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return []
 
     cursor = None
     try:
-        cursor = conn.cursor(dictionary=True)
-        query = "SELECT id, name FROM Subscribers WHERE isActive = TRUE ORDER BY name"
+        cursor = conn.cursor()
+        query = "SELECT name, id FROM Subscribers WHERE isActive = TRUE ORDER BY name"
         cursor.execute(query)
-        results = cursor.fetchall()
          # Return a list of tuples [(name, id)]
-        return [(sub['name'], sub['id']) for sub in results]
+        return [(name, bytes(subscriber_id)) for name, subscriber_id in cursor.fetchall()]
     except Error as e:
         st.error(f"Error fetching subscriber names: {e}")
         return []
@@ -283,28 +462,35 @@ def get_subscriber_names_and_ids():
 
 # --- Enrollment Functions ---
 
+def write_enrollment(cursor, subscriber_id_bytes, group_id_bytes, assigned_number, join_date):
+    """Write operation: inserts an Enrollment using the given cursor (no commit). Returns the new enrollment ID."""
+    enrollment_id = uuid.uuid4().bytes # UUID for the enrollment record
+
+    query = """INSERT INTO Enrollments (id, subscriberId, groupId, assignedChitNumber, joinDate)
+               VALUES (%s, %s, %s, %s, %s)"""
+    values = (
+        enrollment_id, # BINARY(16)
+        subscriber_id_bytes, # BINARY(16) - already bytes from get_subscriber_names_and_ids
+        group_id_bytes,      # BINARY(16) - already bytes from get_group_names_and_ids
+        assigned_number, # SMALLINT
+        join_date      # DATE
+    )
+    cursor.execute(query, values)
+    return enrollment_id
+
 def insert_enrollment(subscriber_id_bytes, group_id_bytes, assigned_number, join_date):
     """Enrolls a Subscriber (by ID) in a Chit Group (by ID) with an assigned number."""
     conn = get_db_connection()
     if conn is None:
         return False
 
-    cursor = None
     try:
-        cursor = conn.cursor()
-        enrollment_id = uuid.uuid4().bytes # UUID for the enrollment record
-
-        query = """INSERT INTO Enrollments (id, subscriberId, groupId, assignedChitNumber, joinDate)
-                   VALUES (%s, %s, %s, %s, %s)"""
-        values = (
-            enrollment_id, # BINARY(16)
-            subscriber_id_bytes, # BINARY(16) - already bytes from get_subscriber_names_and_ids
-            group_id_bytes,      # BINARY(16) - already bytes from get_group_names_and_ids
-            assigned_number, # SMALLINT
-            join_date      # DATE
-        )
-        cursor.execute(query, values)
-        conn.commit()
+        with UnitOfWork(conn) as uow:
+            uow.add(write_enrollment, subscriber_id_bytes, group_id_bytes, assigned_number, join_date)
+        mark_write()
+        audit_write("create", "Enrollments", uow.results[0], after={
+            "subscriberId": subscriber_id_bytes, "groupId": group_id_bytes,
+            "assignedChitNumber": assigned_number, "joinDate": join_date})
         st.success("Subscriber enrolled successfully!")
         return True
     except Error as e:
@@ -314,137 +500,114 @@ def insert_enrollment(subscriber_id_bytes, group_id_bytes, assigned_number, join
         else:
             st.error(f"Error enrolling Subscriber: {e}")
             # print(f"Error enrolling Subscriber: {e}") # Optional log
-        if conn: conn.rollback()
         return False
-    finally:
-        if cursor:
-            cursor.close()
 
 def get_enrollments_details_for_group(group_id_bytes):
     """Fetches enrollment details (Subscriber name, number, join date) for a specific group."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return []
 
-    cursor = None
     try:
-        cursor = conn.cursor(dictionary=True)
-        # Join Enrollments with Subscribers to get subscriber names and phone numbers
-        query = """SELECT
-                       e.id AS enrollmentId,
-                       s.id AS subscriberId,
-                       s.name AS subscriberName,
-                       s.phoneNumber AS subscriberPhone,
-                       e.assignedChitNumber,
-                       e.joinDate
-                   FROM Enrollments e
-                   JOIN Subscribers s ON e.subscriberId = s.id
-                   WHERE e.groupId = %s
-                   ORDER BY e.assignedChitNumber"""
-        cursor.execute(query, (group_id_bytes,)) # Pass group_id_bytes as a tuple
-        results = cursor.fetchall()
+        # Join Enrollments with Subscribers to get subscriber names and phone numbers (prepared once per connection)
+        results = STATEMENTS.fetch_dicts(conn, "enrollments_for_group", (group_id_bytes,)) # Pass group_id_bytes as a tuple
 
         # Convert BINARY IDs to UUID objects for display
         for row in results:
-            if isinstance(row['enrollmentId'], bytes):
-                row['enrollmentId'] = uuid.UUID(bytes=row['enrollmentId'])
-            if isinstance(row['subscriberId'], bytes):
-                row['subscriberId'] = uuid.UUID(bytes=row['subscriberId'])
+            if isinstance(row['enrollmentId'], (bytes, bytearray)):
+                row['enrollmentId'] = uuid.UUID(bytes=bytes(row['enrollmentId']))
+            if isinstance(row['subscriberId'], (bytes, bytearray)):
+                row['subscriberId'] = uuid.UUID(bytes=bytes(row['subscriberId']))
 
         return results
     except Error as e:
         st.error(f"Error fetching enrollments: {e}")
         return []
-    finally:
-        if cursor:
-            cursor.close()
 
 # --- Installment Functions ---
 
+def write_installments(cursor, group_id_bytes, start_date, duration):
+     """
+     Write operation: inserts Installment records for a group using the given cursor (no commit).
+     Returns the number of installments created, or 0 if the group already has installments.
+     """
+     # Check if installments already exist for this group to prevent duplicates
+     check_query = "SELECT COUNT(*) FROM Installments WHERE groupId = %s"
+     cursor.execute(check_query, (group_id_bytes,))
+     count = cursor.fetchone()[0]
+     if count > 0 or archive.is_group_archived(cursor, group_id_bytes): # Archived groups already had theirs
+         return 0
+
+     query = """INSERT INTO Installments (id, groupId, monthNumber, dueDate, isAuctionConducted, isCompleted)
+                VALUES (%s, %s, %s, %s, %s, %s)"""
+     values_to_insert = []
+     # Generate installment dates and data
+     for month_num in range(1, duration + 1):
+         installment_id = uuid.uuid4().bytes
+         # Calculate due date: Month 1 is due on start_date, Month 2 is start_date + 1 month, etc.
+         # Use the add_months helper function (or a more robust library)
+         due_date = add_months(start_date, month_num - 1) # Month 1 (index 0) needs 0 months added, Month 2 (index 1) needs 1 month, etc.
+
+         values_to_insert.append((installment_id, group_id_bytes, month_num, due_date, False, False))
+
+     # Use executemany for efficient bulk insertion
+     cursor.executemany(query, values_to_insert)
+     return len(values_to_insert)
+
 def generate_installments_for_group(group_id_bytes, start_date, duration):
      """Generates Installment records for a group (simplified date logic)."""
      conn = get_db_connection()
      if conn is None:
          return False
 
-     cursor = None
+     # Ensure start_date is a datetime.date object before date calculation
+     if not isinstance(start_date, datetime.date):
+         if isinstance(start_date, datetime.datetime):
+             start_date = start_date.date() # Convert if it's a datetime
+         else:
+             st.error("Invalid start date type provided for installment generation.")
+             return False
+
      try:
-         cursor = conn.cursor()
-         # Check if installments already exist for this group to prevent duplicates
-         check_query = "SELECT COUNT(*) FROM Installments WHERE groupId = %s"
-         cursor.execute(check_query, (group_id_bytes,))
-         count = cursor.fetchone()[0]
-         if count > 0:
+         with UnitOfWork(conn) as uow:
+             uow.add(write_installments, group_id_bytes, start_date, duration)
+         if uow.results[0] == 0:
              st.warning("Installments already exist for this group. Cannot regenerate.")
              return False # Indicate failure
-
-         query = """INSERT INTO Installments (id, groupId, monthNumber, dueDate, isAuctionConducted, isCompleted)
-                    VALUES (%s, %s, %s, %s, %s, %s)"""
-         values_to_insert = []
-         # Ensure start_date is a datetime.date object before date calculation
-         if not isinstance(start_date, datetime.date):
-             if isinstance(start_date, datetime.datetime):
-                 start_date = start_date.date() # Convert if it's a datetime
-             else:
-                 st.error("Invalid start date type provided for installment generation.")
-                 return False
-
-         # Generate installment dates and data
-         for month_num in range(1, duration + 1):
-             installment_id = uuid.uuid4().bytes
-             # Calculate due date: Month 1 is due on start_date, Month 2 is start_date + 1 month, etc.
-             # Use the add_months helper function (or a more robust library)
-             due_date = add_months(start_date, month_num - 1) # Month 1 (index 0) needs 0 months added, Month 2 (index 1) needs 1 month, etc.
-
-             values_to_insert.append((installment_id, group_id_bytes, month_num, due_date, False, False))
-
-         # Use executemany for efficient bulk insertion
-         cursor.executemany(query, values_to_insert)
-         conn.commit()
+         mark_write()
+         # One event for the whole schedule, keyed by the group
+         audit_write("create", "Installments", group_id_bytes, after={
+             "groupId": group_id_bytes, "installments": uow.results[0], "firstDueDate": start_date})
          st.success(f"Generated {duration} installments for the group.")
          return True
      except Error as e:
          st.error(f"Error generating installments: {e}")
          # print(f"Error generating installments: {e}") # Optional log
-         if conn: conn.rollback()
          return False
-     finally:
-         if cursor:
-             cursor.close()
 
 
-def get_installments_for_group(group_id_bytes):
-     """Fetches installments for a specific group."""
-     conn = get_db_connection()
+def get_installments_for_group(group_id_bytes, include_archived=False):
+     """Fetches installments for a specific group (from the archive tables too if include_archived is set)."""
+     conn = get_read_connection()
      if conn is None:
          return []
 
      cursor = None
      try:
-         cursor = conn.cursor(dictionary=True)
-         query = """SELECT
-                        id,
-                        groupId,
-                        monthNumber,
-                        dueDate,
-                        isAuctionConducted,
-                        auctionPrizeAmount,
-                        auctionWinnerId,
-                        isCompleted
-                    FROM Installments
-                    WHERE groupId = %s
-                    ORDER BY monthNumber"""
-         cursor.execute(query, (group_id_bytes,))
-         results = cursor.fetchall()
+         cursor = conn.cursor()
+         # Completed groups may have been moved to the archive tables (see archive.py)
+         archived = include_archived and archive.is_group_archived(cursor, group_id_bytes)
+         # Prepared once per connection (see statements.py)
+         results = STATEMENTS.fetch_dicts(conn, "archived_installments_for_group" if archived else "installments_for_group", (group_id_bytes,))
 
          # Convert BINARY IDs to UUID objects
          for row in results:
-             if isinstance(row['id'], bytes):
-                 row['id'] = uuid.UUID(bytes=row['id'])
-             if isinstance(row['groupId'], bytes):
-                  row['groupId'] = uuid.UUID(bytes=row['groupId'])
-             if row['auctionWinnerId'] and isinstance(row['auctionWinnerId'], bytes):
-                 row['auctionWinnerId'] = uuid.UUID(bytes=row['auctionWinnerId'])
+             if isinstance(row['id'], (bytes, bytearray)):
+                 row['id'] = uuid.UUID(bytes=bytes(row['id']))
+             if isinstance(row['groupId'], (bytes, bytearray)):
+                  row['groupId'] = uuid.UUID(bytes=bytes(row['groupId']))
+             if row['auctionWinnerId'] and isinstance(row['auctionWinnerId'], (bytes, bytearray)):
+                 row['auctionWinnerId'] = uuid.UUID(bytes=bytes(row['auctionWinnerId']))
 
 
          return results
@@ -458,58 +621,113 @@ def get_installments_for_group(group_id_bytes):
 # --- InstallmentPayment Functions ---
 # (Requires selecting Installment and Subscriber to record payment)
 
+def write_payment(cursor, installment_id_bytes, subscriber_id_bytes, amount_paid, notes):
+    """Write operation: inserts a payment record using the given cursor (no commit). Returns the new payment ID."""
+    payment_id = uuid.uuid4().bytes # UUID for the payment record
+
+    # Same string object as the prepared statement, so a prepared cursor reuses it (see statements.py)
+    query = statements.SQL["insert_payment"]
+    values = (
+        payment_id, # BINARY(16)
+        installment_id_bytes, # BINARY(16)
+        subscriber_id_bytes, # BINARY(16)
+        datetime.datetime.now(), # DATETIME (Record the exact time of payment entry)
+        amount_paid, # DECIMAL(14,2)
+        notes # TEXT (Optional)
+    )
+    cursor.execute(query, values)
+    # Nothing else to update: the Paid / Due status is derived from the payments (get_payment_status_for_installment)
+    return payment_id
+
+def add_to_dashboard_counters(conn, installment_id_bytes, subscriber_ids_bytes, amount_paid, refreshed_at):
+    """
+    Adds committed payments to the live dashboard counters (see counters.py) in a separate short
+    transaction, so payments don't hold the counters row lock. refreshed_at was read before the
+    payments' transaction. A failure here only leaves the counters behind until the next refresh,
+    so it is logged instead of failing the payment.
+    """
+    try:
+        with STATEMENTS.connection_lock(conn), \
+             UnitOfWork(conn, cursor_factory=lambda: STATEMENTS.cursor(conn, "payment_counters")) as uow:
+            for subscriber_id_bytes in subscriber_ids_bytes:
+                uow.add(counters.write_payment_counters, installment_id_bytes, subscriber_id_bytes, amount_paid,
+                        refreshed_at)
+    except Error as e:
+        print(f"Dashboard counters not updated, corrected at the next refresh: {e}") # Optional: Log error
+
 def insert_payment(installment_id_bytes, subscriber_id_bytes, amount_paid, notes):
     """Records a payment for an installment by a subscriber."""
     conn = get_db_connection()
     if conn is None:
         return False
+    amount_paid = money.to_decimal(amount_paid) # Exact rupees and paise (the form returns a float)
 
-    cursor = None
     try:
-        cursor = conn.cursor()
-        payment_id = uuid.uuid4().bytes # UUID for the payment record
-
-        query = """INSERT INTO InstallmentPayments (id, installmentId, subscriberId, paymentDate, amountPaid, notes)
-                   VALUES (%s, %s, %s, %s, %s, %s)"""
-        values = (
-            payment_id, # BINARY(16)
-            installment_id_bytes, # BINARY(16)
-            subscriber_id_bytes, # BINARY(16)
-            datetime.datetime.now(), # DATETIME (Record the exact time of payment entry)
-            amount_paid, # DOUBLE
-            notes # TEXT (Optional)
-        )
-        cursor.execute(query, values)
-        conn.commit()
+        # Run on the prepared INSERT cursor of this connection (not shared with another session meanwhile)
+        with STATEMENTS.connection_lock(conn):
+            refreshed_at = counters.read_refreshed_at(conn) # Before the payment (see counters.py)
+            with UnitOfWork(conn, cursor_factory=lambda: STATEMENTS.cursor(conn, "insert_payment")) as uow:
+                uow.add(write_payment, installment_id_bytes, subscriber_id_bytes, amount_paid, notes)
+        mark_write()
+        add_to_dashboard_counters(conn, installment_id_bytes, [subscriber_id_bytes], amount_paid, refreshed_at)
+        audit_write("create", "InstallmentPayments", uow.results[0], after={
+            "installmentId": installment_id_bytes, "subscriberId": subscriber_id_bytes,
+            "amountPaid": amount_paid, "notes": notes})
         st.success("Payment recorded successfully!")
-        # TODO: Add logic here to update related records if needed (e.g., mark installment as paid for this subscriber)
         return True
     except Error as e:
         st.error(f"Error recording payment: {e}")
         # print(f"Error recording payment: {e}") # Optional log
-        if conn: conn.rollback()
         return False
-    finally:
-        if cursor:
-            cursor.close()
 
-def get_payments_for_installment(installment_id_bytes):
-    """Fetches payments recorded for a specific installment."""
+def insert_payments_batch(installment_id_bytes, subscriber_ids_bytes, amount_paid, notes):
+    """
+    Records the same payment for several subscribers in ONE transaction (one commit for the whole batch).
+    Either every payment is recorded or, on error, none are.
+    """
     conn = get_db_connection()
+    if conn is None:
+        return False
+    amount_paid = money.to_decimal(amount_paid)
+
+    try:
+        # The INSERT is prepared once and executed for every subscriber
+        with STATEMENTS.connection_lock(conn):
+            refreshed_at = counters.read_refreshed_at(conn) # Before the payments (see counters.py)
+            with UnitOfWork(conn, cursor_factory=lambda: STATEMENTS.cursor(conn, "insert_payment")) as uow:
+                for subscriber_id_bytes in subscriber_ids_bytes:
+                    uow.add(write_payment, installment_id_bytes, subscriber_id_bytes, amount_paid, notes)
+        mark_write()
+        add_to_dashboard_counters(conn, installment_id_bytes, subscriber_ids_bytes, amount_paid, refreshed_at)
+        for payment_id, subscriber_id_bytes in zip(uow.results, subscriber_ids_bytes):
+            audit_write("create", "InstallmentPayments", payment_id, after={
+                "installmentId": installment_id_bytes, "subscriberId": subscriber_id_bytes,
+                "amountPaid": amount_paid, "notes": notes})
+        st.success(f"Recorded {len(subscriber_ids_bytes)} payments successfully!")
+        return True
+    except Error as e:
+        st.error(f"Error recording payments (none were recorded): {e}")
+        return False
+
+def get_payments_for_installment(installment_id_bytes, include_archived=False):
+    """Fetches payments recorded for a specific installment (from the archive tables too if include_archived is set)."""
+    conn = get_read_connection()
     if conn is None:
         return []
 
     cursor = None
     try:
         cursor = conn.cursor(dictionary=True)
+        archived = include_archived and archive.is_installment_archived(cursor, installment_id_bytes)
+        _, payments_table = archive.installment_tables(archived)
         # Join with Subscribers to show who paid
-        query = """SELECT
+        query = f"""SELECT
                        ip.id AS paymentId,
                        s.name AS subscriberName,
                        ip.paymentDate,
                        ip.amountPaid,
                        ip.notes
-                   FROM InstallmentPayments ip
+                   FROM {payments_table} ip
                    JOIN Subscribers s ON ip.subscriberId = s.id
                    WHERE ip.installmentId = %s
                    ORDER BY ip.paymentDate"""
@@ -532,60 +750,47 @@ def get_payments_for_installment(installment_id_bytes):
 # --- Dues & Status Functions ---
 # (More complex - involves comparing enrollments, installments, and payments)
 
-def get_payment_status_for_installment(group_id_bytes, installment_month_number):
+def get_payment_status_for_installment(group_id_bytes, installment_month_number, include_archived=False):
     """
     Gets payment status for all enrolled subscribers for a specific installment (by group and month number).
+    Completed groups that were archived are only found when include_archived is set.
     This is a simplified example. Real dues logic needs to consider expected installment amount, partial payments, etc.
     """
-    conn = get_db_connection()
+    conn = get_read_connection()
     if conn is None:
         return []
 
     cursor = None
     try:
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.cursor()
+        archived = include_archived and archive.is_group_archived(cursor, group_id_bytes)
+        prefix = "archived_" if archived else "" # Live or archive tables (see statements.py)
 
         # First, find the installment ID for the given group and month number
-        cursor.execute("SELECT id FROM Installments WHERE groupId = %s AND monthNumber = %s", (group_id_bytes, installment_month_number))
-        installment_row = cursor.fetchone()
-        if not installment_row:
+        installment_rows = STATEMENTS.fetchall(conn, prefix + "installment_by_month", (group_id_bytes, installment_month_number))
+        if not installment_rows:
             st.info(f"Installment Month {installment_month_number} not found for this group.")
             return []
-        installment_id_bytes = installment_row['id']
+        installment_id_bytes = bytes(installment_rows[0][0])
 
 
         # This query joins enrollments, subscribers, and payments for the specific installment.
         # It checks if a payment exists for each subscriber for this installment month.
         # It DOES NOT verify if the 'amountPaid' is the full expected amount.
-        query = """
-            SELECT
-                e.id AS enrollmentId,
-                s.id AS subscriberId,
-                s.name AS subscriberName,
-                e.assignedChitNumber,
-                ip.id IS NOT NULL AS hasPaidThisInstallment, -- Checks if *any* payment exists
-                ip.amountPaid AS totalPaidThisInstallment -- Sum payments if multiple allowed, or just the first/last
-            FROM Enrollments e
-            JOIN Subscribers s ON e.subscriberId = s.id
-            LEFT JOIN InstallmentPayments ip
-                ON e.subscriberId = ip.subscriberId AND ip.installmentId = %s
-            WHERE e.groupId = %s
-            ORDER BY e.assignedChitNumber;
-        """
-        cursor.execute(query, (installment_id_bytes, group_id_bytes))
-        results = cursor.fetchall()
+        # Rows are plain tuples from a prepared statement: no dict is built per row.
+        results = STATEMENTS.fetchall(conn, prefix + "payment_status", (installment_id_bytes, group_id_bytes))
 
         # Process results to determine status (Simplified: Paid if any payment, Due otherwise)
         status_list = []
-        for row in results:
-            status = "Paid" if row['hasPaidThisInstallment'] else "Due"
-            # You would need to add logic here to calculate expected amount and check row['totalPaidThisInstallment'] against it for "Partial" status
+        for enrollment_id, subscriber_id, subscriber_name, chit_number, has_paid, total_paid in results:
+            status = "Paid" if has_paid else "Due"
+            # You would need to add logic here to calculate expected amount and check total_paid against it for "Partial" status
 
             status_list.append({
-                "Subscriber Name": row['subscriberName'],
-                "Chit Number": row['assignedChitNumber'],
+                "Subscriber Name": subscriber_name,
+                "Chit Number": chit_number,
                 "Status": status,
-                "Amount Paid (This Installment)": row['totalPaidThisInstallment'] if row['hasPaidThisInstallment'] else 0 # Display amount if paid
+                "Amount Paid (This Installment)": total_paid if has_paid else 0 # Display amount if paid
                 # Add expected amount if you can calculate it
             })
 
@@ -601,6 +806,176 @@ def get_payment_status_for_installment(group_id_bytes, installment_month_number)
             cursor.close()
 
 
+# --- Subscriber Details (360 View) ---
+# Everything about one member with a fixed number of queries, all driven by indexes on subscriberId:
+#   1. the subscriber (primary key)
+#   2. their enrollments with group details and installments due so far (unique_enrollment_per_group)
+#   3. their payment history, live and archived (idx_payments_subscriber_date)
+#   4. the auctions they won, live and archived (auctionWinnerId indexes)
+# Totals paid in archived groups come from EnrollmentSummaries (rebuilt by archive.py), not the archived payments.
+# The number of queries does not grow with the number of groups or payments.
+
+def get_subscriber_360(subscriber_id_bytes):
+    """
+    Fetches a subscriber's details, enrollments (with dues per group), payment history and auctions won.
+    Returns a dictionary with keys 'subscriber', 'enrollments', 'payments', 'auctions', or None if not found.
+    Dues are simplified: the expected installment is the group value divided by its duration (rounded to paise).
+    """
+    conn = get_read_connection()
+    if conn is None:
+        return None
+
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        today = datetime.date.today()
+
+        # 1. The subscriber
+        cursor.execute("SELECT id, name, phoneNumber, address, createdDate, isActive FROM Subscribers WHERE id = %s",
+                       (subscriber_id_bytes,))
+        subscriber = cursor.fetchone()
+        if subscriber is None:
+            return None
+
+        # 2. Enrollments with their group and how many installments have fallen due
+        cursor.execute("""
+            SELECT
+                e.id AS enrollmentId,
+                e.groupId,
+                g.name AS groupName,
+                e.assignedChitNumber,
+                e.joinDate,
+                g.value,
+                g.duration,
+                a.groupId IS NOT NULL AS isArchived,
+                CASE WHEN a.groupId IS NOT NULL THEN a.installmentCount
+                     ELSE (SELECT COUNT(*) FROM Installments i WHERE i.groupId = e.groupId AND i.dueDate <= %s)
+                END AS installmentsDue,
+                s.totalPaid AS archivedTotalPaid
+            FROM Enrollments e
+            JOIN ChitGroups g ON e.groupId = g.id
+            LEFT JOIN ArchivedGroups a ON a.groupId = e.groupId
+            LEFT JOIN EnrollmentSummaries s ON s.enrollmentId = e.id
+            WHERE e.subscriberId = %s
+            ORDER BY g.startDate DESC, g.name""", (today, subscriber_id_bytes))
+        enrollments = cursor.fetchall()
+
+        # 3. Payment history across all groups (live and archived), newest first
+        cursor.execute("""
+            SELECT ip.id AS paymentId, i.groupId, i.monthNumber, ip.paymentDate, ip.amountPaid, ip.notes
+            FROM InstallmentPayments ip
+            JOIN Installments i ON ip.installmentId = i.id
+            WHERE ip.subscriberId = %s
+            UNION ALL
+            SELECT ip.id, i.groupId, i.monthNumber, ip.paymentDate, ip.amountPaid, ip.notes
+            FROM ArchivedInstallmentPayments ip
+            JOIN ArchivedInstallments i ON ip.installmentId = i.id
+            WHERE ip.subscriberId = %s
+            ORDER BY paymentDate DESC""", (subscriber_id_bytes, subscriber_id_bytes))
+        payments = cursor.fetchall()
+
+        # 4. Auctions won (live and archived)
+        cursor.execute("""
+            SELECT groupId, monthNumber, dueDate, auctionPrizeAmount FROM Installments WHERE auctionWinnerId = %s
+            UNION ALL
+            SELECT groupId, monthNumber, dueDate, auctionPrizeAmount FROM ArchivedInstallments WHERE auctionWinnerId = %s
+            ORDER BY dueDate""", (subscriber_id_bytes, subscriber_id_bytes))
+        auctions = cursor.fetchall()
+
+        # Combine in Python (no further queries): totals paid per group and dues, exact in integer paise (see money.py)
+        group_names = {bytes(row['groupId']): row['groupName'] for row in enrollments}
+        group_index = {bytes(row['groupId']): position for position, row in enumerate(enrollments)
+                       if not row['isArchived']}
+        paid_payments = [row for row in payments if bytes(row['groupId']) in group_index]
+        paid_paise = money.group_totals_paise([group_index[bytes(row['groupId'])] for row in paid_payments],
+                                              money.paise_array(row['amountPaid'] for row in paid_payments),
+                                              len(enrollments))
+        for position, row in enumerate(enrollments):
+            if row['isArchived']: # Archived groups: the summary total, no sum over the archive
+                paid_paise[position] = money.to_paise(row['archivedTotalPaid'])
+        dues = money.dues_paise(money.paise_array(row['value'] for row in enrollments),
+                                [row['duration'] or 0 for row in enrollments],
+                                [row['installmentsDue'] for row in enrollments],
+                                paid_paise)
+        for row in payments:
+            group_key = bytes(row['groupId'])
+            row['groupName'] = group_names.get(group_key, "")
+            row['paymentId'] = uuid.UUID(bytes=bytes(row['paymentId']))
+            del row['groupId']
+        for position, row in enumerate(enrollments):
+            row['totalPaid'] = money.from_paise(paid_paise[position])
+            row['dues'] = money.from_paise(dues[position])
+            row['isArchived'] = bool(row['isArchived'])
+            row['enrollmentId'] = uuid.UUID(bytes=bytes(row['enrollmentId']))
+            del row['groupId'], row['archivedTotalPaid']
+        for row in auctions:
+            row['groupName'] = group_names.get(bytes(row['groupId']), "")
+            del row['groupId']
+        subscriber['id'] = uuid.UUID(bytes=bytes(subscriber['id']))
+
+        return {"subscriber": subscriber, "enrollments": enrollments, "payments": payments, "auctions": auctions}
+    except Error as e:
+        st.error(f"Error fetching subscriber details: {e}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+
+# --- Live Dashboard ---
+
+DASHBOARD_REFRESH_SECONDS = 10 # How often the live figures on the Dashboard reload
+
+def read_dashboard_counters(conn):
+    """
+    Reads the counters row and ends the read's transaction. The primary connection does not
+    autocommit, so under REPEATABLE READ the read would otherwise keep its snapshot open and
+    every later refresh of the Dashboard would show the same figures.
+    """
+    with STATEMENTS.connection_lock(conn): # Not in the middle of a payment on this connection
+        row = counters.read_counters(conn)
+        conn.commit() # Nothing was written: this only ends the snapshot
+    return row
+
+def get_dashboard_figures():
+    """
+    Reads the live dashboard figures: a single-row read of DashboardCounters.
+    Recomputes the counters first (on the primary) when they were never computed or are stale.
+    """
+    conn = get_read_connection()
+    if conn is None:
+        return None
+
+    try:
+        row = read_dashboard_counters(conn)
+        if counters.needs_refresh(row):
+            write_conn = get_db_connection()
+            with UnitOfWork(write_conn) as uow:
+                uow.add(counters.write_refresh_counters)
+            row = read_dashboard_counters(write_conn)
+        return counters.current_figures(row)
+    except Error as e:
+        st.warning(f"Could not fetch live figures: {e}")
+        return None
+
+@st.fragment(run_every=DASHBOARD_REFRESH_SECONDS) # Reruns only this part of the page
+def show_live_dashboard():
+    """The auto-refreshing collection figures on the Dashboard."""
+    figures = get_dashboard_figures()
+    if figures is None:
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Collected Today", f"{figures['collectedToday']:,.2f}", f"{figures['paymentsToday']} payments", delta_color="off")
+    col2.metric("Collected This Month", f"{figures['collectedMonth']:,.2f}")
+    col3.metric("Overdue Amount", f"{figures['overdueAmount']:,.2f}")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Payments This Hour", figures['paymentsThisHour'])
+    col2.metric("Payments Last Hour", figures['paymentsLastHour'])
+    col3.metric("Groups Nearing Completion", figures['groupsNearingCompletion'],
+                help=f"Active groups with {counters.NEARING_COMPLETION_INSTALLMENTS} or fewer open installments")
+    st.caption(f"Last change: {figures['updatedAt']:%Y-%m-%d %H:%M:%S} - refreshes every {DASHBOARD_REFRESH_SECONDS} seconds")
+
+
 # --- Streamlit App Layout ---
 
 st.title("Foremen Choice - Digital Records Manager")
@@ -614,8 +989,22 @@ page = st.sidebar.radio("Go to", [
     "Manage Enrollments",
     "Manage Installments",
     "Record Payments",
-    "View Dues & Status"
+    "View Dues & Status",
+    "Subscriber Details",
+    "Audit Trail"
 ])
+if not st.user.get("is_logged_in"):
+    # Without Streamlit authentication the audit trail records the name entered here
+    st.sidebar.text_input("Your name (for the audit trail)", key="audit_user_name")
+if "tenants" in st.secrets:
+    tenant_route = current_tenant_route()
+    if tenant_route is None:
+        if st.user.get("is_logged_in"):
+            st.sidebar.button("Log out", on_click=st.logout)
+        else:
+            st.sidebar.button("Log in", on_click=st.login)
+        st.stop() # No tenant, no records to show
+    st.sidebar.caption(f"Records of {tenant_route.name}" + (" (read-only while being moved)" if tenant_route.read_only else ""))
 
 # --- Page Content Based on Selection ---
 
@@ -627,17 +1016,17 @@ if page == "Dashboard":
     # --- Quick Stats (Requires DB queries) ---
     st.subheader("Quick Stats")
     # Get the cached connection *within* the Dashboard section
-    conn = get_db_connection() # <<< Call get_db_connection() here
+    conn = get_read_connection() # <<< Counts are read-only, so the replica can serve them
 
     if conn: # Check if the connection object is valid (not None)
          cursor = None
          try:
-             cursor = conn.cursor()
+             cursor = conn.cursor(raw=True) # Raw cursor: skip type conversion, the counts are parsed with int()
              # Fetch counts of active groups and subscribers
              cursor.execute("SELECT COUNT(*) FROM ChitGroups WHERE isActive = TRUE")
-             num_groups = cursor.fetchone()[0]
+             num_groups = int(cursor.fetchone()[0])
              cursor.execute("SELECT COUNT(*) FROM Subscribers WHERE isActive = TRUE")
-             num_subscribers = cursor.fetchone()[0]
+             num_subscribers = int(cursor.fetchone()[0])
 
              # Display the stats using st.columns for layout
              col1, col2 = st.columns(2)
@@ -656,6 +1045,23 @@ if page == "Dashboard":
          # No additional message needed here if connection failed
          pass
 
+    # --- Live Collection Figures (auto-refreshing) ---
+    st.subheader("Live Collections")
+    show_live_dashboard()
+
+    # --- Write Metrics (this app process) ---
+    with st.expander("Write Transaction Metrics"):
+        metrics = TRANSACTION_METRICS.snapshot()
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Commits", metrics["commits"])
+        col2.metric("Writes Committed", metrics["statements"])
+        col3.metric("Retries", metrics["retries"])
+        col4.metric("Failed Transactions", metrics["failures"])
+        if metrics["commit_p50_ms"] is not None:
+            st.write(f"Commit latency: p50 {metrics['commit_p50_ms']} ms, p95 {metrics['commit_p95_ms']} ms, p99 {metrics['commit_p99_ms']} ms")
+        if metrics["retries_by_errno"]:
+            st.write("Retries by MySQL error code:", metrics["retries_by_errno"])
+
 
 elif page == "Manage Chit Groups":
     # --- Manage Chit Groups Section ---
@@ -850,13 +1256,14 @@ elif page == "Manage Installments":
          st.info("Add a group first to view installments.")
     else:
         selected_group_name_view_install = st.selectbox("Select Group to View Installments", group_display_options_view_install, key="view_installments_group_select")
+        include_archived_install = st.checkbox("Include archived (completed) groups", key="view_installments_include_archived")
         view_installments_button = st.button("Show Installments", key="show_installments_list_button")
 
         if view_installments_button and selected_group_name_view_install:
             group_id_for_view_install_bytes = group_id_map_view_install.get(selected_group_name_view_install)
             if group_id_for_view_install_bytes:
                 # Fetch installments for the selected group
-                installments = get_installments_for_group(group_id_for_view_install_bytes)
+                installments = get_installments_for_group(group_id_for_view_install_bytes, include_archived=include_archived_install)
                 if installments:
                     # Display the installments in a dataframe
                     st.dataframe(installments)
@@ -865,6 +1272,38 @@ elif page == "Manage Installments":
             else:
                 st.warning("Could not find the selected group ID.")
 
+    st.markdown("---") # Separator
+
+    # --- Archive Completed Groups ---
+    st.subheader("Archive Completed Groups")
+    st.write("Moves installments and payments of groups whose installments are all completed to the archive tables. "
+             "They stay viewable with 'Include archived (completed) groups'.")
+    archive_conn = get_db_connection()
+    if archive_conn is not None and storage.dialect_of(archive_conn) != "mysql":
+        # A branch database would sync the moves to the central database as plain deletes
+        st.info("Archiving runs on the central database only, not in offline branch mode.")
+    elif archive_conn is not None:
+        try:
+            archivable_groups = archive.find_archivable_groups(archive_conn)
+        except Error as e:
+            st.error(f"Error finding completed groups: {e}")
+            archivable_groups = []
+        if not archivable_groups:
+            st.info("No completed groups to archive.")
+        else:
+            st.write("Completed groups:", ", ".join(name for name, id in archivable_groups))
+            if st.button("Archive Completed Groups", key="archive_groups_button"):
+                try:
+                    for name, archived_group_id, payment_count in archive.archive_completed_groups(archive_conn):
+                        if payment_count is None:
+                            st.warning(f"Skipped '{name}': an installment was reopened.")
+                        else:
+                            audit_write("archive", "ChitGroups", archived_group_id, after={"paymentsArchived": payment_count})
+                            st.success(f"Archived '{name}' ({payment_count} payments).")
+                    mark_write()
+                except Error as e:
+                    st.error(f"Error archiving groups: {e}")
+
 
 elif page == "Record Payments":
     st.header("Record Payments")
@@ -928,6 +1367,23 @@ elif page == "Record Payments":
                           else:
                               st.warning("Could not find the selected subscriber ID.")
 
+                          # --- Batch Payment Form ---
+                          # Collection day: record the same amount for many subscribers with one commit
+                          st.subheader("Record Payments for Several Subscribers")
+                          with st.form("record_batch_payment_form"):
+                               selected_batch_names = st.multiselect("Select Subscribers", subscriber_display_options_payment, key="batch_payment_sub_select")
+                               batch_amount_paid = st.number_input("Amount Paid (each)", min_value=0.0, format="%.2f", key="batch_payment_amount_input")
+                               batch_notes = st.text_area("Notes (Optional)", key="batch_payment_notes_input")
+
+                               record_batch_button = st.form_submit_button("Record Payments")
+
+                               if record_batch_button:
+                                   if selected_batch_names and batch_amount_paid > 0:
+                                       batch_subscriber_ids = [subscriber_id_map_payment[name] for name in selected_batch_names]
+                                       insert_payments_batch(selected_installment_id_payment_bytes, batch_subscriber_ids, batch_amount_paid, batch_notes)
+                                   else:
+                                       st.warning("Select at least one subscriber and enter an amount greater than zero.")
+
                       else:
                            st.info("No subscribers enrolled in this group yet.")
 
@@ -955,10 +1411,11 @@ elif page == "View Dues & Status":
     else:
          selected_group_name_dues = st.selectbox("Select Group", group_display_options_dues, key="dues_group_select")
          group_id_for_dues_bytes = group_id_map_dues.get(selected_group_name_dues)
+         include_archived_dues = st.checkbox("Include archived (completed) groups", key="dues_include_archived")
 
          if group_id_for_dues_bytes:
              # Fetch installments for the selected group to populate the installment selectbox
-             installments_for_dues = get_installments_for_group(group_id_for_dues_bytes)
+             installments_for_dues = get_installments_for_group(group_id_for_dues_bytes, include_archived=include_archived_dues)
              if installments_for_dues:
                   # Create options for installment selectbox
                   installment_options_dues = [(f"Month {inst['monthNumber']} (Due: {inst['dueDate'].strftime('%Y-%m-%d')})", inst['monthNumber']) for inst in installments_for_dues] # Use month number as value for simplicity
@@ -975,7 +1432,7 @@ elif page == "View Dues & Status":
 
                       if selected_installment_month_dues is not None: # Check if month number was retrieved
                           # Call the simplified dues status function
-                          status_list = get_payment_status_for_installment(group_id_for_dues_bytes, selected_installment_month_dues)
+                          status_list = get_payment_status_for_installment(group_id_for_dues_bytes, selected_installment_month_dues, include_archived=include_archived_dues)
                           if status_list:
                               st.subheader(f"Payment Status for {selected_group_name_dues} - Month {selected_installment_month_dues}")
                               # Display the status in a dataframe
@@ -990,3 +1447,125 @@ elif page == "View Dues & Status":
          else:
               st.warning("Could not find the selected group ID.")
 
+    st.markdown("---") # Separator
+
+    # --- Dues Reminders ---
+    st.subheader("Dues Reminders")
+    st.write("Queues one reminder per unpaid member for installments due soon. "
+             "They are sent by the reminder dispatcher (python reminders.py --dispatch-only).")
+    reminder_conn = get_db_connection()
+    if reminder_conn is not None:
+        reminder_days = st.number_input("Installments due within (days)", min_value=0, max_value=31,
+                                        value=reminders.DEFAULT_DAYS_AHEAD, step=1, key="reminder_days_input")
+        if st.button("Queue Reminders", key="queue_reminders_button"):
+            try:
+                queued_count = reminders.enqueue_reminders(reminder_conn, int(reminder_days))
+                mark_write()
+                st.success(f"Queued {queued_count} reminders (members already reminded are skipped).")
+            except Error as e:
+                st.error(f"Error queuing reminders: {e}")
+        try:
+            st.write("Outbox:", reminders.outbox_status_counts(reminder_conn) or "empty")
+        except Error as e:
+            st.error(f"Error reading the reminder outbox: {e}")
+
+
+elif page == "Subscriber Details":
+    st.header("Subscriber Details")
+    st.write("Everything about one member: enrollments, dues per group, payment history and auctions won.")
+
+    subscriber_options_details = get_subscriber_names_and_ids()
+    subscriber_display_options_details = [name for name, id in subscriber_options_details]
+    subscriber_id_map_details = {name: id for name, id in subscriber_options_details}
+
+    if not subscriber_display_options_details:
+         st.info("Add a subscriber first to view details.")
+    else:
+         selected_subscriber_name_details = st.selectbox("Select Subscriber", subscriber_display_options_details, key="details_sub_select")
+         subscriber_id_for_details_bytes = subscriber_id_map_details.get(selected_subscriber_name_details)
+
+         if subscriber_id_for_details_bytes:
+             details = get_subscriber_360(subscriber_id_for_details_bytes)
+             if details:
+                 subscriber = details['subscriber']
+                 st.write(f"**Phone:** {subscriber['phoneNumber']}  \n**Address:** {subscriber['address'] or '-'}  \n**Member since:** {subscriber['createdDate']}")
+
+                 # Summary metrics across all groups
+                 col1, col2, col3, col4 = st.columns(4)
+                 col1.metric("Groups", len(details['enrollments']))
+                 col2.metric("Total Paid", f"{money.from_paise(money.paise_array(row['totalPaid'] for row in details['enrollments']).sum()):,.2f}")
+                 col3.metric("Total Dues", f"{money.from_paise(money.paise_array(row['dues'] for row in details['enrollments']).sum()):,.2f}")
+                 col4.metric("Auctions Won", len(details['auctions']))
+
+                 st.subheader("Enrollments & Dues")
+                 if details['enrollments']:
+                     st.dataframe(details['enrollments'])
+                 else:
+                     st.info("Not enrolled in any group.")
+
+                 st.subheader("Payment History")
+                 if details['payments']:
+                     st.dataframe(details['payments'])
+                 else:
+                     st.info("No payments recorded.")
+
+                 st.subheader("Auctions Won")
+                 if details['auctions']:
+                     st.dataframe(details['auctions'])
+                 else:
+                     st.info("No auctions won.")
+             else:
+                 st.warning("Could not find the selected subscriber.")
+         else:
+             st.warning("Could not find the selected subscriber ID.")
+
+
+elif page == "Audit Trail":
+    st.header("Audit Trail")
+    st.write("Who created or changed groups, subscribers, enrollments, installments and payments, newest first.")
+
+    audit_buffer = get_audit_buffer(current_tenant_id())
+    audit_buffer.flush() # Include the writes still waiting in this process's buffer
+    if dict(st.secrets.get("audit", {})).get("sink") == "file":
+        st.info("The audit trail is written to a log file on this server. Load it with python audit.py --replay <file> to search it here.")
+    if audit_buffer.last_error:
+        st.warning(f"Last audit flush failed, events were written to the fallback log file: {audit_buffer.last_error}")
+
+    col1, col2, col3 = st.columns(3)
+    audit_table = col1.selectbox("Table", ["All", "ChitGroups", "Subscribers", "Enrollments", "Installments", "InstallmentPayments"], key="audit_table_select")
+    audit_action = col2.selectbox("Action", ["All", "create", "update", "delete", "archive"], key="audit_action_select")
+    audit_user = col3.text_input("User", key="audit_user_filter")
+    col1, col2, col3 = st.columns(3)
+    audit_from = col1.date_input("From", value=datetime.date.today() - datetime.timedelta(days=7), key="audit_from_date")
+    audit_to = col2.date_input("To", value=datetime.date.today(), key="audit_to_date")
+    audit_row_id = col3.text_input("Row ID (UUID)", key="audit_row_filter")
+
+    audit_row_id_bytes = None
+    if audit_row_id.strip():
+        try:
+            audit_row_id_bytes = uuid.UUID(audit_row_id.strip()).bytes
+        except ValueError:
+            st.error("Row ID must be a UUID, e.g. as shown on the other pages.")
+
+    audit_conn = get_read_connection()
+    if audit_conn is not None:
+        try:
+            audit_events = audit.search_events(
+                audit_conn,
+                table=None if audit_table == "All" else audit_table,
+                user=audit_user.strip() or None,
+                action=None if audit_action == "All" else audit_action,
+                row_id=audit_row_id_bytes,
+                start=datetime.datetime.combine(audit_from, datetime.time.min),
+                end=datetime.datetime.combine(audit_to + datetime.timedelta(days=1), datetime.time.min),
+            )
+            for event in audit_events:
+                if isinstance(event['rowId'], (bytes, bytearray)):
+                    event['rowId'] = uuid.UUID(bytes=bytes(event['rowId']))
+            if audit_events:
+                st.dataframe(audit_events)
+                st.caption(f"Showing the newest {len(audit_events)} matching events.")
+            else:
+                st.info("No audit events match these filters.")
+        except Error as e:
+            st.error(f"Error searching the audit trail: {e}")
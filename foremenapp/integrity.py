@@ -0,0 +1,285 @@
+"""
+Data integrity checker for Foremen Choice Digital Records Manager.
+
+The app doesn't enforce every business rule, so the data can contain:
+
+- unenrolled_payment : a payment by a subscriber who is not enrolled in the installment's group
+- over_enrollment    : a group with more enrollments than its numberOfSubscribers
+- month_gap          : a group whose installments skip a month number (e.g. 1, 2, 4)
+- duplicate_payment  : the same amount paid twice on the same day by the same subscriber
+                       for the same installment (usually a double entry)
+
+The installment and payment checks also scan the archive tables (ArchivedInstallments /
+ArchivedInstallmentPayments, see archive.py), so completed groups are checked too;
+their violations are marked "archived" and their fixes target the archive tables.
+
+The checks run per chunk of groups: the group ids are split into chunks and a process pool
+checks the chunks in parallel, each worker over its own database connection. Every query
+is limited to one chunk's groups and uses the groupId/installmentId indexes, so the scan
+scales with the number of workers instead of doing one huge join.
+
+Every violation is reported with the ids of the rows involved. Optionally a fix-up SQL
+script is written; REVIEW IT before running it, the fixes are suggestions
+(e.g. deleting the later copy of a duplicate payment).
+
+Run from the foremenapp folder (database from .streamlit/secrets.toml, or --sqlite):
+    python integrity.py
+    python integrity.py --processes 8 --chunk-size 100 --report violations.jsonl --fix-sql fixes.sql
+    python integrity.py --checks duplicate_payment month_gap
+    python integrity.py --tenant acme                 # one tenant's database (see tenants.py)
+"""
+
+import argparse
+import datetime
+import json
+import os
+import time
+import uuid
+from multiprocessing import Pool
+
+from mysql.connector import Error
+
+import storage
+from archive import installment_tables
+from dates import add_months
+
+CHECKS = ("unenrolled_payment", "over_enrollment", "month_gap", "duplicate_payment")
+# Checks that read installments and payments, run once on the live and once on the archive tables
+INSTALLMENT_CHECKS = ("unenrolled_payment", "month_gap", "duplicate_payment")
+DEFAULT_CHUNK_SIZE = 50 # Groups per task
+
+
+def _uuid(value):
+    return str(uuid.UUID(bytes=bytes(value)))
+
+
+def _hex(value):
+    # X'...' literals work in both MySQL and SQLite
+    return f"X'{bytes(value).hex()}'"
+
+
+def violation(check, group_id, row_ids, detail, fix=(), archived=False):
+    """One reported problem: the check, the group, the ids of the rows involved, a description and fix-up SQL."""
+    return {"check": check, "groupId": _uuid(group_id), "rowIds": [_uuid(row_id) for row_id in row_ids],
+            "detail": detail + (" (archived)" if archived else ""), "fix": list(fix), "archived": archived}
+
+
+# --- Checks ---
+# Each check gets a cursor, the group ids of one chunk (plus the matching "IN (%s, ...)" text)
+# and whether to read the archive tables instead of the live ones.
+
+def check_unenrolled_payments(cursor, group_ids, in_groups, archived=False):
+    installments, payments = installment_tables(archived)
+    cursor.execute(f"""SELECT p.id, p.subscriberId, i.id, i.groupId, i.monthNumber, p.amountPaid
+                       FROM {installments} i
+                       JOIN {payments} p ON p.installmentId = i.id
+                       LEFT JOIN Enrollments e ON e.groupId = i.groupId AND e.subscriberId = p.subscriberId
+                       WHERE i.groupId IN {in_groups} AND e.id IS NULL""", group_ids)
+    return [violation("unenrolled_payment", group_id, [payment_id, subscriber_id, installment_id],
+                      f"Payment of {amount} for month {month} by subscriber {_uuid(subscriber_id)}, who is not enrolled in the group",
+                      [f"DELETE FROM {payments} WHERE id = {_hex(payment_id)};"], archived)
+            for payment_id, subscriber_id, installment_id, group_id, month, amount in cursor.fetchall()]
+
+
+def check_over_enrollment(cursor, group_ids, in_groups, archived=False):
+    # Enrollments are never archived: only run on the live tables (not in INSTALLMENT_CHECKS)
+    cursor.execute(f"""SELECT g.id, g.numberOfSubscribers, e.id, e.assignedChitNumber
+                       FROM ChitGroups g
+                       JOIN Enrollments e ON e.groupId = g.id
+                       WHERE g.id IN {in_groups}
+                         AND (SELECT COUNT(*) FROM Enrollments c WHERE c.groupId = g.id) > g.numberOfSubscribers
+                       ORDER BY g.id, e.joinDate, e.assignedChitNumber""", group_ids)
+    enrollments_by_group = {}
+    for group_id, capacity, enrollment_id, chit_number in cursor.fetchall():
+        enrollments_by_group.setdefault(bytes(group_id), (capacity, []))[1].append((enrollment_id, chit_number))
+    results = []
+    for group_id, (capacity, enrollments) in enrollments_by_group.items():
+        excess = enrollments[capacity:] # The latest enrollments beyond the group's size
+        fix = ["-- Either raise the group size to the number of enrollments:",
+               f"UPDATE ChitGroups SET numberOfSubscribers = {len(enrollments)} WHERE id = {_hex(group_id)};",
+               "-- or remove the latest enrollments:"]
+        fix += [f"-- DELETE FROM Enrollments WHERE id = {_hex(enrollment_id)};" for enrollment_id, _ in excess]
+        results.append(violation("over_enrollment", group_id, [enrollment_id for enrollment_id, _ in excess],
+                                 f"{len(enrollments)} enrollments for {capacity} places (excess chit numbers: "
+                                 f"{', '.join(str(number) for _, number in excess)})", fix))
+    return results
+
+
+def check_month_gaps(cursor, group_ids, in_groups, archived=False):
+    installments, _ = installment_tables(archived)
+    cursor.execute(f"""SELECT g.id, g.startDate, i.monthNumber
+                       FROM ChitGroups g
+                       JOIN {installments} i ON i.groupId = g.id
+                       WHERE g.id IN {in_groups}
+                       ORDER BY g.id, i.monthNumber""", group_ids)
+    months_by_group = {}
+    for group_id, start_date, month in cursor.fetchall():
+        months_by_group.setdefault(bytes(group_id), (start_date, []))[1].append(month)
+    results = []
+    for group_id, (start_date, months) in months_by_group.items():
+        missing = sorted(set(range(1, max(months) + 1)) - set(months))
+        if missing:
+            fix = [f"INSERT INTO {installments} (id, groupId, monthNumber, dueDate, isAuctionConducted, isCompleted) "
+                   f"VALUES ({_hex(uuid.uuid4().bytes)}, {_hex(group_id)}, {month}, '{add_months(start_date, month - 1)}', FALSE, FALSE);"
+                   for month in missing]
+            results.append(violation("month_gap", group_id, [], f"Missing installment months: {', '.join(map(str, missing))}",
+                                     fix, archived))
+    return results
+
+
+def check_duplicate_payments(cursor, group_ids, in_groups, archived=False):
+    installments, payments = installment_tables(archived)
+    # Rows of every (installment, subscriber, day, amount) that occurs more than once, oldest first
+    cursor.execute(f"""SELECT i.groupId, p.id, p.installmentId, p.subscriberId, p.paymentDate, p.amountPaid
+                       FROM {installments} i
+                       JOIN {payments} p ON p.installmentId = i.id
+                       JOIN (
+                           SELECT p2.installmentId, p2.subscriberId, DATE(p2.paymentDate) AS paymentDay, p2.amountPaid
+                           FROM {installments} i2
+                           JOIN {payments} p2 ON p2.installmentId = i2.id
+                           WHERE i2.groupId IN {in_groups}
+                           GROUP BY p2.installmentId, p2.subscriberId, DATE(p2.paymentDate), p2.amountPaid
+                           HAVING COUNT(*) > 1
+                       ) d ON d.installmentId = p.installmentId AND d.subscriberId = p.subscriberId
+                          AND d.paymentDay = DATE(p.paymentDate) AND d.amountPaid = p.amountPaid
+                       WHERE i.groupId IN {in_groups}
+                       ORDER BY p.installmentId, p.subscriberId, p.paymentDate""", group_ids + group_ids)
+    copies = {}
+    for group_id, payment_id, installment_id, subscriber_id, payment_date, amount in cursor.fetchall():
+        key = (bytes(group_id), bytes(installment_id), bytes(subscriber_id), str(payment_date)[:10], amount)
+        copies.setdefault(key, []).append(payment_id)
+    return [violation("duplicate_payment", group_id, payment_ids,
+                      f"{len(payment_ids)} payments of {amount} on {day} by subscriber {_uuid(subscriber_id)} for installment {_uuid(installment_id)}",
+                      [f"DELETE FROM {payments} WHERE id = {_hex(payment_id)}; -- keeps the first copy" for payment_id in payment_ids[1:]],
+                      archived)
+            for (group_id, installment_id, subscriber_id, day, amount), payment_ids in copies.items()]
+
+
+CHECK_FUNCTIONS = {
+    "unenrolled_payment": check_unenrolled_payments,
+    "over_enrollment": check_over_enrollment,
+    "month_gap": check_month_gaps,
+    "duplicate_payment": check_duplicate_payments,
+}
+
+
+# --- Parallel Scan ---
+
+_worker_conn = None # One connection per worker process
+
+
+def _init_worker(backend):
+    global _worker_conn
+    _worker_conn = backend.connect()
+
+
+def check_chunk(task):
+    """Runs the selected checks for one chunk of group ids in a worker. Returns (violations, number of groups)."""
+    group_ids, checks = task
+    in_groups = f"({', '.join(['%s'] * len(group_ids))})"
+    cursor = _worker_conn.cursor()
+    try:
+        violations = []
+        for check in checks:
+            for archived in ((False, True) if check in INSTALLMENT_CHECKS else (False,)):
+                violations.extend(CHECK_FUNCTIONS[check](cursor, group_ids, in_groups, archived))
+        _worker_conn.rollback() # End the read transaction so the next chunk sees current data
+        return violations, len(group_ids)
+    finally:
+        cursor.close()
+
+
+def list_group_ids(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM ChitGroups ORDER BY id")
+        return [bytes(row[0]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def run_checks(backend, checks=CHECKS, processes=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Checks every group in parallel. Returns the list of violations. progress(groups done, total) is called per chunk."""
+    conn = backend.connect()
+    try:
+        group_ids = list_group_ids(conn)
+    finally:
+        conn.close()
+    tasks = [(group_ids[start:start + chunk_size], list(checks)) for start in range(0, len(group_ids), chunk_size)]
+    violations, done = [], 0
+    with Pool(processes or os.cpu_count(), initializer=_init_worker, initargs=(backend,)) as pool:
+        # Unordered: a chunk of large groups doesn't hold up the results of the others
+        for chunk_violations, group_count in pool.imap_unordered(check_chunk, tasks):
+            violations.extend(chunk_violations)
+            done += group_count
+            if progress:
+                progress(done, len(group_ids))
+    return violations
+
+
+def write_fix_sql(path, violations):
+    """Writes the suggested fixes of all violations as one SQL script (in a transaction, for review first)."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"-- Fix-up script written by integrity.py on {datetime.datetime.now():%Y-%m-%d %H:%M}\n")
+        f.write("-- Review every statement before running it.\n")
+        f.write("BEGIN;\n")
+        for v in violations:
+            if v["fix"]:
+                f.write(f"\n-- {v['check']} in group {v['groupId']}: {v['detail']}\n")
+                f.write("\n".join(v["fix"]) + "\n")
+        f.write("\nCOMMIT;\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the database for integrity violations in parallel.")
+    parser.add_argument("--checks", nargs="+", choices=CHECKS, default=list(CHECKS))
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="Worker processes (each with its own connection)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Groups per task")
+    parser.add_argument("--report", help="Write every violation as a JSON line to this file")
+    parser.add_argument("--fix-sql", help="Write suggested fix-up SQL to this file")
+    parser.add_argument("--sqlite", help="Use this SQLite file instead of the database in secrets.toml")
+    parser.add_argument("--tenant", help="Check this tenant's database instead of the database in secrets.toml (see tenants.py)")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        # Read only: the inspected file is not changed (no schema, triggers or WAL switch)
+        backend = storage.SQLiteBackend(args.sqlite, mode="ro")
+    else:
+        import streamlit as st # Only needed to read .streamlit/secrets.toml
+        if args.tenant:
+            import tenants
+            try:
+                backend = tenants.tenant_backend_from_secrets(st.secrets, args.tenant)
+            except Error as e:
+                parser.error(str(e))
+        else:
+            backend = storage.backend_from_secrets(st.secrets)
+
+    started = time.perf_counter()
+    try:
+        violations = run_checks(backend, args.checks, args.processes, args.chunk_size,
+                                progress=lambda done, total: print(f"\rChecked {done}/{total} groups", end="", flush=True))
+    except Error as e:
+        print(f"\nCheck failed: {e}")
+        return
+    print(f"\nFinished in {time.perf_counter() - started:.1f}s")
+
+    for check in args.checks:
+        found = [v for v in violations if v["check"] == check]
+        print(f"{check:<20}{len(found):>8} violations")
+        for v in found[:5]:
+            print(f"    group {v['groupId']}: {v['detail']}")
+        if len(found) > 5:
+            print(f"    ... and {len(found) - 5} more")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            for v in violations:
+                f.write(json.dumps(v) + "\n")
+        print(f"Report written to {args.report}")
+    if args.fix_sql:
+        write_fix_sql(args.fix_sql, violations)
+        print(f"Fix-up SQL written to {args.fix_sql} (review before running)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Concurrent-session load test for the Streamlit pages.
+
+Runs N simulated clerks at once in one process, each a headless Streamlit session
+(streamlit.testing.v1.AppTest) driving foremenapp2.py page by page, the same way a
+browser session reruns the script on every interaction. The sessions share the app's
+cached resources (database connection, replica checks, metrics) exactly like real
+sessions served by one `streamlit run` process.
+
+For every page it reports throughput, p50/p95/p99 latency and the error rate, where an
+error is an uncaught exception or an st.error message in the rendered page.
+
+Seed a local database first (rows are named "Load Test ..." so they can be removed again):
+    python loadtest.py --seed --groups 20 --members 30 --months 12
+Then run the test (database from .streamlit/secrets.toml, or a SQLite file with --sqlite):
+    python loadtest.py --sessions 10 --duration 60
+    python loadtest.py --sessions 10 --duration 60 --pages "Record Payments" "View Dues & Status"
+Remove the seeded rows:
+    python loadtest.py --cleanup
+"""
+
+import argparse
+import datetime
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+from dates import add_months
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "foremenapp2.py")
+SEED_GROUP_PREFIX = "Load Test Group"
+SEED_PHONE_PREFIX = "load-"
+
+
+# --- Seeding ---
+
+def seed_database(conn, groups, members, months, payment_ratio=0.7):
+    """Creates groups with enrolled members, installments and payments for about payment_ratio of the dues."""
+    cursor = conn.cursor()
+    try:
+        start = datetime.date.today().replace(day=1)
+        subscriber_ids = [uuid.uuid4().bytes for _ in range(groups * members)]
+        cursor.executemany("""INSERT INTO Subscribers (id, name, phoneNumber, address, createdDate, isActive)
+                              VALUES (%s, %s, %s, NULL, %s, TRUE)""",
+                           [(sid, f"Load Member {n}", SEED_PHONE_PREFIX + sid.hex()[:16], datetime.datetime.now())
+                            for n, sid in enumerate(subscriber_ids)])
+        for g in range(groups):
+            group_id = uuid.uuid4().bytes
+            cursor.execute("""INSERT INTO ChitGroups (id, name, value, numberOfSubscribers, duration, startDate, isActive)
+                              VALUES (%s, %s, %s, %s, %s, %s, TRUE)""",
+                           (group_id, f"{SEED_GROUP_PREFIX} {g + 1}", 100000.0, members, months, start))
+            group_members = subscriber_ids[g * members:(g + 1) * members]
+            cursor.executemany("""INSERT INTO Enrollments (id, subscriberId, groupId, assignedChitNumber, joinDate)
+                                  VALUES (%s, %s, %s, %s, %s)""",
+                               [(uuid.uuid4().bytes, sid, group_id, n + 1, start) for n, sid in enumerate(group_members)])
+            installment_ids = [uuid.uuid4().bytes for _ in range(months)]
+            cursor.executemany("""INSERT INTO Installments (id, groupId, monthNumber, dueDate, isAuctionConducted, isCompleted)
+                                  VALUES (%s, %s, %s, %s, FALSE, FALSE)""",
+                               [(iid, group_id, n + 1, add_months(start, n)) for n, iid in enumerate(installment_ids)])
+            cursor.executemany("""INSERT INTO InstallmentPayments (id, installmentId, subscriberId, paymentDate, amountPaid, notes)
+                                  VALUES (%s, %s, %s, %s, %s, %s)""",
+                               [(uuid.uuid4().bytes, iid, sid, datetime.datetime.now(), 100000.0 / months, "")
+                                for iid in installment_ids for sid in group_members if random.random() < payment_ratio])
+            conn.commit() # One commit per group keeps transactions small
+    finally:
+        cursor.close()
+
+
+def cleanup_database(conn):
+    """Deletes the seeded groups and subscribers (cascades to their enrollments, installments and payments)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM ChitGroups WHERE name LIKE %s", (SEED_GROUP_PREFIX + "%",))
+        cursor.execute("DELETE FROM Subscribers WHERE phoneNumber LIKE %s", (SEED_PHONE_PREFIX + "%",))
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+# --- Page Scenarios ---
+# Each scenario takes a session that already shows the page and performs the page's main action.
+# Returning without doing anything is fine for pages that only display data.
+
+def _click(at, key):
+    buttons = [b for b in at.button if b.key == key]
+    if buttons:
+        buttons[0].click()
+    at.run()
+
+def _record_payment(at):
+    amount = [n for n in at.number_input if n.key == "payment_amount_input"]
+    if amount:
+        amount[0].set_value(round(random.uniform(100, 5000), 2))
+        [b for b in at.button if b.label == "Record Payment"][0].click()
+    at.run()
+
+SCENARIOS = {
+    "Dashboard": None,
+    "Manage Chit Groups": None,
+    "Manage Subscribers": None,
+    "Manage Enrollments": lambda at: _click(at, "show_enrollments_button"),
+    "Manage Installments": lambda at: _click(at, "show_installments_list_button"),
+    "Record Payments": _record_payment,
+    "View Dues & Status": lambda at: _click(at, "show_dues_button"),
+    "Subscriber Details": None,
+}
+
+
+# --- Load Test ---
+
+class Results:
+    """Thread-safe collection of (page, seconds, error) samples, error being None for a good run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, page, seconds, error):
+        with self._lock:
+            self.samples.setdefault(page, []).append((seconds, error))
+
+
+def _page_error(at):
+    """Returns the first exception or st.error message shown on the page, or None."""
+    if at.exception:
+        return at.exception[0].message
+    if at.error:
+        return at.error[0].value
+    return None
+
+
+def run_session(session_number, pages, secrets, deadline, results, timeout):
+    """One simulated clerk: visits random pages until the deadline and records each page's latency."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_SCRIPT, default_timeout=timeout)
+    for section, values in secrets.items():
+        at.secrets[section] = values
+    at.run() # Initial page load (not measured: it includes the session setup)
+    rng = random.Random(session_number)
+    while time.monotonic() < deadline:
+        page = rng.choice(pages)
+        started = time.perf_counter()
+        try:
+            at.sidebar.radio[0].set_value(page).run()
+            error = _page_error(at)
+            if error is None and SCENARIOS[page]:
+                SCENARIOS[page](at)
+                error = _page_error(at)
+        except Exception as e: # A timeout or crash of the session counts as an error for that page
+            error = f"{type(e).__name__}: {e}"
+        results.add(page, time.perf_counter() - started, error)
+
+
+def _percentile(sorted_values, pct):
+    return sorted_values[min(len(sorted_values) - 1, int(pct * len(sorted_values)))]
+
+
+def report(results, elapsed):
+    """Prints throughput, latency percentiles and error rate per page, then the most common errors."""
+    print(f"\n{'page':<22}{'requests':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}")
+    total = 0
+    for page, samples in sorted(results.samples.items()):
+        latencies = sorted(seconds * 1000 for seconds, error in samples)
+        errors = sum(1 for seconds, error in samples if error is not None)
+        total += len(samples)
+        print(f"{page:<22}{len(samples):>10}{len(samples) / elapsed:>9.2f}"
+              f"{_percentile(latencies, 0.50):>9.0f}{_percentile(latencies, 0.95):>9.0f}{_percentile(latencies, 0.99):>9.0f}"
+              f"{errors / len(samples):>8.1%}")
+    print(f"\nTotal: {total} page interactions in {elapsed:.1f}s ({total / elapsed:.2f}/s)")
+
+    error_counts = Counter((page, error) for page, samples in results.samples.items() for seconds, error in samples if error)
+    if error_counts:
+        print("\nMost common errors:")
+        for (page, error), count in error_counts.most_common(10):
+            print(f"  {count:>5} x {page}: {error[:120]}")
+
+
+def run_load_test(sessions, duration, pages, secrets, timeout=30):
+    """Runs the sessions concurrently for duration seconds. Returns (Results, elapsed seconds)."""
+    results = Results()
+    started = time.monotonic()
+    deadline = started + duration
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [pool.submit(run_session, n, pages, secrets, deadline, results, timeout) for n in range(sessions)]
+        for future in futures:
+            future.result()
+    return results, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the Streamlit pages with concurrent headless sessions.")
+    parser.add_argument("--sessions", type=int, default=5, help="Concurrent simulated sessions")
+    parser.add_argument("--duration", type=int, default=30, help="Seconds to run")
+    parser.add_argument("--pages", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS), help="Pages to visit")
+    parser.add_argument("--sqlite", help="Use this SQLite file instead of the database in secrets.toml")
+    parser.add_argument("--timeout", type=int, default=30, help="Seconds before a page run counts as failed")
+    parser.add_argument("--seed", action="store_true", help="Seed test data and exit")
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--members", type=int, default=20)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--cleanup", action="store_true", help="Remove seeded test data and exit")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        secrets = {"storage": {"backend": "sqlite", "sqlite_path": os.path.abspath(args.sqlite)}}
+    else:
+        import streamlit as st # Reads .streamlit/secrets.toml
+        secrets = {section: dict(values) for section, values in st.secrets.items()}
+
+    if args.seed or args.cleanup:
+        conn = storage.backend_from_secrets(secrets).connect()
+        try:
+            if args.seed:
+                seed_database(conn, args.groups, args.members, args.months)
+                print(f"Seeded {args.groups} groups x {args.members} members x {args.months} months.")
+            else:
+                cleanup_database(conn)
+                print("Removed seeded test data.")
+        finally:
+            conn.close()
+        return
+
+    print(f"Running {args.sessions} sessions for {args.duration}s over: {', '.join(args.pages)}")
+    results, elapsed = run_load_test(args.sessions, args.duration, args.pages, secrets, args.timeout)
+    report(results, elapsed)
+
+
+if __name__ == "__main__":
+    main()
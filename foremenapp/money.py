@@ -0,0 +1,152 @@
+"""
+Exact money arithmetic for Foremen Choice Digital Records Manager.
+
+Amounts are stored as DECIMAL(14,2) (exact rupees and paise) in MySQL. In Python, sums of
+many amounts are done on integer paise in numpy int64 arrays: exact like Decimal, but
+vectorized instead of one Decimal object operation per value. Floats never accumulate.
+
+    paise = money.paise_array([row['amountPaid'] for row in payments])   # int64 paise
+    total = money.from_paise(paise.sum())                                # Decimal('12345.67')
+
+Conversion rounds every value to whole paise first, so it accepts what either backend
+returns: Decimal (MySQL DECIMAL), or float/int (SQLite has no decimal type, and old
+databases still have DOUBLE columns).
+
+The monthly installment of a group is its value divided by its duration, rounded to whole
+paise (installment_paise), the same rounding the SQL uses (ROUND(g.value / g.duration, 2)).
+
+Before migrating an existing MySQL database (see the ALTER TABLE block at the end of
+chitfunddatabase.sql), list the stored amounts that are not whole paise and would be rounded:
+    python money.py --check-migration
+"""
+
+import argparse
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+PAISE_PER_RUPEE = 100
+
+# Money columns migrated from DOUBLE to DECIMAL(14,2): table -> columns
+MONEY_COLUMNS = {
+    "ChitGroups": ["value"],
+    "Installments": ["auctionPrizeAmount"],
+    "InstallmentPayments": ["amountPaid"],
+    "ArchivedInstallments": ["auctionPrizeAmount"],
+    "ArchivedInstallmentPayments": ["amountPaid"],
+    "EnrollmentSummaries": ["totalPaid"],
+    "ReminderOutbox": ["amountDue"],
+    "DashboardCounters": ["collectedToday", "collectedMonth", "overdueAmount"],
+}
+
+
+# --- Scalars ---
+
+def to_paise(value):
+    """Converts an amount (Decimal, float, int, str or None) to whole paise, rounding half up. None is 0."""
+    if value is None:
+        return 0
+    # str() of a float is its shortest exact representation, e.g. 0.1 + 0.2 -> '0.30000000000000004'
+    amount = value if isinstance(value, Decimal) else Decimal(str(value))
+    return int((amount * PAISE_PER_RUPEE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_paise(paise):
+    """Converts whole paise (int or numpy integer) to a Decimal amount with two decimals."""
+    return Decimal(int(paise)).scaleb(-2)
+
+
+def to_decimal(value):
+    """Rounds an amount to whole paise as a Decimal (for writing to DECIMAL columns and for display)."""
+    return from_paise(to_paise(value))
+
+
+def installment_paise(value_paise, duration):
+    """The monthly installment of a group: value / duration, rounded half up to whole paise."""
+    if not duration:
+        return 0
+    return (2 * value_paise + duration) // (2 * duration)
+
+
+# --- Arrays ---
+
+def paise_array(values):
+    """
+    Converts a sequence of amounts to an int64 array of paise. None counts as 0.
+    Every two-decimal amount below about 10^13 rupees becomes exact: amount * 100 is then
+    within far less than half a paisa of the integer and rint() lands on it.
+    """
+    amounts = np.fromiter((0.0 if value is None else float(value) for value in values), dtype=np.float64)
+    return np.rint(amounts * PAISE_PER_RUPEE).astype(np.int64)
+
+
+def group_totals_paise(keys, paise, size):
+    """
+    Sums paise per key (integers 0..size-1): returns an int64 array of length size.
+    Accumulates in int64 (bincount would sum float64 weights).
+    """
+    totals = np.zeros(size, dtype=np.int64)
+    np.add.at(totals, np.asarray(keys, dtype=np.intp), np.asarray(paise, dtype=np.int64))
+    return totals
+
+
+def dues_paise(value_paise, duration, installments_due, paid_paise):
+    """
+    Outstanding dues per enrollment (arrays, element-wise): installments fallen due times the
+    monthly installment, minus what was paid, never below 0.
+    """
+    value_paise = np.asarray(value_paise, dtype=np.int64)
+    duration = np.asarray(duration, dtype=np.int64)
+    safe_duration = np.where(duration > 0, duration, 1)
+    installment = np.where(duration > 0, (2 * value_paise + safe_duration) // (2 * safe_duration), 0)
+    expected = installment * np.asarray(installments_due, dtype=np.int64)
+    return np.maximum(expected - np.asarray(paid_paise, dtype=np.int64), 0)
+
+
+# --- Migration Check ---
+
+def find_unrounded_amounts(conn, examples=5):
+    """Returns {(table, column): (rows that are not whole paise, example values)} for the money columns."""
+    results = {}
+    cursor = conn.cursor()
+    try:
+        for table, columns in MONEY_COLUMNS.items():
+            for column in columns:
+                cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {column} <> ROUND({column}, 2)")
+                count = cursor.fetchone()[0]
+                if count:
+                    cursor.execute(f"SELECT {column} FROM {table} WHERE {column} <> ROUND({column}, 2) LIMIT %s", (examples,))
+                    results[(table, column)] = (count, [row[0] for row in cursor.fetchall()])
+    finally:
+        cursor.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Money column checks for the DOUBLE to DECIMAL(14,2) migration.")
+    parser.add_argument("--check-migration", action="store_true", required=True,
+                        help="List stored amounts that are not whole paise (the migration rounds them)")
+    parser.add_argument("--sqlite", help="Use this SQLite file instead of the database in secrets.toml")
+    args = parser.parse_args()
+
+    import storage
+    from mysql.connector import Error
+    if args.sqlite:
+        conn = storage.SQLiteBackend(args.sqlite, mode="ro").connect() # Read only: the file is not changed
+    else:
+        import streamlit as st # Only needed to read .streamlit/secrets.toml
+        conn = storage.backend_from_secrets(st.secrets).connect()
+    try:
+        results = find_unrounded_amounts(conn)
+        for (table, column), (count, values) in results.items():
+            print(f"{table}.{column}: {count} values will be rounded to paise, e.g. {', '.join(map(repr, values))}")
+        if not results:
+            print("All amounts are whole paise: the migration changes no values.")
+    except Error as e:
+        print(f"Check failed: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
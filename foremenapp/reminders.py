@@ -0,0 +1,388 @@
+"""
+Dues reminders through an outbox table.
+
+Reminders are never sent inline. Instead:
+
+1. enqueue_reminders() finds every active member who has not paid an installment due in
+   the next few days with ONE set-based INSERT ... SELECT into ReminderOutbox.
+   UNIQUE (installmentId, enrollmentId) makes the insert skip members already queued,
+   so running it again (e.g. every hour) never queues a second reminder.
+2. dispatch_reminders() claims pending rows in batches, sends them through a pluggable
+   sender at a limited rate and records the outcome per batch. Failed sends are retried
+   with exponential backoff up to max_attempts, then marked failed.
+
+Each row goes pending -> sending -> sent (or back to pending for a retry, or failed).
+A row is marked 'sending' and committed BEFORE it is handed to the sender, so a crash
+while sending never causes a second reminder right away. Rows left in 'sending' by a
+dispatcher that died are put back to pending (counted as an attempt) by the next dispatch
+run once their claim is older than the claim timeout; those members may get a second reminder.
+Members who pay after being queued are cancelled before each batch.
+
+Runs against the central MySQL database (the [mysql] section of .streamlit/secrets.toml),
+a tenant's database with --tenant (see tenants.py), or a SQLite file with --sqlite for
+trying it out. From the foremenapp folder:
+    python reminders.py --days 3 --sender file --out reminders.jsonl
+    python reminders.py --enqueue-only --days 3
+    python reminders.py --dispatch-only --sender stub --rate 50 --batch-size 500
+"""
+
+import abc
+import argparse
+import datetime
+import json
+import random
+import threading
+import time
+import uuid
+
+from mysql.connector import Error
+
+import storage
+from transactions import UnitOfWork
+
+# ReminderOutbox.status values
+PENDING = "pending"
+SENDING = "sending" # Claimed by a dispatcher (committed before the send)
+SENT = "sent"
+FAILED = "failed" # Gave up after max_attempts
+CANCELLED = "cancelled" # The member paid before the reminder went out
+
+DEFAULT_DAYS_AHEAD = 3
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_RATE = 20.0 # Reminders per second
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETRY_DELAY = 60 # Seconds before the first retry, doubled for every further attempt
+# Seconds after which a claim is considered abandoned. Far longer than a batch takes to send
+# (batch size / rate, 10 seconds by default), so a live dispatcher's rows are never reclaimed.
+DEFAULT_CLAIM_TIMEOUT = 30 * 60
+
+# Columns handed to the sender
+REMINDER_COLUMNS = "id, subscriberName, phoneNumber, groupName, monthNumber, dueDate, amountDue, attempts"
+
+
+# --- Enqueue ---
+
+def write_enqueue_reminders(cursor, dialect, first_due_date, last_due_date, now):
+    """
+    Write operation: queues a reminder for every active member of an active group who has not
+    paid an open installment due between the two dates. Returns the number of reminders queued.
+    """
+    # Duplicates (already queued for this installment) are skipped by the unique key
+    insert = "INSERT OR IGNORE" if dialect == "sqlite" else "INSERT IGNORE"
+    new_id = "randomblob(16)" if dialect == "sqlite" else "UUID_TO_BIN(UUID())"
+    cursor.execute(f"""
+        {insert} INTO ReminderOutbox
+            (id, installmentId, enrollmentId, subscriberId, subscriberName, phoneNumber, groupName,
+             monthNumber, dueDate, amountDue, status, attempts, nextAttemptAt, createdDate)
+        SELECT
+            {new_id},
+            i.id,
+            e.id,
+            s.id,
+            s.name,
+            s.phoneNumber,
+            g.name,
+            i.monthNumber,
+            i.dueDate,
+            ROUND(g.value / g.duration, 2), -- Monthly contribution
+            '{PENDING}',
+            0,
+            %s,
+            %s
+        FROM Installments i
+        JOIN ChitGroups g ON g.id = i.groupId
+        JOIN Enrollments e ON e.groupId = i.groupId
+        JOIN Subscribers s ON s.id = e.subscriberId
+        WHERE i.dueDate BETWEEN %s AND %s
+          AND i.isCompleted = FALSE
+          AND g.isActive = TRUE
+          AND s.isActive = TRUE
+          AND NOT EXISTS (
+              SELECT 1 FROM InstallmentPayments p
+              WHERE p.installmentId = i.id AND p.subscriberId = e.subscriberId
+          )""", (now, now, first_due_date, last_due_date))
+    return cursor.rowcount
+
+
+def enqueue_reminders(conn, days_ahead=DEFAULT_DAYS_AHEAD, today=None):
+    """Queues reminders for installments due from today up to days_ahead days from now. Returns the count queued."""
+    today = today or datetime.date.today()
+    with UnitOfWork(conn) as uow:
+        uow.add(write_enqueue_reminders, storage.dialect_of(conn), today,
+                today + datetime.timedelta(days=days_ahead), datetime.datetime.now())
+    return uow.results[0]
+
+
+# --- Senders ---
+
+def format_reminder(reminder):
+    """The reminder text for one outbox row."""
+    return (f"Dear {reminder['subscriberName']}, your installment {reminder['monthNumber']} of "
+            f"{reminder['groupName']} ({reminder['amountDue']:,.2f}) is due on {reminder['dueDate']}. "
+            f"Please ignore this message if you have already paid. - Foremen Choice")
+
+
+class Sender(abc.ABC):
+    """
+    Base class for reminder senders. send() delivers one reminder (a dict with the
+    REMINDER_COLUMNS) and raises on failure; flush() is called after every batch.
+    """
+
+    @abc.abstractmethod
+    def send(self, reminder):
+        """Delivers one reminder; raises on failure."""
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class FileSender(Sender):
+    """Appends each reminder as a JSON line to a local file (for testing, or for a separate SMS job to pick up)."""
+
+    def __init__(self, path):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def send(self, reminder):
+        self.file.write(json.dumps({
+            "reminderId": reminder["id"].hex(),
+            "phoneNumber": reminder["phoneNumber"],
+            "message": format_reminder(reminder),
+            "sentAt": datetime.datetime.now().isoformat(),
+        }) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class StubSender(Sender):
+    """Keeps the messages in memory. failure_rate makes a share of sends fail, to exercise the retries."""
+
+    def __init__(self, failure_rate=0.0):
+        self.failure_rate = failure_rate
+        self.sent = [] # (phoneNumber, message)
+
+    def send(self, reminder):
+        if random.random() < self.failure_rate:
+            raise ConnectionError("Simulated gateway failure")
+        self.sent.append((reminder["phoneNumber"], format_reminder(reminder)))
+
+
+SENDERS = {
+    "file": lambda args: FileSender(args.out),
+    "stub": lambda args: StubSender(args.failure_rate),
+}
+
+
+class RateLimiter:
+    """Token bucket: allows `rate` calls per second on average, with bursts of up to `burst` calls."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Blocks until the next call is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                time.sleep((1 - self._tokens) / self.rate)
+                self._last = time.monotonic()
+                self._tokens = 0
+            else:
+                self._tokens -= 1
+
+
+# --- Dispatch ---
+
+def write_cancel_paid_reminders(cursor):
+    """Write operation: cancels queued reminders of members who have paid in the meantime. Returns the count."""
+    cursor.execute(f"""
+        UPDATE ReminderOutbox SET status = '{CANCELLED}'
+        WHERE status = '{PENDING}'
+          AND EXISTS (
+              SELECT 1 FROM InstallmentPayments p
+              WHERE p.installmentId = ReminderOutbox.installmentId AND p.subscriberId = ReminderOutbox.subscriberId
+          )""")
+    return cursor.rowcount
+
+
+def write_claim_batch(cursor, claim_token, batch_size, now):
+    """
+    Write operation: marks up to batch_size due reminders as 'sending' under claim_token.
+    The status check in the UPDATE means two dispatchers never claim the same row.
+    """
+    cursor.execute(f"""SELECT id FROM ReminderOutbox
+                       WHERE status = '{PENDING}' AND nextAttemptAt <= %s
+                       ORDER BY nextAttemptAt
+                       LIMIT %s""", (now, batch_size))
+    ids = [bytes(row[0]) for row in cursor.fetchall()]
+    if not ids:
+        return 0
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(f"""UPDATE ReminderOutbox SET status = '{SENDING}', claimToken = %s, nextAttemptAt = %s
+                       WHERE id IN ({placeholders}) AND status = '{PENDING}'""", (claim_token, now, *ids))
+    return cursor.rowcount
+
+
+def write_batch_results(cursor, sent_ids, failures, now, max_attempts, retry_delay):
+    """
+    Write operation: records a dispatched batch. sent_ids are marked sent; failures is a list of
+    (id, attempts before this send, error message), retried later or marked failed.
+    """
+    if sent_ids:
+        cursor.executemany(f"""UPDATE ReminderOutbox SET status = '{SENT}', attempts = attempts + 1, sentDate = %s, lastError = NULL
+                               WHERE id = %s""", [(now, reminder_id) for reminder_id in sent_ids])
+    retry_rows = []
+    for reminder_id, attempts, error in failures:
+        attempts += 1
+        if attempts >= max_attempts:
+            retry_rows.append((FAILED, attempts, now, error[:1000], reminder_id))
+        else:
+            next_attempt = now + datetime.timedelta(seconds=retry_delay * 2 ** (attempts - 1))
+            retry_rows.append((PENDING, attempts, next_attempt, error[:1000], reminder_id))
+    if retry_rows:
+        cursor.executemany("""UPDATE ReminderOutbox SET status = %s, attempts = %s, nextAttemptAt = %s, lastError = %s
+                              WHERE id = %s""", retry_rows)
+
+
+def fetch_claimed(conn, claim_token):
+    """Returns the reminders claimed under claim_token as dicts."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT {REMINDER_COLUMNS} FROM ReminderOutbox WHERE claimToken = %s AND status = '{SENDING}'",
+                       (claim_token,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def dispatch_reminders(conn, sender, batch_size=DEFAULT_BATCH_SIZE, rate=DEFAULT_RATE,
+                       max_attempts=DEFAULT_MAX_ATTEMPTS, retry_delay=DEFAULT_RETRY_DELAY,
+                       claim_timeout=DEFAULT_CLAIM_TIMEOUT):
+    """
+    Sends all due reminders in batches through sender, at most `rate` per second. First releases
+    reminders whose claim is older than claim_timeout seconds and cancels those of members who paid.
+    Returns a dict with the number of reminders sent, retried (will be sent again later), failed,
+    cancelled and released.
+    """
+    totals = {"sent": 0, "retried": 0, "failed": 0, "cancelled": 0, "released": 0}
+    with UnitOfWork(conn) as uow:
+        uow.add(write_release_stuck_reminders,
+                datetime.datetime.now() - datetime.timedelta(seconds=claim_timeout), max_attempts)
+        uow.add(write_cancel_paid_reminders)
+    totals["released"], totals["cancelled"] = uow.results
+
+    limiter = RateLimiter(rate)
+    while True:
+        claim_token = uuid.uuid4().bytes
+        with UnitOfWork(conn) as uow:
+            uow.add(write_claim_batch, claim_token, batch_size, datetime.datetime.now())
+        if not uow.results[0]:
+            break
+
+        sent_ids, failures = [], []
+        for reminder in fetch_claimed(conn, claim_token):
+            reminder["id"] = bytes(reminder["id"])
+            limiter.wait()
+            try:
+                sender.send(reminder)
+                sent_ids.append(reminder["id"])
+            except Exception as e: # Any sender failure is retried (the reminder was not delivered)
+                failures.append((reminder["id"], reminder["attempts"], f"{type(e).__name__}: {e}"))
+        sender.flush()
+
+        with UnitOfWork(conn) as uow:
+            uow.add(write_batch_results, sent_ids, failures, datetime.datetime.now(), max_attempts, retry_delay)
+        totals["sent"] += len(sent_ids)
+        gave_up = sum(1 for _, attempts, _ in failures if attempts + 1 >= max_attempts)
+        totals["failed"] += gave_up
+        totals["retried"] += len(failures) - gave_up
+    return totals
+
+
+def write_release_stuck_reminders(cursor, claimed_before, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Write operation: puts reminders claimed before claimed_before (a dispatcher died while
+    sending them) back to pending, or marks them failed once they have used up max_attempts.
+    The lost send counts as an attempt. Those members MAY get a second reminder.
+    """
+    # nextAttemptAt holds the claim time while a row is 'sending' (see write_claim_batch)
+    cursor.execute(f"""UPDATE ReminderOutbox
+                       SET status = CASE WHEN attempts + 1 >= %s THEN '{FAILED}' ELSE '{PENDING}' END,
+                           attempts = attempts + 1, claimToken = NULL, lastError = 'Claim timed out'
+                       WHERE status = '{SENDING}' AND nextAttemptAt < %s""", (max_attempts, claimed_before))
+    return cursor.rowcount
+
+
+def outbox_status_counts(conn):
+    """Returns {status: number of reminders} for the whole outbox."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT status, COUNT(*) FROM ReminderOutbox GROUP BY status")
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue and send dues reminders through the ReminderOutbox table.")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS_AHEAD, help="Remind about installments due within this many days")
+    parser.add_argument("--enqueue-only", action="store_true", help="Only queue reminders, don't send")
+    parser.add_argument("--dispatch-only", action="store_true", help="Only send already queued reminders")
+    parser.add_argument("--sender", choices=list(SENDERS), default="file")
+    parser.add_argument("--out", default="reminders.jsonl", help="Output file of the file sender")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of sends the stub sender fails")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Reminders per second")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    parser.add_argument("--retry-delay", type=int, default=DEFAULT_RETRY_DELAY, help="Seconds before the first retry")
+    parser.add_argument("--claim-timeout", type=int, default=DEFAULT_CLAIM_TIMEOUT // 60, metavar="MINUTES",
+                        help="Put reminders stuck in 'sending' for this long back to pending (may resend them)")
+    parser.add_argument("--sqlite", help="Use this SQLite file instead of the [mysql] database")
+    parser.add_argument("--tenant", help="Use this tenant's database instead of the [mysql] database (see tenants.py)")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        conn = storage.SQLiteBackend(args.sqlite, track_changes=False).connect()
+    else:
+        import streamlit as st # Only needed to read .streamlit/secrets.toml
+        if args.tenant:
+            import tenants
+            try:
+                conn = tenants.tenant_backend_from_secrets(st.secrets, args.tenant).connect()
+            except Error as e:
+                parser.error(str(e))
+        else:
+            conn = storage.mysql_backend_from_secrets(st.secrets).connect()
+    try:
+        if not args.dispatch_only:
+            print(f"Queued {enqueue_reminders(conn, args.days)} reminders.")
+        if not args.enqueue_only:
+            sender = SENDERS[args.sender](args)
+            try:
+                totals = dispatch_reminders(conn, sender, args.batch_size, args.rate, args.max_attempts, args.retry_delay,
+                                            args.claim_timeout * 60)
+            finally:
+                sender.close()
+            print(f"Sent {totals['sent']}, retrying later {totals['retried']}, failed {totals['failed']}, "
+                  f"cancelled (paid) {totals['cancelled']}, released (stuck) {totals['released']}.")
+        print(f"Outbox: {outbox_status_counts(conn)}")
+    except Error as e:
+        print(f"Reminders failed: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
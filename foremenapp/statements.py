@@ -0,0 +1,192 @@
+"""
+Registry of server-side prepared statements for the hot queries.
+
+Text queries are sent and parsed by MySQL on every call. A prepared statement is parsed
+once per connection and afterwards only the parameters travel over the wire (binary protocol).
+The registry keeps ONE prepared cursor per (connection, statement), so each statement is
+prepared the first time it runs on a connection and reused from then on. Each pooled or
+cached connection gets its own statements, since prepared statements belong to a MySQL session.
+A cached connection is shared by every Streamlit session, so the registry holds a lock per
+connection from execute to the last fetched row: otherwise a session running the same
+statement in between would overwrite the cursor's results and one clerk would get another's
+rows. Callers using cursor() or execute() directly hold connection_lock(conn) themselves.
+
+    rows = REGISTRY.fetchall(conn, "installments_for_group", (group_id_bytes,))
+
+Rows come back as tuples (no per-row dict building); fetch_dicts() builds dicts only where
+the caller really needs key access. Connections use the C extension when it is installed
+(see MySQLBackend). On the SQLite branch store the same calls work with ordinary cursors,
+and sqlite3's own statement cache keeps the parsed statements.
+
+mysql.connector only reuses a prepared statement when it is given the SAME string object,
+so always run statements through the registry (or pass SQL[name]) rather than copying the text.
+"""
+
+import threading
+
+from mysql.connector import Error
+
+from archive import installment_tables
+
+# Errors after which the prepared statements of a connection can no longer be used
+STALE_STATEMENT_ERRNOS = {
+    1243, # ER_UNKNOWN_STMT_HANDLER (statement was closed on the server)
+    2006, # CR_SERVER_GONE_ERROR
+    2013, # CR_SERVER_LOST
+    2055, # CR_SERVER_LOST_EXTENDED
+}
+
+SQL = {}
+
+SQL["enrollments_for_group"] = """SELECT
+        e.id AS enrollmentId,
+        s.id AS subscriberId,
+        s.name AS subscriberName,
+        s.phoneNumber AS subscriberPhone,
+        e.assignedChitNumber,
+        e.joinDate
+    FROM Enrollments e
+    JOIN Subscribers s ON e.subscriberId = s.id
+    WHERE e.groupId = %s
+    ORDER BY e.assignedChitNumber"""
+
+SQL["insert_payment"] = """INSERT INTO InstallmentPayments (id, installmentId, subscriberId, paymentDate, amountPaid, notes)
+    VALUES (%s, %s, %s, %s, %s, %s)"""
+
+# Dashboard counters for one new payment (parameters from counters.payment_counter_params()).
+# Only applies while refreshedAt is still the value read before the payment (see counters.py).
+# MySQL applies SET assignments left to right (later ones see the new values), SQLite uses the old values:
+# every column is assigned before the columns it reads are changed, so both give the same result.
+SQL["payment_counters"] = """UPDATE DashboardCounters SET
+        collectedToday = CASE WHEN collectedDate = %s THEN collectedToday + %s ELSE %s END,
+        paymentsToday = CASE WHEN collectedDate = %s THEN paymentsToday + 1 ELSE 1 END,
+        collectedDate = %s,
+        collectedMonth = CASE WHEN monthStart = %s THEN collectedMonth + %s ELSE %s END,
+        monthStart = %s,
+        paymentsLastHour = CASE WHEN hourStart = %s THEN paymentsLastHour WHEN hourStart = %s THEN paymentsThisHour ELSE 0 END,
+        paymentsThisHour = CASE WHEN hourStart = %s THEN paymentsThisHour + 1 ELSE 1 END,
+        hourStart = %s,
+        overdueAmount = overdueAmount - COALESCE((
+            -- The monthly share, if this is the first payment by the member of an overdue installment
+            SELECT ROUND(g.value / g.duration, 2)
+            FROM Installments i
+            JOIN ChitGroups g ON g.id = i.groupId
+            WHERE i.id = %s
+              AND i.dueDate < %s
+              AND i.isCompleted = FALSE
+              AND g.isActive = TRUE
+              AND EXISTS (SELECT 1 FROM Enrollments e WHERE e.groupId = i.groupId AND e.subscriberId = %s)
+              AND (SELECT COUNT(*) FROM InstallmentPayments p WHERE p.installmentId = i.id AND p.subscriberId = %s) = 1
+        ), 0),
+        updatedAt = %s
+    WHERE id = 1 AND refreshedAt = %s"""
+
+# Installment and dues queries exist for the live tables and the archive tables (see archive.py)
+for _archived, _prefix in ((False, ""), (True, "archived_")):
+    _installments_table, _payments_table = installment_tables(_archived)
+
+    SQL[_prefix + "installments_for_group"] = f"""SELECT
+            id,
+            groupId,
+            monthNumber,
+            dueDate,
+            isAuctionConducted,
+            auctionPrizeAmount,
+            auctionWinnerId,
+            isCompleted
+        FROM {_installments_table}
+        WHERE groupId = %s
+        ORDER BY monthNumber"""
+
+    SQL[_prefix + "installment_by_month"] = f"SELECT id FROM {_installments_table} WHERE groupId = %s AND monthNumber = %s"
+
+    # Checks if *any* payment exists for each enrolled subscriber (see get_payment_status_for_installment)
+    SQL[_prefix + "payment_status"] = f"""SELECT
+            e.id AS enrollmentId,
+            s.id AS subscriberId,
+            s.name AS subscriberName,
+            e.assignedChitNumber,
+            ip.id IS NOT NULL AS hasPaidThisInstallment,
+            ip.amountPaid AS totalPaidThisInstallment
+        FROM Enrollments e
+        JOIN Subscribers s ON e.subscriberId = s.id
+        LEFT JOIN {_payments_table} ip
+            ON e.subscriberId = ip.subscriberId AND ip.installmentId = %s
+        WHERE e.groupId = %s
+        ORDER BY e.assignedChitNumber"""
+
+
+class StatementRegistry:
+    """Prepares each statement once per connection and reuses the prepared cursor."""
+
+    def __init__(self, statements=SQL):
+        self.statements = statements
+        self._cursors = {} # (id(conn), name) -> (conn, prepared cursor)
+        self._connection_locks = {} # id(conn) -> (conn, lock held while a statement's rows are read)
+        self._lock = threading.Lock()
+
+    def connection_lock(self, conn):
+        """
+        Returns the lock serializing this connection's prepared cursors. Hold it from execute()
+        (or the start of a transaction on cursor()) until every row has been fetched.
+        """
+        with self._lock:
+            entry = self._connection_locks.get(id(conn))
+            if entry is None or entry[0] is not conn:
+                entry = (conn, threading.RLock()) # Reentrant: fetchall() inside a locked transaction
+                self._connection_locks[id(conn)] = entry
+        return entry[1]
+
+    def cursor(self, conn, name):
+        """Returns the prepared cursor for a statement on this connection, creating it on first use."""
+        key = (id(conn), name)
+        with self._lock:
+            entry = self._cursors.get(key)
+            # "is" check: a new connection object may reuse the id of a closed one
+            if entry is None or entry[0] is not conn:
+                entry = (conn, conn.cursor(prepared=True))
+                self._cursors[key] = entry
+        return entry[1]
+
+    def execute(self, conn, name, params=()):
+        """
+        Executes a registered statement and returns its (prepared) cursor.
+        The caller holds connection_lock(conn) until it has fetched the rows.
+        """
+        cursor = self.cursor(conn, name)
+        try:
+            cursor.execute(self.statements[name], params)
+        except Error as e:
+            if e.errno in STALE_STATEMENT_ERRNOS:
+                self.discard(conn) # Prepared again on the next call (after the connection reconnects)
+            raise
+        return cursor
+
+    def fetchall(self, conn, name, params=()):
+        """Runs a registered query and returns all rows as tuples."""
+        with self.connection_lock(conn):
+            return self.execute(conn, name, params).fetchall()
+
+    def fetch_dicts(self, conn, name, params=()):
+        """Runs a registered query and returns all rows as dictionaries (for callers needing key access)."""
+        with self.connection_lock(conn):
+            cursor = self.execute(conn, name, params)
+            rows = cursor.fetchall()
+            columns = cursor.column_names
+        return [dict(zip(columns, row)) for row in rows]
+
+    def discard(self, conn):
+        """Forgets (and closes) all prepared cursors of a connection."""
+        with self._lock:
+            stale = [key for key, (entry_conn, _) in self._cursors.items() if entry_conn is conn]
+            cursors = [self._cursors.pop(key)[1] for key in stale]
+            if self._connection_locks.get(id(conn), (None,))[0] is conn:
+                del self._connection_locks[id(conn)]
+        for cursor in cursors:
+            try:
+                cursor.close()
+            except Error:
+                pass # The server side statement is already gone
+
+
+REGISTRY = StatementRegistry() # Shared by the app's data functions
@@ -0,0 +1,532 @@
+"""
+Storage backends for Foremen Choice Digital Records Manager.
+
+The app talks to the database through DB-API style connections (cursor, execute,
+commit, rollback). This module hides WHERE that connection comes from:
+
+- MySQLBackend  : the central MySQL server (the original setup, see chitfunddatabase.sql)
+- SQLiteBackend : a local SQLite file with the same schema, used by branches in
+                  "offline" mode. Writes go to the local file and sync.py pushes/pulls
+                  the changes to/from the central server.
+
+The SQLite connection is wrapped so the existing helpers in foremenapp2.py work
+unchanged: %s placeholders, cursor(dictionary=True) and mysql.connector.Error
+(with the same errno values, e.g. 1062 for duplicates) are all supported.
+"""
+
+import datetime
+import decimal
+import pathlib
+import sqlite3
+import uuid
+
+import mysql.connector
+from mysql.connector import errors
+
+# --- Shared Table Metadata ---
+# Column lists for every synced table, in foreign key order (parents first).
+# Both backends and the sync process use these so the schema stays in one place.
+TABLE_COLUMNS = {
+    "Subscribers": ["id", "name", "phoneNumber", "address", "createdDate", "isActive"],
+    "ChitGroups": ["id", "name", "value", "numberOfSubscribers", "duration", "startDate",
+                   "foremanCommissionPercentage", "isActive"],
+    "Enrollments": ["id", "subscriberId", "groupId", "assignedChitNumber", "joinDate"],
+    "Installments": ["id", "groupId", "monthNumber", "dueDate", "isAuctionConducted",
+                     "auctionPrizeAmount", "auctionWinnerId", "isCompleted"],
+    "InstallmentPayments": ["id", "installmentId", "subscriberId", "paymentDate", "amountPaid", "notes"],
+}
+SYNC_TABLE_ORDER = list(TABLE_COLUMNS) # Parents before children (safe order for inserts)
+
+# --- SQLite Schema ---
+# Same tables, keys and constraints as chitfunddatabase.sql, translated to SQLite types.
+# BINARY(16) UUIDs are stored as BLOBs (same 16 raw bytes, so ids are identical in both databases).
+# lastModified is maintained by the database and is what the sync process uses to pull changes.
+SQLITE_NOW = "(strftime('%Y-%m-%d %H:%M:%f', 'now'))"
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS Subscribers (
+    id BLOB PRIMARY KEY, -- BINARY(16) UUID
+    name VARCHAR(255) NOT NULL,
+    phoneNumber VARCHAR(20) UNIQUE NOT NULL,
+    address TEXT,
+    createdDate DATETIME NOT NULL,
+    isActive BOOLEAN NOT NULL DEFAULT 1,
+    lastModified TEXT NOT NULL DEFAULT {SQLITE_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS ChitGroups (
+    id BLOB PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    value DECIMAL(14,2) NOT NULL,
+    numberOfSubscribers SMALLINT NOT NULL,
+    duration SMALLINT NOT NULL,
+    startDate DATE NOT NULL,
+    foremanCommissionPercentage DOUBLE,
+    isActive BOOLEAN NOT NULL DEFAULT 1,
+    lastModified TEXT NOT NULL DEFAULT {SQLITE_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS Enrollments (
+    id BLOB PRIMARY KEY,
+    subscriberId BLOB NOT NULL,
+    groupId BLOB NOT NULL,
+    assignedChitNumber SMALLINT NOT NULL,
+    joinDate DATE NOT NULL,
+    lastModified TEXT NOT NULL DEFAULT {SQLITE_NOW},
+    UNIQUE (subscriberId, groupId),
+    UNIQUE (groupId, assignedChitNumber),
+    FOREIGN KEY (subscriberId) REFERENCES Subscribers(id) ON DELETE CASCADE,
+    FOREIGN KEY (groupId) REFERENCES ChitGroups(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS Installments (
+    id BLOB PRIMARY KEY,
+    groupId BLOB NOT NULL,
+    monthNumber SMALLINT NOT NULL,
+    dueDate DATE NOT NULL,
+    isAuctionConducted BOOLEAN NOT NULL DEFAULT 0,
+    auctionPrizeAmount DECIMAL(14,2),
+    auctionWinnerId BLOB,
+    isCompleted BOOLEAN NOT NULL DEFAULT 0,
+    lastModified TEXT NOT NULL DEFAULT {SQLITE_NOW},
+    UNIQUE (groupId, monthNumber),
+    FOREIGN KEY (groupId) REFERENCES ChitGroups(id) ON DELETE CASCADE,
+    FOREIGN KEY (auctionWinnerId) REFERENCES Subscribers(id) ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS InstallmentPayments (
+    id BLOB PRIMARY KEY,
+    installmentId BLOB NOT NULL,
+    subscriberId BLOB NOT NULL,
+    paymentDate DATETIME NOT NULL,
+    amountPaid DECIMAL(14,2) NOT NULL,
+    notes TEXT,
+    lastModified TEXT NOT NULL DEFAULT {SQLITE_NOW},
+    FOREIGN KEY (installmentId) REFERENCES Installments(id) ON DELETE CASCADE,
+    FOREIGN KEY (subscriberId) REFERENCES Subscribers(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ArchivedGroups (
+    groupId BLOB PRIMARY KEY,
+    archivedDate DATETIME NOT NULL,
+    installmentCount SMALLINT NOT NULL,
+    paymentCount INT NOT NULL,
+    FOREIGN KEY (groupId) REFERENCES ChitGroups(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ArchivedInstallments (
+    id BLOB PRIMARY KEY,
+    groupId BLOB NOT NULL,
+    monthNumber SMALLINT NOT NULL,
+    dueDate DATE NOT NULL,
+    isAuctionConducted BOOLEAN NOT NULL DEFAULT 0,
+    auctionPrizeAmount DECIMAL(14,2),
+    auctionWinnerId BLOB,
+    isCompleted BOOLEAN NOT NULL DEFAULT 0,
+    UNIQUE (groupId, monthNumber),
+    FOREIGN KEY (groupId) REFERENCES ChitGroups(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ArchivedInstallmentPayments (
+    id BLOB PRIMARY KEY,
+    installmentId BLOB NOT NULL,
+    subscriberId BLOB NOT NULL,
+    paymentDate DATETIME NOT NULL,
+    amountPaid DECIMAL(14,2) NOT NULL,
+    notes TEXT,
+    FOREIGN KEY (installmentId) REFERENCES ArchivedInstallments(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS EnrollmentSummaries (
+    enrollmentId BLOB PRIMARY KEY,
+    groupId BLOB NOT NULL,
+    subscriberId BLOB NOT NULL,
+    assignedChitNumber SMALLINT NOT NULL,
+    installmentsPaid SMALLINT NOT NULL,
+    totalPaid DECIMAL(14,2) NOT NULL,
+    lastPaymentDate DATETIME,
+    auctionsWon SMALLINT NOT NULL,
+    FOREIGN KEY (enrollmentId) REFERENCES Enrollments(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ReminderOutbox (
+    id BLOB PRIMARY KEY,
+    installmentId BLOB NOT NULL,
+    enrollmentId BLOB NOT NULL,
+    subscriberId BLOB NOT NULL,
+    subscriberName VARCHAR(255) NOT NULL,
+    phoneNumber VARCHAR(20) NOT NULL,
+    groupName VARCHAR(255) NOT NULL,
+    monthNumber SMALLINT NOT NULL,
+    dueDate DATE NOT NULL,
+    amountDue DECIMAL(14,2) NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts SMALLINT NOT NULL DEFAULT 0,
+    nextAttemptAt DATETIME NOT NULL,
+    claimToken BLOB,
+    lastError TEXT,
+    createdDate DATETIME NOT NULL,
+    sentDate DATETIME,
+    UNIQUE (installmentId, enrollmentId),
+    FOREIGN KEY (installmentId) REFERENCES Installments(id) ON DELETE CASCADE,
+    FOREIGN KEY (enrollmentId) REFERENCES Enrollments(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS AuditLog (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    eventTime DATETIME NOT NULL,
+    userName VARCHAR(100) NOT NULL,
+    action VARCHAR(20) NOT NULL,
+    tableName VARCHAR(64) NOT NULL,
+    rowId BLOB,
+    beforeState TEXT,
+    afterState TEXT
+);
+
+CREATE TABLE IF NOT EXISTS DashboardCounters (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    collectedDate DATE,
+    collectedToday DECIMAL(14,2) NOT NULL DEFAULT 0,
+    paymentsToday INT NOT NULL DEFAULT 0,
+    monthStart DATE,
+    collectedMonth DECIMAL(14,2) NOT NULL DEFAULT 0,
+    hourStart DATETIME,
+    paymentsThisHour INT NOT NULL DEFAULT 0,
+    paymentsLastHour INT NOT NULL DEFAULT 0,
+    overdueAmount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    groupsNearingCompletion INT NOT NULL DEFAULT 0,
+    refreshedAt DATETIME,
+    updatedAt DATETIME
+);
+INSERT OR IGNORE INTO DashboardCounters (id) VALUES (1);
+
+CREATE TABLE IF NOT EXISTS DeletedRows (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tableName VARCHAR(64) NOT NULL,
+    rowId BLOB NOT NULL,
+    deletedAt TEXT NOT NULL DEFAULT {SQLITE_NOW}
+);
+
+CREATE INDEX IF NOT EXISTS idx_installments_group ON Installments(groupId);
+CREATE INDEX IF NOT EXISTS idx_payments_date ON InstallmentPayments(paymentDate);
+CREATE INDEX IF NOT EXISTS idx_audit_time ON AuditLog(eventTime);
+CREATE INDEX IF NOT EXISTS idx_audit_row ON AuditLog(rowId, eventTime);
+CREATE INDEX IF NOT EXISTS idx_audit_table ON AuditLog(tableName, eventTime);
+CREATE INDEX IF NOT EXISTS idx_audit_user ON AuditLog(userName, eventTime);
+CREATE INDEX IF NOT EXISTS idx_installments_due ON Installments(dueDate);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON ReminderOutbox(status, nextAttemptAt);
+CREATE INDEX IF NOT EXISTS idx_outbox_claim ON ReminderOutbox(claimToken);
+CREATE INDEX IF NOT EXISTS idx_archived_payments_installment ON ArchivedInstallmentPayments(installmentId);
+CREATE INDEX IF NOT EXISTS idx_archived_payments_subscriber_date ON ArchivedInstallmentPayments(subscriberId, paymentDate);
+CREATE INDEX IF NOT EXISTS idx_archived_installments_winner ON ArchivedInstallments(auctionWinnerId);
+CREATE INDEX IF NOT EXISTS idx_summaries_group ON EnrollmentSummaries(groupId);
+CREATE INDEX IF NOT EXISTS idx_summaries_subscriber ON EnrollmentSummaries(subscriberId);
+CREATE INDEX IF NOT EXISTS idx_payments_installment ON InstallmentPayments(installmentId);
+CREATE INDEX IF NOT EXISTS idx_payments_subscriber_date ON InstallmentPayments(subscriberId, paymentDate);
+CREATE INDEX IF NOT EXISTS idx_installments_winner ON Installments(auctionWinnerId);
+CREATE INDEX IF NOT EXISTS idx_deleted_time ON DeletedRows(deletedAt, seq);
+"""
+
+# Bookkeeping tables for a branch (local) database.
+# SyncLog     : one row per local change, in order. Emptied as changes are pushed.
+# SyncState   : pull watermark (last central lastModified seen) per table.
+# SyncControl : single row flag set while sync applies pulled rows, so they are not logged as local changes.
+SQLITE_SYNC_SCHEMA = """
+CREATE TABLE IF NOT EXISTS SyncLog (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    tableName TEXT NOT NULL,
+    rowId BLOB NOT NULL,
+    op TEXT NOT NULL -- 'upsert' or 'delete'
+);
+
+CREATE TABLE IF NOT EXISTS SyncState (
+    tableName TEXT PRIMARY KEY,
+    pulledUpTo TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS SyncControl (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    applying INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO SyncControl (id, applying) VALUES (1, 0);
+"""
+
+
+def _sqlite_table_triggers(table, track_changes):
+    """Builds the trigger DDL for one table (lastModified and DeletedRows upkeep and, for branches, change logging)."""
+    ddl = f"""
+CREATE TRIGGER IF NOT EXISTS trg_{table}_touch AFTER UPDATE ON {table}
+FOR EACH ROW WHEN NEW.lastModified = OLD.lastModified
+BEGIN
+    UPDATE {table} SET lastModified = {SQLITE_NOW} WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_{table}_deleted AFTER DELETE ON {table}
+FOR EACH ROW
+BEGIN
+    INSERT INTO DeletedRows (tableName, rowId) VALUES ('{table}', OLD.id);
+END;
+"""
+    if track_changes:
+        # Only log changes made by the app, not rows being applied by a pull.
+        not_applying = "(SELECT applying FROM SyncControl WHERE id = 1) = 0"
+        ddl += f"""
+CREATE TRIGGER IF NOT EXISTS trg_{table}_log_insert AFTER INSERT ON {table}
+FOR EACH ROW WHEN {not_applying}
+BEGIN
+    INSERT INTO SyncLog (tableName, rowId, op) VALUES ('{table}', NEW.id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_{table}_log_update AFTER UPDATE ON {table}
+FOR EACH ROW WHEN {not_applying} AND NEW.lastModified = OLD.lastModified
+BEGIN
+    INSERT INTO SyncLog (tableName, rowId, op) VALUES ('{table}', NEW.id, 'upsert');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_{table}_log_delete AFTER DELETE ON {table}
+FOR EACH ROW WHEN {not_applying}
+BEGIN
+    INSERT INTO SyncLog (tableName, rowId, op) VALUES ('{table}', OLD.id, 'delete');
+END;
+"""
+    return ddl
+
+
+# --- SQLite Type Handling ---
+# Register explicit adapters/converters so dates, datetimes and booleans round-trip
+# as the same Python types mysql.connector returns (the UI calls .strftime() on dueDate etc.).
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(" "))
+sqlite3.register_adapter(uuid.UUID, lambda u: u.bytes) # Same as BINARY(16) in MySQL
+sqlite3.register_converter("DATE", lambda b: datetime.date.fromisoformat(b.decode()))
+sqlite3.register_converter("DATETIME", lambda b: datetime.datetime.fromisoformat(b.decode()))
+sqlite3.register_converter("BOOLEAN", lambda b: bool(int(b)))
+# SQLite has no exact decimal type: DECIMAL(14,2) amounts are stored as REAL and read back
+# rounded to paise as Decimal, like MySQL returns them (sums are done exactly in money.py).
+PAISA = decimal.Decimal("0.01")
+sqlite3.register_adapter(decimal.Decimal, float)
+sqlite3.register_converter("DECIMAL", lambda b: decimal.Decimal(b.decode()).quantize(PAISA, rounding=decimal.ROUND_HALF_UP))
+
+
+def _translate_sqlite_error(e):
+    """Maps a sqlite3 error to the equivalent mysql.connector error so callers handle both the same way."""
+    message = str(e)
+    if isinstance(e, sqlite3.IntegrityError):
+        if "UNIQUE" in message or "PRIMARY KEY" in message:
+            return errors.IntegrityError(msg=message, errno=1062) # ER_DUP_ENTRY
+        if "FOREIGN KEY" in message:
+            return errors.IntegrityError(msg=message, errno=1452) # ER_NO_REFERENCED_ROW_2
+        return errors.IntegrityError(msg=message)
+    if isinstance(e, sqlite3.OperationalError) and "locked" in message:
+        return errors.DatabaseError(msg=message, errno=1205) # ER_LOCK_WAIT_TIMEOUT
+    return errors.DatabaseError(msg=message)
+
+
+class SQLiteCursor:
+    """Cursor wrapper giving a sqlite3 cursor the subset of the mysql.connector cursor API the app uses."""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @staticmethod
+    def _sql(query):
+        # mysql.connector uses %s placeholders, sqlite3 uses ?
+        return query.replace("%s", "?")
+
+    def execute(self, query, params=()):
+        try:
+            self._cursor.execute(self._sql(query), params or ())
+        except sqlite3.Error as e:
+            raise _translate_sqlite_error(e) from e
+
+    def executemany(self, query, seq_of_params):
+        try:
+            self._cursor.executemany(self._sql(query), seq_of_params)
+        except sqlite3.Error as e:
+            raise _translate_sqlite_error(e) from e
+
+    def _convert(self, row):
+        if row is None or not self._dictionary:
+            return row
+        # Plain dicts (not sqlite3.Row) because the helpers modify rows in place
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._convert(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._convert(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convert(row) for row in self._cursor.fetchall()]
+
+    @property
+    def column_names(self):
+        return tuple(col[0] for col in self._cursor.description or ())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Connection wrapper so a sqlite3 connection can stand in for a mysql.connector connection."""
+
+    def __init__(self, raw_conn):
+        self.raw = raw_conn # Direct sqlite3 access (used by the sync process)
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self.raw.cursor(), dictionary=dictionary)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.raw.close()
+
+
+# --- Backends ---
+
+class MySQLBackend:
+    """The central MySQL server."""
+
+    dialect = "mysql"
+
+    def __init__(self, **connect_args):
+        # Use the C extension (faster protocol handling and row conversion) when it is installed;
+        # mysql.connector falls back to the pure Python implementation otherwise.
+        connect_args.setdefault("use_pure", False)
+        self.connect_args = connect_args # host, database, user, password, (port, use_pure)
+
+    def connect(self):
+        return mysql.connector.connect(**self.connect_args)
+
+
+class SQLiteBackend:
+    """A local SQLite database with the same schema as the central MySQL database."""
+
+    dialect = "sqlite"
+
+    def __init__(self, path, track_changes=True, mode="rwc"):
+        self.path = path
+        # Branch databases log their own changes to SyncLog for sync.py to push.
+        # A SQLite database used as the "central" side (e.g. when testing sync locally) does not need to.
+        self.track_changes = track_changes
+        # SQLite open mode: "rwc" creates the file and the schema as needed (the app, sync.py).
+        # "rw" and "ro" open an existing file as it is, read-write or read only (maintenance tools
+        # that must not add tables, triggers or WAL files to the database they are given).
+        self.mode = mode
+
+    def connect(self):
+        if self.mode == "rwc":
+            target, uri = self.path, False
+        else:
+            target, uri = f"{pathlib.Path(self.path).resolve().as_uri()}?mode={self.mode}", True
+        try:
+            raw = sqlite3.connect(
+                target,
+                uri=uri,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                check_same_thread=False, # The connection is cached and shared across Streamlit reruns
+                timeout=10, # Seconds to wait on a locked database (same as innodb_lock_wait_timeout)
+            )
+        except sqlite3.Error as e: # E.g. a missing file in "rw" / "ro" mode
+            raise _translate_sqlite_error(e) from e
+        raw.execute("PRAGMA foreign_keys = ON")
+        if self.mode == "rwc":
+            raw.execute("PRAGMA journal_mode = WAL") # Readers don't block the writer
+            raw.execute("PRAGMA synchronous = NORMAL") # Safe with WAL, avoids an fsync per commit
+            self.ensure_schema(raw)
+        return SQLiteConnection(raw)
+
+    def ensure_schema(self, raw):
+        """Creates the tables (and sync bookkeeping for branch databases) if they don't exist yet."""
+        ddl = SQLITE_SCHEMA
+        if self.track_changes:
+            ddl += SQLITE_SYNC_SCHEMA
+        for table in SYNC_TABLE_ORDER:
+            ddl += _sqlite_table_triggers(table, self.track_changes)
+        raw.executescript(ddl)
+
+
+def mysql_backend_from_secrets(secrets, section="mysql"):
+    """Creates a MySQLBackend from a [mysql]-style section of .streamlit/secrets.toml."""
+    config = secrets[section]
+    connect_args = {
+        "host": config["host"],
+        "database": config["database"],
+        "user": config["user"],
+        "password": config["password"],
+    }
+    if "port" in config:
+        connect_args["port"] = int(config["port"])
+    if "use_pure" in config:
+        connect_args["use_pure"] = bool(config["use_pure"])
+    return MySQLBackend(**connect_args)
+
+
+def backend_from_secrets(secrets):
+    """
+    Picks the backend the app should write to, based on .streamlit/secrets.toml:
+
+        [storage]
+        backend = "sqlite"             # "mysql" (default) or "sqlite" for offline branch mode
+        sqlite_path = "branch.db"
+    """
+    storage = secrets.get("storage", {})
+    if storage.get("backend", "mysql") == "sqlite":
+        return SQLiteBackend(storage.get("sqlite_path", "foremen_branch.db"))
+    return mysql_backend_from_secrets(secrets)
+
+
+def dialect_of(conn):
+    """Returns "sqlite" or "mysql" for a connection made by one of the backends (for the few dialect-specific statements)."""
+    return "sqlite" if isinstance(conn, SQLiteConnection) else "mysql"
+
+
+def tracks_changes(conn):
+    """True for a branch SQLite database whose writes are logged for sync.py (see SQLITE_SYNC_SCHEMA)."""
+    if dialect_of(conn) != "sqlite":
+        return False
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'SyncLog'")
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+
+
+def replica_lag_seconds(conn):
+    """
+    Returns how many seconds a MySQL read replica is behind its primary,
+    or None if replication is not running (IO/SQL thread stopped or not a replica).
+    """
+    cursor = conn.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS") # MySQL 8.0.22+
+            lag_column = "Seconds_Behind_Source"
+        except errors.Error:
+            cursor.execute("SHOW SLAVE STATUS") # Older servers
+            lag_column = "Seconds_Behind_Master"
+        status = cursor.fetchone()
+        cursor.fetchall() # Clear any remaining rows (multi-source replication)
+        if not status:
+            return None
+        return status.get(lag_column)
+    finally:
+        cursor.close()
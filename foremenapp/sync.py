@@ -0,0 +1,412 @@
+"""
+Delta sync between a branch's local SQLite database and the central MySQL database.
+
+Branches in offline mode (see storage.py) write every change to their local file.
+This process:
+1. PUSHES local changes (recorded in SyncLog by triggers) to the central database in batches.
+2. PULLS rows changed on the central database since the last pull (by lastModified),
+   then rows deleted there since the last pull (from its DeletedRows log), then the
+   list of archived groups (ArchivedGroups, see archive.py).
+
+All rows are keyed by BINARY(16) UUIDs generated where the row was created, so the
+same row has the same id everywhere and merges update or insert by id (no id remapping,
+no collisions between branches). A row that clashes with a different row on another
+unique key (e.g. the same phone number registered at two branches) is reported as a
+conflict and left pending. For rows edited in two places the last sync wins, not the
+last edit: lastModified is stamped by each machine's clock, so it is not compared, and
+whichever side pushes or pulls last overwrites the other. A row deleted centrally is
+deleted at the branch even if it has unpushed local edits.
+
+Pulls are watermark based: a central transaction that commits more than
+PULL_OVERLAP_SECONDS after its rows were stamped (a transaction running longer than that)
+can commit behind a watermark a branch has already passed, and those rows are then only
+pulled when they change again. Keep central write transactions shorter than the overlap
+(the app's are milliseconds; archive.py and tenants.py moves commit per group / batch),
+or raise PULL_OVERLAP_SECONDS.
+
+Run it periodically from each branch:
+    python sync.py                 # one push + pull using .streamlit/secrets.toml
+    python sync.py --interval 60   # keep syncing every 60 seconds
+
+Both sides are just backends, so two local SQLite files can be synced for testing:
+    python sync.py --local branch.db --central-sqlite central.db
+"""
+
+import argparse
+import datetime
+import time
+
+from mysql.connector import Error
+
+from storage import TABLE_COLUMNS, SYNC_TABLE_ORDER, SQLiteBackend, mysql_backend_from_secrets
+
+DEFAULT_BATCH_SIZE = 500
+# Re-read this many seconds before the pull watermark, so rows committed slightly
+# out of lastModified order are not missed. Re-applying is harmless. Transactions
+# running longer than this can still be missed (see the module docstring).
+PULL_OVERLAP_SECONDS = 5
+EPOCH = "1970-01-01 00:00:00.000000"
+
+
+def _watermark_str(value):
+    """Normalizes a lastModified value (datetime from MySQL, text from SQLite) to sortable text."""
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return str(value)
+
+
+def _set_applying(local_conn, applying):
+    """Turns change logging off (while applying pulled rows) or back on."""
+    cursor = local_conn.cursor()
+    try:
+        cursor.execute("UPDATE SyncControl SET applying = %s WHERE id = 1", (1 if applying else 0,))
+    finally:
+        cursor.close()
+
+
+def _write_sql(table):
+    """
+    UPDATE by id and INSERT for one table. Rows are matched on the UUID primary key only:
+    a clash on any other unique key (a phone number, an enrollment) raises 1062 and is
+    reported as a conflict instead of overwriting a different row. The same SQL runs on
+    MySQL and SQLite, so there is no dialect-specific upsert.
+    """
+    columns = TABLE_COLUMNS[table]
+    update = f"UPDATE {table} SET {', '.join(f'{col} = %s' for col in columns[1:])} WHERE id = %s"
+    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    return update, insert
+
+
+def _apply_rows(conn, table, rows, result):
+    """
+    Writes rows into one table, updating the ones whose id exists and inserting the rest.
+    Uses executemany for the whole batch and only falls back to row-by-row when the batch
+    hits a constraint, so a single conflicting row (e.g. the same phone number registered
+    at two branches) is reported instead of blocking everything else.
+    Returns the ids that were applied.
+    """
+    update, insert = _write_sql(table)
+    cursor = conn.cursor()
+    try:
+        try:
+            existing = _existing_ids(conn, table, [row[0] for row in rows])
+            updates = [tuple(row[1:]) + (row[0],) for row in rows if bytes(row[0]) in existing]
+            inserts = [tuple(row) for row in rows if bytes(row[0]) not in existing]
+            if updates:
+                cursor.executemany(update, updates)
+            if inserts:
+                cursor.executemany(insert, inserts)
+            return [row[0] for row in rows]
+        except Error as e:
+            if e.errno not in (1062, 1452): # Only constraint problems are handled row by row
+                raise
+        applied = []
+        for row in rows:
+            try:
+                # Checked again: part of the failed batch may already have been written
+                if _existing_ids(conn, table, [row[0]]):
+                    cursor.execute(update, tuple(row[1:]) + (row[0],))
+                else:
+                    cursor.execute(insert, tuple(row))
+                applied.append(row[0])
+            except Error as e:
+                if e.errno not in (1062, 1452):
+                    raise
+                result["conflicts"].append({"table": table, "id": row[0], "error": str(e)})
+        return applied
+    finally:
+        cursor.close()
+
+
+def push_changes(local_conn, central_conn, batch_size=DEFAULT_BATCH_SIZE):
+    """Pushes pending local changes to the central database, oldest first. Returns a result dict."""
+    result = {"pushed": 0, "deleted": 0, "conflicts": []}
+    last_seq = 0
+    while True:
+        cursor = local_conn.cursor()
+        try:
+            cursor.execute("SELECT seq, tableName, rowId, op FROM SyncLog WHERE seq > %s ORDER BY seq LIMIT %s",
+                           (last_seq, batch_size))
+            log_rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        if not log_rows:
+            break
+        last_seq = log_rows[-1][0]
+
+        # Collapse the batch: only the latest operation per row matters
+        latest_op = {}
+        seqs_by_row = {}
+        for seq, table, row_id, op in log_rows:
+            key = (table, bytes(row_id))
+            latest_op[key] = op
+            seqs_by_row.setdefault(key, []).append(seq)
+
+        conflicted_keys = set()
+        try:
+            # Upserts parents first, deletes children first, so foreign keys are always satisfied
+            for table in SYNC_TABLE_ORDER:
+                ids = [row_id for (t, row_id), op in latest_op.items() if t == table and op == "upsert"]
+                if not ids:
+                    continue
+                columns = TABLE_COLUMNS[table]
+                cursor = local_conn.cursor()
+                try:
+                    placeholders = ", ".join(["%s"] * len(ids))
+                    cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE id IN ({placeholders})", ids)
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+                applied = set(_apply_rows(central_conn, table, rows, result))
+                result["pushed"] += len(applied)
+                conflicted_keys.update((table, bytes(row[0])) for row in rows if row[0] not in applied)
+
+            for table in reversed(SYNC_TABLE_ORDER):
+                ids = [row_id for (t, row_id), op in latest_op.items() if t == table and op == "delete"]
+                if not ids:
+                    continue
+                cursor = central_conn.cursor()
+                try:
+                    cursor.executemany(f"DELETE FROM {table} WHERE id = %s", [(row_id,) for row_id in ids])
+                    result["deleted"] += len(ids)
+                finally:
+                    cursor.close()
+            central_conn.commit()
+        except Error:
+            central_conn.rollback()
+            raise # SyncLog is untouched, so the same batch is retried next run
+
+        # Only forget changes that reached the central database; conflicts stay pending
+        done_seqs = [(seq,) for key, seqs in seqs_by_row.items() if key not in conflicted_keys for seq in seqs]
+        cursor = local_conn.cursor()
+        try:
+            cursor.executemany("DELETE FROM SyncLog WHERE seq = %s", done_seqs)
+            local_conn.commit()
+        finally:
+            cursor.close()
+    return result
+
+
+def pull_changes(local_conn, central_conn, batch_size=DEFAULT_BATCH_SIZE):
+    """Pulls rows changed on the central database since the last pull. Returns a result dict."""
+    result = {"pulled": 0, "skipped": 0, "conflicts": []}
+    for table in SYNC_TABLE_ORDER:
+        columns = TABLE_COLUMNS[table]
+        cursor = local_conn.cursor()
+        try:
+            cursor.execute("SELECT pulledUpTo FROM SyncState WHERE tableName = %s", (table,))
+            row = cursor.fetchone()
+            # Rows still waiting to be pushed win over central copies until they are pushed
+            cursor.execute("SELECT DISTINCT rowId FROM SyncLog WHERE tableName = %s", (table,))
+            pending_ids = {bytes(r[0]) for r in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+        watermark = row[0] if row else EPOCH
+        since = datetime.datetime.fromisoformat(watermark) - datetime.timedelta(seconds=PULL_OVERLAP_SECONDS)
+        # Keyset pagination on (lastModified, id) so batches never skip rows with equal timestamps
+        position = (_watermark_str(since), b"")
+        newest = watermark
+        while True:
+            cursor = central_conn.cursor()
+            try:
+                cursor.execute(
+                    f"""SELECT {', '.join(columns)}, lastModified FROM {table}
+                        WHERE lastModified > %s OR (lastModified = %s AND id > %s)
+                        ORDER BY lastModified, id LIMIT %s""",
+                    (position[0], position[0], position[1], batch_size))
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+            if not rows:
+                break
+            position = (_watermark_str(rows[-1][-1]), rows[-1][0])
+            newest = max(newest, position[0])
+
+            to_apply = [tuple(r[:-1]) for r in rows if bytes(r[0]) not in pending_ids]
+            result["skipped"] += len(rows) - len(to_apply)
+            if to_apply:
+                _set_applying(local_conn, True)
+                try:
+                    applied = _apply_rows(local_conn, table, to_apply, result)
+                    result["pulled"] += len(applied)
+                finally:
+                    _set_applying(local_conn, False)
+
+        _save_watermark(local_conn, table, newest)
+        local_conn.commit()
+    return result
+
+
+def _save_watermark(local_conn, table, pulled_up_to):
+    cursor = local_conn.cursor()
+    try:
+        cursor.execute("""INSERT INTO SyncState (tableName, pulledUpTo) VALUES (%s, %s)
+                          ON CONFLICT(tableName) DO UPDATE SET pulledUpTo = excluded.pulledUpTo""",
+                       (table, pulled_up_to))
+    finally:
+        cursor.close()
+
+
+def _existing_ids(conn, table, ids):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT id FROM {table} WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+        return {bytes(r[0]) for r in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def pull_deletes(local_conn, central_conn, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Deletes the rows logged in the central DeletedRows table since the last pull.
+    Children are deleted before parents; cascades remove the rest, as they did centrally.
+    Pending local changes to a deleted row are dropped (the delete wins). Returns a result dict.
+    """
+    result = {"deleted": 0}
+    cursor = local_conn.cursor()
+    try:
+        cursor.execute("SELECT pulledUpTo FROM SyncState WHERE tableName = 'DeletedRows'")
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+
+    watermark = row[0] if row else EPOCH
+    since = datetime.datetime.fromisoformat(watermark) - datetime.timedelta(seconds=PULL_OVERLAP_SECONDS)
+    position = (_watermark_str(since), 0)
+    newest = watermark
+    while True:
+        cursor = central_conn.cursor()
+        try:
+            cursor.execute(
+                """SELECT tableName, rowId, deletedAt, seq FROM DeletedRows
+                   WHERE deletedAt > %s OR (deletedAt = %s AND seq > %s)
+                   ORDER BY deletedAt, seq LIMIT %s""",
+                (position[0], position[0], position[1], batch_size))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        if not rows:
+            break
+        position = (_watermark_str(rows[-1][2]), rows[-1][3])
+        newest = max(newest, position[0])
+
+        ids_by_table = {}
+        for table, row_id, _, _ in rows:
+            if table in TABLE_COLUMNS:
+                ids_by_table.setdefault(table, set()).add(bytes(row_id))
+        _set_applying(local_conn, True)
+        try:
+            cursor = local_conn.cursor()
+            try:
+                for table in reversed(SYNC_TABLE_ORDER):
+                    ids = list(ids_by_table.get(table, ()))
+                    if not ids:
+                        continue
+                    # A logged row that exists again centrally (e.g. rewritten by REPLACE) is kept
+                    restored = _existing_ids(central_conn, table, ids)
+                    ids = [row_id for row_id in ids if row_id not in restored]
+                    if not ids:
+                        continue
+                    cursor.executemany(f"DELETE FROM {table} WHERE id = %s", [(row_id,) for row_id in ids])
+                    result["deleted"] += cursor.rowcount if cursor.rowcount > 0 else 0
+                    cursor.executemany("DELETE FROM SyncLog WHERE tableName = %s AND rowId = %s",
+                                       [(table, row_id) for row_id in ids])
+            finally:
+                cursor.close()
+        finally:
+            _set_applying(local_conn, False)
+        local_conn.commit()
+
+    _save_watermark(local_conn, "DeletedRows", newest)
+    local_conn.commit()
+    return result
+
+
+def pull_archived_groups(local_conn, central_conn):
+    """
+    Replaces the branch's ArchivedGroups with the central list. Archiving moves a group's
+    installments away centrally, which reaches the branch as plain deletes; without this
+    list the branch would see a group with no installments and let a clerk generate them
+    again. The table has one small row per archived group, so it is copied whole.
+    Returns the number of archived groups known to the branch.
+    """
+    cursor = central_conn.cursor()
+    try:
+        cursor.execute("SELECT groupId, archivedDate, installmentCount, paymentCount FROM ArchivedGroups")
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if rows:
+        # Groups the branch doesn't have (yet) are skipped; the next sync adds them
+        known = _existing_ids(local_conn, "ChitGroups", [row[0] for row in rows])
+        rows = [tuple(row) for row in rows if bytes(row[0]) in known]
+    cursor = local_conn.cursor()
+    try:
+        cursor.execute("DELETE FROM ArchivedGroups")
+        cursor.executemany("""INSERT INTO ArchivedGroups (groupId, archivedDate, installmentCount, paymentCount)
+                              VALUES (%s, %s, %s, %s)""", rows)
+        local_conn.commit()
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def run_sync(local_backend, central_backend, batch_size=DEFAULT_BATCH_SIZE):
+    """One full sync cycle: push local changes first, then pull central changes."""
+    local_conn = local_backend.connect()
+    central_conn = central_backend.connect()
+    try:
+        pushed = push_changes(local_conn, central_conn, batch_size)
+        pulled = pull_changes(local_conn, central_conn, batch_size)
+        removed = pull_deletes(local_conn, central_conn, batch_size)
+        pull_archived_groups(local_conn, central_conn)
+        return {
+            "pushed": pushed["pushed"],
+            "deleted": pushed["deleted"],
+            "pulled": pulled["pulled"],
+            "skipped": pulled["skipped"],
+            "removed": removed["deleted"],
+            "conflicts": pushed["conflicts"] + pulled["conflicts"],
+        }
+    finally:
+        local_conn.close()
+        central_conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync a branch's local SQLite database with the central database.")
+    parser.add_argument("--local", help="Path of the branch SQLite file (default: [storage] sqlite_path in secrets.toml)")
+    parser.add_argument("--central-sqlite", help="Sync with this SQLite file instead of the [mysql] server (for testing)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--interval", type=int, default=0, help="Seconds between syncs (0 = sync once and exit)")
+    args = parser.parse_args()
+
+    secrets = None
+    if not args.local or not args.central_sqlite:
+        import streamlit as st # Only needed to read .streamlit/secrets.toml
+        secrets = st.secrets
+    local_path = args.local or secrets.get("storage", {}).get("sqlite_path", "foremen_branch.db")
+    local_backend = SQLiteBackend(local_path)
+    if args.central_sqlite:
+        central_backend = SQLiteBackend(args.central_sqlite, track_changes=False)
+    else:
+        central_backend = mysql_backend_from_secrets(secrets)
+
+    while True:
+        try:
+            result = run_sync(local_backend, central_backend, args.batch_size)
+            print(f"Sync complete: pushed {result['pushed']}, deleted {result['deleted']}, "
+                  f"pulled {result['pulled']}, removed {result['removed']}, "
+                  f"skipped {result['skipped']} pending local rows")
+            for conflict in result["conflicts"]:
+                print(f"  Conflict in {conflict['table']} row {conflict['id'].hex()}: {conflict['error']}")
+        except Error as e:
+            print(f"Sync failed (will retry): {e}")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
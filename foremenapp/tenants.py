@@ -0,0 +1,583 @@
+"""
+Tenant routing for Foremen Choice Digital Records Manager.
+
+One app deployment can serve several independent foremen (tenants). Every tenant keeps
+its own database, created from chitfunddatabase.sql, on one of several MySQL servers
+(shards). A small directory database maps:
+
+- Tenants     : tenant id -> shard and database name (and whether it is being moved)
+- TenantUsers : logged-in user (email) -> tenant id
+
+The app looks up the logged-in user's tenant in the directory (cached for
+DIRECTORY_CACHE_SECONDS) and connects to that tenant's database through a connection
+pool per shard, so the number of connections per MySQL server stays bounded however
+many tenants live on it.
+
+Configure in .streamlit/secrets.toml (without a [tenants] section the app uses the single
+[mysql] database as before):
+
+    [tenants]
+    pool_size = 32                # Connections per shard per app process (at most 32, see DEFAULT_POOL_SIZE)
+    default_tenant = "acme"       # Optional: tenant for users who are not logged in (testing)
+
+    [tenant_directory]            # The directory database
+    host = "directory-host"
+    database = "foremen_directory"
+    user = "foremen"
+    password = "..."
+
+    [shards.node1]                # One section per MySQL server holding tenant databases
+    host = "mysql-node1"
+    user = "foremen"
+    password = "..."
+
+Tooling, from the foremenapp folder:
+    python tenants.py --init-directory                              # create the directory tables
+    python tenants.py --provision acme --name "Acme Chits" --shard node1
+    python tenants.py --add-user owner@acme.example --tenant acme
+    python tenants.py --move acme --to node2                        # copy to another server and switch
+    python tenants.py --list
+
+The maintenance tools (reminders.py, counters.py, archive.py, integrity.py, documents.py)
+work on one tenant's database with --tenant acme, otherwise on the [mysql] database.
+
+Moving a tenant marks it "moving" in the directory first. App processes pick that up
+within DIRECTORY_CACHE_SECONDS and open the tenant's database read-only, so the copy is
+consistent; the tenant can read but not write for the duration of the copy. Audit events
+recorded meanwhile stay in each process's audit buffer and are written to the tenant's new
+database after the switch. The source
+database is kept (drop it with --drop-source once the move is verified).
+"""
+
+import argparse
+import collections
+import datetime
+import os
+import re
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import Error, errors, pooling
+
+DATABASE_PREFIX = "foremen_" # Tenant databases are named foremen_<tenant id>
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9_]{1,48}$") # Safe to use in database names
+DIRECTORY_CACHE_SECONDS = 30 # How long a directory lookup is reused (and how long a move waits for it to expire)
+RETIRE_GRACE_SECONDS = 60 # Released connections go back to the pool after this (a session may still be using them)
+MAX_POOL_SIZE = pooling.CNX_POOL_MAXSIZE # mysql.connector allows at most 32 connections per pool
+# An app process holds up to MAX_CACHED_TENANT_CONNECTIONS (20, foremenapp2.py) tenant connections,
+# possibly all on one shard, plus released ones still in their grace period: the pool needs room
+# for both. The rest of the pool absorbs that backlog; when it is used up, connect() waits.
+DEFAULT_POOL_SIZE = MAX_POOL_SIZE
+POOL_WAIT_SECONDS = 10 # How long connect() waits for a free pooled connection before giving up
+DEFAULT_BATCH_SIZE = 1000 # Rows per INSERT batch when moving a tenant
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chitfunddatabase.sql")
+
+STATUS_ACTIVE = "active"
+STATUS_MOVING = "moving" # Read-only while being copied to another shard
+
+DIRECTORY_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS Tenants (
+        tenantId VARCHAR(48) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        shardName VARCHAR(64) NOT NULL,
+        databaseName VARCHAR(64) NOT NULL,
+        status VARCHAR(16) NOT NULL DEFAULT 'active', -- 'active' or 'moving'
+        createdDate DATETIME NOT NULL,
+        movedDate DATETIME,
+        INDEX idx_tenants_shard (shardName)
+    )""",
+    """CREATE TABLE IF NOT EXISTS TenantUsers (
+        userEmail VARCHAR(255) PRIMARY KEY,
+        tenantId VARCHAR(48) NOT NULL,
+        FOREIGN KEY (tenantId) REFERENCES Tenants(tenantId) ON DELETE CASCADE
+    )""",
+]
+
+# Where a tenant's data lives. read_only is set while the tenant is being moved.
+Route = collections.namedtuple("Route", "tenant_id name shard database read_only")
+
+
+# --- Schema ---
+
+def schema_statements(path=SCHEMA_PATH):
+    """
+    The statements of chitfunddatabase.sql that create a tenant database: CREATE TABLE,
+    CREATE INDEX, CREATE TRIGGER and the seed INSERTs. The CREATE DATABASE / USE lines and the admin
+    statements at the end of the file are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        text = "\n".join(line.split("--", 1)[0] for line in f)
+    statements = []
+    for statement in text.split(";"):
+        statement = statement.strip()
+        if re.match(r"(CREATE\s+TABLE|CREATE\s+INDEX|CREATE\s+TRIGGER|INSERT\s+INTO)\s", statement, re.IGNORECASE):
+            statements.append(statement)
+    return statements
+
+
+def schema_tables(statements):
+    """Table names in creation order (parents before children)."""
+    return [re.match(r"CREATE\s+TABLE\s+`?(\w+)", statement, re.IGNORECASE).group(1)
+            for statement in statements if re.match(r"CREATE\s+TABLE\s", statement, re.IGNORECASE)]
+
+
+def validate_tenant_id(tenant_id):
+    if not TENANT_ID_PATTERN.match(tenant_id):
+        raise ValueError(f"Invalid tenant id {tenant_id!r}: use 1-48 lowercase letters, digits or _")
+
+
+def _use_database(conn, database):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"USE `{database}`")
+    finally:
+        cursor.close()
+
+
+# --- Routing ---
+
+def shard_connect_args(config):
+    """Connection arguments of a [shards.<name>] section (no database: a shard holds many)."""
+    connect_args = {"host": config["host"], "user": config["user"], "password": config["password"]}
+    if "port" in config:
+        connect_args["port"] = int(config["port"])
+    if "use_pure" in config:
+        connect_args["use_pure"] = bool(config["use_pure"])
+    return connect_args
+
+
+class TenantRouter:
+    """Maps tenants to their shard and database, and hands out pooled connections per shard."""
+
+    def __init__(self, directory_backend, shards, pool_size=DEFAULT_POOL_SIZE):
+        self.directory_backend = directory_backend # storage.MySQLBackend of the directory database
+        self.shards = shards # shard name -> connection arguments
+        self.pool_size = pool_size
+        self._pools = {}
+        self._routes = {} # tenant id -> (looked up at, Route or None)
+        self._users = {} # email -> (looked up at, tenant id or None)
+        self._retired = [] # (released at, pooled connection)
+        self._lock = threading.Lock()
+
+    # Directory lookups (cached)
+
+    def _directory_fetchone(self, query, params):
+        conn = self.directory_backend.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            cursor.close()
+            return row
+        finally:
+            conn.close()
+
+    def route(self, tenant_id):
+        """The tenant's Route, or None if the tenant doesn't exist."""
+        with self._lock:
+            cached = self._routes.get(tenant_id)
+        if cached and time.monotonic() - cached[0] < DIRECTORY_CACHE_SECONDS:
+            return cached[1]
+        row = self._directory_fetchone("SELECT tenantId, name, shardName, databaseName, status FROM Tenants WHERE tenantId = %s",
+                                       (tenant_id,))
+        route = Route(*row[:4], row[4] != STATUS_ACTIVE) if row else None
+        with self._lock:
+            self._routes[tenant_id] = (time.monotonic(), route)
+        return route
+
+    def tenant_for_user(self, email):
+        """The tenant id a user belongs to, or None."""
+        email = email.strip().lower() # Stored lower case by add_tenant_user
+        with self._lock:
+            cached = self._users.get(email)
+        if cached and time.monotonic() - cached[0] < DIRECTORY_CACHE_SECONDS:
+            return cached[1]
+        row = self._directory_fetchone("SELECT tenantId FROM TenantUsers WHERE userEmail = %s", (email,))
+        tenant_id = row[0] if row else None
+        with self._lock:
+            self._users[email] = (time.monotonic(), tenant_id)
+        return tenant_id
+
+    # Connections
+
+    def _pool(self, shard):
+        with self._lock:
+            pool = self._pools.get(shard)
+            if pool is None:
+                if shard not in self.shards:
+                    raise Error(msg=f"Shard '{shard}' is not configured in [shards]")
+                # Created on first use: the pool opens all its connections up front
+                pool = pooling.MySQLConnectionPool(pool_name=f"shard_{shard}", pool_size=self.pool_size,
+                                                   **self.shards[shard])
+                self._pools[shard] = pool
+            return pool
+
+    def _return_retired(self):
+        """Gives connections released more than RETIRE_GRACE_SECONDS ago back to their pool."""
+        now = time.monotonic()
+        with self._lock:
+            due = [conn for released_at, conn in self._retired if now - released_at >= RETIRE_GRACE_SECONDS]
+            self._retired = [(released_at, conn) for released_at, conn in self._retired
+                             if now - released_at < RETIRE_GRACE_SECONDS]
+        for conn in due:
+            try:
+                conn.close() # Back to the pool (the session is reset)
+            except Error:
+                pass
+
+    def _get_connection(self, shard):
+        """A connection from the shard's pool, waiting up to POOL_WAIT_SECONDS for one to be returned."""
+        pool = self._pool(shard)
+        deadline = time.monotonic() + POOL_WAIT_SECONDS
+        while True:
+            self._return_retired()
+            try:
+                return pool.get_connection()
+            except errors.PoolError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.1)
+
+    def connect(self, route):
+        """A pooled connection to the tenant's database (read-only while the tenant is moving). close() returns it to the pool."""
+        conn = self._get_connection(route.shard)
+        try:
+            _use_database(conn, route.database)
+            if route.read_only:
+                cursor = conn.cursor()
+                cursor.execute("SET SESSION TRANSACTION READ ONLY")
+                cursor.close()
+        except Error:
+            conn.close()
+            raise
+        return conn
+
+    def retire(self, conn):
+        """Returns a connection to its pool after RETIRE_GRACE_SECONDS (for cached connections other sessions may still hold)."""
+        with self._lock:
+            self._retired.append((time.monotonic(), conn))
+
+    def backend(self, tenant_id):
+        """A TenantBackend for the tenant's database (dedicated, unpooled connections, e.g. for the audit writer)."""
+        return TenantBackend(self, tenant_id)
+
+
+class TenantBackend:
+    """
+    Opens dedicated connections to wherever a tenant's database is right now. Unlike a
+    backend for a fixed server it follows the tenant through a move, and its connections
+    are read-only while the tenant is moving, like the app's pooled ones.
+    """
+
+    dialect = "mysql"
+
+    def __init__(self, router, tenant_id):
+        self.router = router
+        self.tenant_id = tenant_id
+
+    def writable_route(self):
+        """The tenant's Route, or None while it is being moved (for audit.DatabaseSink's target)."""
+        route = self.router.route(self.tenant_id)
+        return route if route is not None and not route.read_only else None
+
+    def connect(self):
+        route = self.router.route(self.tenant_id)
+        if route is None:
+            raise Error(msg=f"Tenant '{self.tenant_id}' is not in the directory")
+        conn = mysql.connector.connect(**dict(self.router.shards[route.shard], database=route.database))
+        if route.read_only:
+            cursor = conn.cursor()
+            cursor.execute("SET SESSION TRANSACTION READ ONLY")
+            cursor.close()
+        return conn
+
+
+def router_from_secrets(secrets):
+    """Creates the TenantRouter from [tenants], [tenant_directory] and [shards.*] in secrets.toml."""
+    import storage
+    pool_size = min(int(secrets["tenants"].get("pool_size", DEFAULT_POOL_SIZE)), MAX_POOL_SIZE)
+    shards = {name: shard_connect_args(config) for name, config in secrets["shards"].items()}
+    return TenantRouter(storage.mysql_backend_from_secrets(secrets, section="tenant_directory"), shards, pool_size)
+
+
+def tenant_backend_from_secrets(secrets, tenant_id):
+    """
+    A storage.MySQLBackend for one tenant's database, for the --tenant option of the maintenance
+    tools (reminders.py, counters.py, archive.py, integrity.py, documents.py). Raises Error for an
+    unknown tenant or one that is being moved (its database is read-only and about to change).
+    """
+    import storage
+    router = router_from_secrets(secrets)
+    route = router.route(tenant_id)
+    if route is None:
+        raise Error(msg=f"Tenant '{tenant_id}' is not in the directory")
+    if route.read_only:
+        raise Error(msg=f"Tenant '{tenant_id}' is being moved, run again once the move is done")
+    return storage.MySQLBackend(**dict(router.shards[route.shard], database=route.database))
+
+
+# --- Tooling ---
+
+def init_directory(directory_conn):
+    """Creates the directory tables if they don't exist."""
+    cursor = directory_conn.cursor()
+    try:
+        for statement in DIRECTORY_SCHEMA:
+            cursor.execute(statement)
+        directory_conn.commit()
+    finally:
+        cursor.close()
+
+
+def create_tenant_database(shard_args, database, statements):
+    """Creates a new database on a shard from the schema statements. Fails if it already exists."""
+    conn = mysql.connector.connect(**shard_args)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE `{database}`")
+        try:
+            cursor.execute(f"USE `{database}`")
+            for statement in statements:
+                cursor.execute(statement)
+            conn.commit()
+        except Error:
+            cursor.execute(f"DROP DATABASE `{database}`") # Don't leave a half-created schema behind
+            raise
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
+def drop_tenant_database(shard_args, database):
+    conn = mysql.connector.connect(**shard_args)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def provision_tenant(directory_conn, shards, tenant_id, name, shard, schema_path=SCHEMA_PATH):
+    """Creates the tenant's database on a shard from chitfunddatabase.sql and registers it in the directory."""
+    validate_tenant_id(tenant_id)
+    if shard not in shards:
+        raise ValueError(f"Shard '{shard}' is not configured in [shards]")
+    database = DATABASE_PREFIX + tenant_id
+    cursor = directory_conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM Tenants WHERE tenantId = %s", (tenant_id,))
+        if cursor.fetchone():
+            raise ValueError(f"Tenant '{tenant_id}' already exists")
+        create_tenant_database(shards[shard], database, schema_statements(schema_path))
+        try:
+            cursor.execute("""INSERT INTO Tenants (tenantId, name, shardName, databaseName, status, createdDate)
+                              VALUES (%s, %s, %s, %s, %s, %s)""",
+                           (tenant_id, name, shard, database, STATUS_ACTIVE, datetime.datetime.now()))
+            directory_conn.commit()
+        except Error:
+            directory_conn.rollback()
+            drop_tenant_database(shards[shard], database)
+            raise
+    finally:
+        cursor.close()
+    return database
+
+
+def add_tenant_user(directory_conn, email, tenant_id):
+    """Lets a user (login email) open a tenant's records. A user belongs to one tenant."""
+    cursor = directory_conn.cursor()
+    try:
+        cursor.execute("""INSERT INTO TenantUsers (userEmail, tenantId) VALUES (%s, %s) AS new
+                          ON DUPLICATE KEY UPDATE tenantId = new.tenantId""", (email.strip().lower(), tenant_id))
+        directory_conn.commit()
+    finally:
+        cursor.close()
+
+
+def _set_status(directory_conn, tenant_id, status, shard=None):
+    cursor = directory_conn.cursor()
+    try:
+        if shard is None:
+            cursor.execute("UPDATE Tenants SET status = %s WHERE tenantId = %s", (status, tenant_id))
+        else:
+            cursor.execute("UPDATE Tenants SET status = %s, shardName = %s, movedDate = %s WHERE tenantId = %s",
+                           (status, shard, datetime.datetime.now(), tenant_id))
+        directory_conn.commit()
+    finally:
+        cursor.close()
+
+
+def copy_table(source_conn, target_conn, table, batch_size=DEFAULT_BATCH_SIZE):
+    """Streams one table from the source to the target database in batches. Returns the rows copied."""
+    source = source_conn.cursor() # Unbuffered: rows are streamed, not loaded at once
+    target = target_conn.cursor()
+    copied = 0
+    try:
+        source.execute(f"SELECT * FROM {table}")
+        columns = source.column_names
+        # REPLACE: rows seeded by the schema (DashboardCounters) are overwritten with the tenant's
+        query = f"REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        while True:
+            rows = source.fetchmany(batch_size)
+            if not rows:
+                break
+            target.executemany(query, rows)
+            copied += len(rows)
+        target_conn.commit()
+        return copied
+    finally:
+        source.close()
+        target.close()
+
+
+def count_rows(conn, tables):
+    cursor = conn.cursor()
+    try:
+        counts = {}
+        for table in tables:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+        return counts
+    finally:
+        cursor.close()
+
+
+def move_tenant(directory_conn, shards, tenant_id, target_shard, wait_seconds=DIRECTORY_CACHE_SECONDS + 5,
+                batch_size=DEFAULT_BATCH_SIZE, drop_source=False, schema_path=SCHEMA_PATH, log=print):
+    """
+    Moves a tenant's database to another shard:
+    1. marks the tenant "moving" and waits until every app process opens it read-only,
+    2. creates the database on the target shard and copies every table from a consistent snapshot,
+    3. checks the row counts match and points the directory at the target shard.
+    On failure the tenant stays on the source shard (and becomes writable again).
+    Returns {table: rows copied}.
+    """
+    cursor = directory_conn.cursor()
+    cursor.execute("SELECT shardName, databaseName, status FROM Tenants WHERE tenantId = %s", (tenant_id,))
+    row = cursor.fetchone()
+    cursor.close()
+    if row is None:
+        raise ValueError(f"Tenant '{tenant_id}' does not exist")
+    source_shard, database, status = row
+    if target_shard not in shards:
+        raise ValueError(f"Shard '{target_shard}' is not configured in [shards]")
+    if target_shard == source_shard:
+        raise ValueError(f"Tenant '{tenant_id}' is already on shard '{target_shard}'")
+    if status != STATUS_ACTIVE:
+        raise ValueError(f"Tenant '{tenant_id}' is {status}: another move may be running")
+
+    statements = schema_statements(schema_path)
+    tables = schema_tables(statements)
+    _set_status(directory_conn, tenant_id, STATUS_MOVING)
+    log(f"Tenant '{tenant_id}' is read-only; waiting {wait_seconds}s for app processes to notice")
+    time.sleep(wait_seconds)
+
+    copied = {}
+    target_created = False
+    try:
+        create_tenant_database(shards[target_shard], database, statements)
+        target_created = True
+        source_conn = mysql.connector.connect(**dict(shards[source_shard], database=database))
+        target_conn = None
+        try:
+            target_conn = mysql.connector.connect(**dict(shards[target_shard], database=database))
+            source_conn.start_transaction(consistent_snapshot=True, readonly=True)
+            cursor = target_conn.cursor()
+            cursor.execute("SET SESSION FOREIGN_KEY_CHECKS = 0") # Tables are copied whole; the source is already consistent
+            cursor.close()
+            for table in tables:
+                copied[table] = copy_table(source_conn, target_conn, table, batch_size)
+                log(f"  {table}: {copied[table]} rows")
+            source_counts = count_rows(source_conn, tables)
+            target_counts = count_rows(target_conn, tables)
+            source_conn.rollback()
+        finally:
+            source_conn.close()
+            if target_conn is not None:
+                target_conn.close()
+        mismatched = [table for table in tables if source_counts[table] != target_counts[table]]
+        if mismatched:
+            raise Error(msg=f"Row counts differ after the copy: {', '.join(mismatched)}")
+    except Exception:
+        _set_status(directory_conn, tenant_id, STATUS_ACTIVE) # Writable again on the source shard
+        if target_created:
+            drop_tenant_database(shards[target_shard], database)
+        raise
+
+    _set_status(directory_conn, tenant_id, STATUS_ACTIVE, shard=target_shard)
+    log(f"Tenant '{tenant_id}' now lives on shard '{target_shard}'")
+    if drop_source:
+        drop_tenant_database(shards[source_shard], database)
+        log(f"Dropped {database} on shard '{source_shard}'")
+    return copied
+
+
+def list_tenants(directory_conn):
+    cursor = directory_conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""SELECT t.tenantId, t.name, t.shardName, t.databaseName, t.status, t.movedDate,
+                                 (SELECT COUNT(*) FROM TenantUsers u WHERE u.tenantId = t.tenantId) AS users
+                          FROM Tenants t
+                          ORDER BY t.shardName, t.tenantId""")
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision, move and list tenants (see the [tenants] settings in secrets.toml).")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--init-directory", action="store_true", help="Create the directory tables")
+    action.add_argument("--provision", metavar="TENANT", help="Create a tenant database from chitfunddatabase.sql")
+    action.add_argument("--add-user", metavar="EMAIL", help="Give a login email access to --tenant")
+    action.add_argument("--move", metavar="TENANT", help="Move a tenant to the shard given by --to")
+    action.add_argument("--list", action="store_true", help="List tenants and their shards")
+    parser.add_argument("--name", help="Business name of the new tenant (--provision)")
+    parser.add_argument("--shard", help="Shard of the new tenant (--provision)")
+    parser.add_argument("--tenant", help="Tenant of the user (--add-user)")
+    parser.add_argument("--to", help="Target shard (--move)")
+    parser.add_argument("--wait", type=int, default=DIRECTORY_CACHE_SECONDS + 5,
+                        help="Seconds to wait for app processes to see the tenant is read-only (--move)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per INSERT batch (--move)")
+    parser.add_argument("--drop-source", action="store_true", help="Drop the source database after a successful move")
+    args = parser.parse_args()
+
+    import storage
+    import streamlit as st # Only needed to read .streamlit/secrets.toml
+    shards = {name: shard_connect_args(config) for name, config in st.secrets["shards"].items()}
+    directory_conn = storage.mysql_backend_from_secrets(st.secrets, section="tenant_directory").connect()
+    try:
+        if args.init_directory:
+            init_directory(directory_conn)
+            print("Directory tables are ready.")
+        elif args.provision:
+            if not args.name or not args.shard:
+                parser.error("--provision needs --name and --shard")
+            database = provision_tenant(directory_conn, shards, args.provision, args.name, args.shard)
+            print(f"Created {database} on shard '{args.shard}' for tenant '{args.provision}'.")
+        elif args.add_user:
+            if not args.tenant:
+                parser.error("--add-user needs --tenant")
+            add_tenant_user(directory_conn, args.add_user, args.tenant)
+            print(f"{args.add_user} can now open tenant '{args.tenant}'.")
+        elif args.move:
+            if not args.to:
+                parser.error("--move needs --to")
+            copied = move_tenant(directory_conn, shards, args.move, args.to, wait_seconds=args.wait,
+                                 batch_size=args.batch_size, drop_source=args.drop_source)
+            print(f"Moved {sum(copied.values())} rows in {len(copied)} tables.")
+        else:
+            for tenant in list_tenants(directory_conn):
+                print(f"{tenant['tenantId']:<20} {tenant['shardName']:<12} {tenant['databaseName']:<28} "
+                      f"{tenant['status']:<8} {tenant['users']:>4} users  {tenant['name']}")
+    except (Error, ValueError) as e:
+        print(f"Failed: {e}")
+    finally:
+        directory_conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Shared fixtures. The tests run against SQLite files, so they need no MySQL server:
+    cd foremenapp && python -m pytest -q
+"""
+
+import datetime
+import os
+import sys
+import uuid
+from decimal import Decimal
+
+import pytest
+
+# The app modules are flat files in foremenapp/ (import storage, import sync, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+from dates import add_months  # noqa: E402
+
+
+@pytest.fixture
+def central(tmp_path):
+    """A SQLite database standing in for the central MySQL database."""
+    backend = storage.SQLiteBackend(str(tmp_path / "central.db"), track_changes=False)
+    conn = backend.connect()
+    yield backend, conn
+    conn.close()
+
+
+@pytest.fixture
+def branch(tmp_path):
+    """A branch database that logs its changes for sync.py."""
+    backend = storage.SQLiteBackend(str(tmp_path / "branch.db"))
+    conn = backend.connect()
+    yield backend, conn
+    conn.close()
+
+
+@pytest.fixture
+def make_group():
+    """
+    Returns a function creating a chit group with its subscribers, enrollments and installments.
+    The first paid_months installments are paid in full by every member and completed.
+    """
+    def make(conn, name="Test Group", members=3, duration=3, value=Decimal("30000.00"),
+             start=datetime.date(2024, 1, 5), paid_months=0, active=True):
+        share = (value / duration).quantize(Decimal("0.01"))
+        cursor = conn.cursor()
+        subscribers = [uuid.uuid4().bytes for _ in range(members)]
+        for number, subscriber_id in enumerate(subscribers, start=1):
+            cursor.execute("INSERT INTO Subscribers (id, name, phoneNumber, address, createdDate) VALUES (%s, %s, %s, %s, %s)",
+                           (subscriber_id, f"{name} member {number}", f"{abs(hash((name, number))) % 10**10:010d}",
+                            "", datetime.datetime(2024, 1, 1)))
+        group_id = uuid.uuid4().bytes
+        cursor.execute("""INSERT INTO ChitGroups (id, name, value, numberOfSubscribers, duration, startDate,
+                          foremanCommissionPercentage, isActive) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                       (group_id, name, value, members, duration, start, 5.0, active))
+        enrollments = [uuid.uuid4().bytes for _ in range(members)]
+        for number, (enrollment_id, subscriber_id) in enumerate(zip(enrollments, subscribers), start=1):
+            cursor.execute("""INSERT INTO Enrollments (id, subscriberId, groupId, assignedChitNumber, joinDate)
+                              VALUES (%s, %s, %s, %s, %s)""", (enrollment_id, subscriber_id, group_id, number, start))
+        installments = [uuid.uuid4().bytes for _ in range(duration)]
+        payments = []
+        for month, installment_id in enumerate(installments, start=1):
+            paid = month <= paid_months
+            cursor.execute("""INSERT INTO Installments (id, groupId, monthNumber, dueDate, isAuctionConducted,
+                              auctionPrizeAmount, auctionWinnerId, isCompleted) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+                           (installment_id, group_id, month, add_months(start, month - 1), paid,
+                            value * Decimal("0.9") if paid else None, subscribers[month - 1] if paid else None, paid))
+            if paid:
+                for subscriber_id in subscribers:
+                    payment_id = uuid.uuid4().bytes
+                    cursor.execute("""INSERT INTO InstallmentPayments (id, installmentId, subscriberId, paymentDate, amountPaid, notes)
+                                      VALUES (%s, %s, %s, %s, %s, %s)""",
+                                   (payment_id, installment_id, subscriber_id,
+                                    datetime.datetime.combine(add_months(start, month - 1), datetime.time(10)), share, None))
+                    payments.append(payment_id)
+        cursor.close()
+        conn.commit()
+        return {"group": group_id, "subscribers": subscribers, "enrollments": enrollments,
+                "installments": installments, "payments": payments, "share": share}
+    return make
+
+
+def count(conn, table, where="", params=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {table} {where}", params)
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+@pytest.fixture
+def rows():
+    """Returns a function counting rows: rows(conn, table, where="", params=())."""
+    return count
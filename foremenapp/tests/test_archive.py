@@ -0,0 +1,67 @@
+import pytest
+
+import archive
+from transactions import UnitOfWork
+
+
+def snapshot(conn, table, columns):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT {columns} FROM {table} ORDER BY id")
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def test_archive_and_restore_round_trip(central, make_group, rows):
+    _, conn = central
+    done = make_group(conn, name="Done", paid_months=3)
+    open_group = make_group(conn, name="Open", paid_months=1)
+    installments = snapshot(conn, "Installments", archive.INSTALLMENT_COLUMNS)
+    payments = snapshot(conn, "InstallmentPayments", archive.PAYMENT_COLUMNS)
+
+    results = archive.archive_completed_groups(conn)
+
+    assert results == [("Done", done["group"], 9)]
+    assert rows(conn, "Installments", "WHERE groupId = %s", (done["group"],)) == 0
+    assert rows(conn, "Installments", "WHERE groupId = %s", (open_group["group"],)) == 3
+    assert rows(conn, "ArchivedInstallments") == 3
+    assert rows(conn, "ArchivedInstallmentPayments") == 9
+    cursor = conn.cursor()
+    assert archive.is_group_archived(cursor, done["group"])
+    cursor.execute("SELECT installmentsPaid, totalPaid, auctionsWon FROM EnrollmentSummaries ORDER BY assignedChitNumber")
+    assert cursor.fetchall() == [(3, done["share"] * 3, 1)] * 3
+    cursor.close()
+
+    with UnitOfWork(conn) as uow:
+        uow.add(archive.write_restore_group, done["group"])
+
+    assert uow.results == [9]
+    assert snapshot(conn, "Installments", archive.INSTALLMENT_COLUMNS) == installments
+    assert snapshot(conn, "InstallmentPayments", archive.PAYMENT_COLUMNS) == payments
+    for table in ("ArchivedGroups", "ArchivedInstallments", "ArchivedInstallmentPayments", "EnrollmentSummaries"):
+        assert rows(conn, table) == 0
+
+
+def test_archive_skips_reopened_groups(central, make_group, rows):
+    _, conn = central
+    done = make_group(conn, paid_months=3)
+    cursor = conn.cursor()
+    cursor.execute("UPDATE Installments SET isCompleted = 0 WHERE groupId = %s AND monthNumber = 3", (done["group"],))
+    cursor.close()
+
+    with UnitOfWork(conn) as uow:
+        uow.add(archive.write_archive_group, done["group"])
+
+    assert uow.results == [None]
+    assert rows(conn, "ArchivedInstallments") == 0
+
+
+def test_archive_refuses_to_run_on_a_branch_database(branch, make_group, rows):
+    _, conn = branch
+    make_group(conn, paid_months=3)
+
+    with pytest.raises(ValueError):
+        archive.archive_completed_groups(conn)
+    assert rows(conn, "ArchivedInstallments") == 0
+    assert rows(conn, "Installments") == 3
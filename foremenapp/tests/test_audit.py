@@ -0,0 +1,90 @@
+import gc
+import weakref
+
+import audit
+import storage
+
+
+def audit_rows(backend):
+    conn = backend.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT action FROM AuditLog ORDER BY id")
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+class MovingTenant:
+    """A tenant whose database moves from one SQLite file to another, read-only in between."""
+
+    def __init__(self, tmp_path):
+        self.backends = {name: storage.SQLiteBackend(str(tmp_path / f"{name}.db"), track_changes=False)
+                         for name in ("node1", "node2")}
+        self.shard = "node1"
+        self.moving = False
+
+    def writable_route(self):
+        return None if self.moving else self.shard
+
+    def connect(self):
+        return self.backends[self.shard].connect()
+
+
+def test_sink_waits_out_a_move_and_follows_the_tenant(tmp_path):
+    tenant = MovingTenant(tmp_path)
+    fallback = audit.FileSink(str(tmp_path / "fallback.log"))
+    buffer = audit.AuditBuffer(audit.DatabaseSink(tenant.connect, tenant.writable_route),
+                               flush_interval=60, fallback=fallback)
+    try:
+        buffer.record("owner", "create", "Subscribers", b"\x01" * 16)
+        assert buffer.flush() == 1
+
+        tenant.moving = True
+        buffer.record("owner", "update", "Subscribers", b"\x01" * 16)
+        assert buffer.flush() == 0
+        assert buffer.pending() == 1 and buffer.fallback_events == 0 and buffer.last_error is None
+
+        tenant.shard, tenant.moving = "node2", False
+        buffer.record("owner", "delete", "Subscribers", b"\x01" * 16)
+        assert buffer.flush() == 2
+    finally:
+        buffer.close()
+
+    assert audit_rows(tenant.backends["node1"]) == ["create"]
+    assert audit_rows(tenant.backends["node2"]) == ["update", "delete"]
+
+
+def test_paused_events_go_to_the_fallback_file_at_shutdown(tmp_path):
+    tenant = MovingTenant(tmp_path)
+    tenant.moving = True
+    path = tmp_path / "fallback.log"
+    buffer = audit.AuditBuffer(audit.DatabaseSink(tenant.connect, tenant.writable_route),
+                               flush_interval=60, fallback=audit.FileSink(str(path)))
+    buffer.record("owner", "create", "Subscribers", b"\x01" * 16)
+
+    buffer.close()
+
+    assert [event[2] for event in audit.read_log_file(str(path))] == ["create"]
+
+
+def test_records_after_close_are_still_written(tmp_path):
+    backend = storage.SQLiteBackend(str(tmp_path / "central.db"), track_changes=False)
+    buffer = audit.AuditBuffer(audit.DatabaseSink(backend.connect), flush_interval=60)
+    buffer.close()
+
+    buffer.record("owner", "create", "Subscribers", b"\x01" * 16)
+
+    assert audit_rows(backend) == ["create"]
+    buffer.sink.close()
+
+
+def test_closed_buffers_are_released(tmp_path):
+    buffer = audit.AuditBuffer(audit.FileSink(str(tmp_path / "audit.log")), flush_interval=60)
+    released = weakref.ref(buffer)
+
+    buffer.close()
+    del buffer
+    gc.collect()
+
+    assert released() is None # Not held by its atexit hook any more
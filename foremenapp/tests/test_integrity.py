@@ -0,0 +1,74 @@
+import datetime
+import uuid
+
+import pytest
+from mysql.connector import Error
+
+import archive
+import integrity
+import storage
+from dates import add_months
+
+
+def duplicate_first_payment(conn, made, payments_table="InstallmentPayments"):
+    cursor = conn.cursor()
+    cursor.execute(f"""INSERT INTO {payments_table} (id, installmentId, subscriberId, paymentDate, amountPaid, notes)
+                       SELECT %s, installmentId, subscriberId, paymentDate, amountPaid, 'again' FROM {payments_table} WHERE id = %s""",
+                   (uuid.uuid4().bytes, made["payments"][0]))
+    conn.commit()
+    cursor.close()
+
+
+def test_add_months_keeps_the_day_or_uses_the_last_day_of_the_month():
+    assert add_months(datetime.date(2024, 1, 5), 1) == datetime.date(2024, 2, 5)
+    assert add_months(datetime.date(2024, 1, 31), 1) == datetime.date(2024, 2, 29)
+    assert add_months(datetime.date(2024, 11, 30), 3) == datetime.date(2025, 2, 28)
+
+
+def test_checks_scan_live_and_archived_groups(central, make_group):
+    backend, conn = central
+    live = make_group(conn, name="Live", paid_months=1)
+    done = make_group(conn, name="Done", paid_months=3)
+    duplicate_first_payment(conn, live)
+    duplicate_first_payment(conn, done)
+    archive.archive_completed_groups(conn)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM ArchivedInstallments WHERE groupId = %s AND monthNumber = 2", (done["group"],))
+    conn.commit()
+    cursor.close()
+
+    violations = integrity.run_checks(backend, processes=2, chunk_size=1)
+
+    found = sorted((v["check"], v["groupId"], v["archived"]) for v in violations)
+    assert found == sorted([
+        ("duplicate_payment", str(uuid.UUID(bytes=live["group"])), False),
+        ("duplicate_payment", str(uuid.UUID(bytes=done["group"])), True),
+        ("month_gap", str(uuid.UUID(bytes=done["group"])), True),
+    ])
+    archived_fixes = [fix for v in violations if v["archived"] for fix in v["fix"]]
+    assert all("ArchivedInstallment" in fix for fix in archived_fixes)
+
+
+
+def test_read_only_checks_leave_the_file_unchanged(central, make_group):
+    backend, conn = central
+    live = make_group(conn, paid_months=1)
+    duplicate_first_payment(conn, live)
+    cursor = conn.cursor()
+    cursor.execute("DROP TRIGGER trg_Subscribers_deleted") # E.g. a file from before DeletedRows
+    cursor.execute("SELECT type, name FROM sqlite_master ORDER BY name")
+    schema = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    read_only = storage.SQLiteBackend(backend.path, mode="ro")
+    violations = integrity.run_checks(read_only, processes=1)
+
+    assert [v["check"] for v in violations] == ["duplicate_payment"]
+    conn = read_only.connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT type, name FROM sqlite_master ORDER BY name")
+    assert cursor.fetchall() == schema
+    with pytest.raises(Error):
+        cursor.execute("DELETE FROM InstallmentPayments")
+    conn.close()
@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+import money
+
+
+@pytest.mark.parametrize("value, paise", [
+    (Decimal("3333.33"), 333333),
+    (0.1 + 0.2, 30),
+    (2.675, 268), # 2.675 is 2.67499999... as a float; its shortest repr rounds half up
+    ("10.005", 1001),
+    (None, 0),
+    (-1.5, -150),
+])
+def test_to_paise_rounds_half_up(value, paise):
+    assert money.to_paise(value) == paise
+
+
+def test_from_paise_and_to_decimal():
+    assert money.from_paise(333333) == Decimal("3333.33")
+    assert money.from_paise(np.int64(5)) == Decimal("0.05")
+    assert str(money.to_decimal(1234.5)) == "1234.50"
+
+
+def test_installment_rounds_like_sql_round():
+    assert money.installment_paise(10000000, 3) == 3333333 # 100000.00 / 3 = 33333.33
+    assert money.installment_paise(200, 3) == 67 # 0.666... rounds up
+    assert money.installment_paise(100, 0) == 0
+
+
+def test_paise_array_is_exact_for_float_and_decimal_rows():
+    amounts = [0.1] * 10 + [Decimal("3333.33"), None, 99999999999.99]
+    assert money.paise_array(amounts).tolist() == [10] * 10 + [333333, 0, 9999999999999]
+
+
+def test_group_totals_are_exact_int64_beyond_float_precision():
+    big = 2 ** 53 # float64 can no longer represent big + 1
+    totals = money.group_totals_paise([0, 0, 1, 2], [big, 1, 7, -3], 4)
+    assert totals.dtype == np.int64
+    assert totals.tolist() == [big + 1, 7, -3, 0]
+
+
+def test_many_small_amounts_sum_exactly():
+    keys = np.arange(1000000) % 3
+    paise = money.paise_array([0.01] * 1000000)
+    totals = money.group_totals_paise(keys, paise, 3)
+    assert [money.from_paise(total) for total in totals] == [Decimal("3333.34"), Decimal("3333.33"), Decimal("3333.33")]
+
+
+def test_dues_never_negative_and_zero_for_zero_duration():
+    dues = money.dues_paise([10000000, 10000000, 500], [3, 3, 0], [2, 1, 1], [3333333, 5000000, 0])
+    assert dues.tolist() == [3333333, 0, 0]
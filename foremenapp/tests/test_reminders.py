@@ -0,0 +1,89 @@
+import datetime
+import uuid
+
+import reminders
+from transactions import UnitOfWork
+
+DUE_SOON = datetime.date(2024, 1, 3) # The first installment of make_group's groups is due on 2024-01-05
+
+
+def statuses(conn):
+    return reminders.outbox_status_counts(conn)
+
+
+def test_enqueue_is_idempotent(central, make_group):
+    _, conn = central
+    make_group(conn, members=3)
+
+    assert reminders.enqueue_reminders(conn, days_ahead=3, today=DUE_SOON) == 3
+    assert reminders.enqueue_reminders(conn, days_ahead=3, today=DUE_SOON) == 0
+    assert statuses(conn) == {reminders.PENDING: 3}
+
+
+def test_dispatch_sends_each_reminder_once_and_cancels_paid(central, make_group):
+    _, conn = central
+    made = make_group(conn, members=3)
+    reminders.enqueue_reminders(conn, days_ahead=3, today=DUE_SOON)
+    cursor = conn.cursor()
+    cursor.execute("""INSERT INTO InstallmentPayments (id, installmentId, subscriberId, paymentDate, amountPaid)
+                      VALUES (%s, %s, %s, %s, %s)""",
+                   (uuid.uuid4().bytes, made["installments"][0], made["subscribers"][0], datetime.datetime(2024, 1, 4), made["share"]))
+    conn.commit()
+    sender = reminders.StubSender()
+
+    totals = reminders.dispatch_reminders(conn, sender, rate=1000)
+    again = reminders.dispatch_reminders(conn, sender, rate=1000)
+
+    assert (totals["sent"], totals["cancelled"]) == (2, 1)
+    assert again["sent"] == 0
+    assert len(sender.sent) == 2
+    assert statuses(conn) == {reminders.SENT: 2, reminders.CANCELLED: 1}
+
+
+def test_two_claims_never_share_a_row(central, make_group):
+    _, conn = central
+    make_group(conn, members=5)
+    reminders.enqueue_reminders(conn, days_ahead=3, today=DUE_SOON)
+    now = datetime.datetime.now()
+
+    with UnitOfWork(conn) as uow:
+        uow.add(reminders.write_claim_batch, b"a" * 16, 3, now)
+        uow.add(reminders.write_claim_batch, b"b" * 16, 3, now)
+
+    assert uow.results == [3, 2]
+    first = {row["id"] for row in reminders.fetch_claimed(conn, b"a" * 16)}
+    second = {row["id"] for row in reminders.fetch_claimed(conn, b"b" * 16)}
+    assert len(first) == 3 and len(second) == 2 and not first & second
+
+
+def test_failed_sends_are_retried_later(central, make_group):
+    _, conn = central
+    make_group(conn, members=2)
+    reminders.enqueue_reminders(conn, days_ahead=3, today=DUE_SOON)
+
+    totals = reminders.dispatch_reminders(conn, reminders.StubSender(failure_rate=1.0), rate=1000, max_attempts=2)
+
+    assert totals["retried"] == 2
+    assert statuses(conn) == {reminders.PENDING: 2} # Not due again until the retry delay has passed
+    assert reminders.dispatch_reminders(conn, reminders.StubSender(), rate=1000)["sent"] == 0
+
+
+def test_stale_claims_are_released_at_the_start_of_a_dispatch(central, make_group):
+    _, conn = central
+    make_group(conn, members=3)
+    reminders.enqueue_reminders(conn, days_ahead=3, today=DUE_SOON)
+    # A dispatcher claimed two rows an hour ago and died; another claimed one just now
+    with UnitOfWork(conn) as uow:
+        uow.add(reminders.write_claim_batch, b"dead" * 4, 2, datetime.datetime.now())
+        uow.add(reminders.write_claim_batch, b"live" * 4, 1, datetime.datetime.now())
+    cursor = conn.cursor()
+    cursor.execute("UPDATE ReminderOutbox SET nextAttemptAt = %s WHERE claimToken = %s",
+                   (datetime.datetime.now() - datetime.timedelta(hours=1), b"dead" * 4))
+    conn.commit()
+    sender = reminders.StubSender()
+
+    totals = reminders.dispatch_reminders(conn, sender, rate=1000, claim_timeout=600)
+
+    assert totals["released"] == 2
+    assert totals["sent"] == 2
+    assert statuses(conn) == {reminders.SENT: 2, reminders.SENDING: 1}
@@ -0,0 +1,121 @@
+import datetime
+import re
+import threading
+import time
+import uuid
+
+import pytest
+from mysql.connector.cursor import RE_SQL_FIND_PARAM
+
+import counters
+import statements
+from transactions import UnitOfWork
+
+
+@pytest.mark.parametrize("name", sorted(statements.SQL))
+def test_every_placeholder_survives_the_prepared_rewrite(name):
+    # MySQLCursorPrepared turns %s into ? with this pattern, which treats quotes anywhere in
+    # the text (comments included) as string literals: an odd quote hides the rest of the statement
+    query = statements.SQL[name].encode()
+    rewritten = re.sub(RE_SQL_FIND_PARAM, b"?", query)
+    assert b"%s" not in rewritten
+    assert rewritten.count(b"?") == query.count(b"%s")
+
+
+def pay(conn, installment_id, subscriber_id, amount, now):
+    """Commits one payment the way the app does; returns refreshedAt as read before it."""
+    refreshed_at = counters.read_refreshed_at(conn)
+    with UnitOfWork(conn) as uow:
+        uow.add(lambda cursor: cursor.execute(
+            statements.SQL["insert_payment"], (uuid.uuid4().bytes, installment_id, subscriber_id, now, amount, "")))
+    return refreshed_at
+
+
+def test_payment_counters_match_a_full_refresh(central, make_group):
+    _, conn = central
+    made = make_group(conn, members=3, duration=3) # Installments due in 2024, so all overdue
+    now = datetime.datetime.now()
+    with UnitOfWork(conn) as uow:
+        uow.add(counters.write_refresh_counters, now)
+
+    payments = [(made["installments"][0], made["subscribers"][0]), (made["installments"][0], made["subscribers"][0]),
+                (made["installments"][1], made["subscribers"][1])]
+    for installment_id, subscriber_id in payments:
+        refreshed_at = pay(conn, installment_id, subscriber_id, made["share"], now)
+        # The counters follow in their own transaction, after the payment committed
+        with UnitOfWork(conn) as uow:
+            uow.add(counters.write_payment_counters, installment_id, subscriber_id, made["share"], refreshed_at, now)
+        assert uow.results == [True]
+    incremental = counters.current_figures(counters.read_counters(conn), now)
+
+    with UnitOfWork(conn) as uow:
+        uow.add(counters.write_refresh_counters, now)
+    refreshed = counters.current_figures(counters.read_counters(conn), now)
+
+    assert incremental["paymentsToday"] == 3
+    assert incremental["collectedToday"] == made["share"] * 3
+    # A second payment of the same installment by the same member does not reduce the overdue amount again
+    assert incremental["overdueAmount"] == made["share"] * (9 - 2)
+    for key in ("collectedToday", "paymentsToday", "collectedMonth", "paymentsThisHour", "overdueAmount"):
+        assert incremental[key] == refreshed[key], key
+
+
+def test_payment_counted_by_a_refresh_is_not_added_again(central, make_group):
+    _, conn = central
+    made = make_group(conn)
+    now = datetime.datetime.now()
+    with UnitOfWork(conn) as uow:
+        uow.add(counters.write_refresh_counters, now - datetime.timedelta(minutes=1))
+
+    refreshed_at = pay(conn, made["installments"][0], made["subscribers"][0], made["share"], now)
+    # A refresh gets the row lock between the payment's commit and its counter update
+    with UnitOfWork(conn) as uow:
+        uow.add(counters.write_refresh_counters, now)
+    with UnitOfWork(conn) as uow:
+        uow.add(counters.write_payment_counters, made["installments"][0], made["subscribers"][0], made["share"],
+                refreshed_at, now)
+
+    assert uow.results == [False]
+    figures = counters.current_figures(counters.read_counters(conn), now)
+    assert figures["paymentsToday"] == 1
+    assert figures["collectedToday"] == made["share"]
+
+
+class SlowPreparedCursor:
+    """Stands in for a prepared cursor: the rows of the last execute, read back after a pause."""
+
+    column_names = ("id",)
+
+    def execute(self, query, params):
+        self.params = params
+
+    def fetchall(self):
+        time.sleep(0.001) # Another session's execute would land here without the connection lock
+        return [(self.params[0],)]
+
+
+class SharedConnection:
+    def __init__(self):
+        self.shared = SlowPreparedCursor() # One prepared cursor per statement, as on MySQL
+
+    def cursor(self, prepared=False):
+        return self.shared
+
+
+def test_sessions_sharing_a_connection_get_their_own_rows():
+    registry = statements.StatementRegistry()
+    conn = SharedConnection()
+    wrong = []
+
+    def clerk(number):
+        for _ in range(50):
+            if registry.fetchall(conn, "installments_for_group", (number,)) != [(number,)]:
+                wrong.append(number)
+
+    clerks = [threading.Thread(target=clerk, args=(number,)) for number in range(4)]
+    for thread in clerks:
+        thread.start()
+    for thread in clerks:
+        thread.join()
+
+    assert wrong == []
@@ -0,0 +1,164 @@
+import datetime
+import uuid
+
+import archive
+import storage
+import sync
+from transactions import UnitOfWork
+
+
+def test_push_sends_branch_rows_and_empties_log(branch, central, make_group, rows):
+    branch_backend, branch_conn = branch
+    central_backend, central_conn = central
+    made = make_group(branch_conn, paid_months=2)
+
+    result = sync.run_sync(branch_backend, central_backend)
+
+    assert result["conflicts"] == []
+    assert result["pushed"] == 3 + 1 + 3 + 3 + 6
+    assert rows(central_conn, "InstallmentPayments") == len(made["payments"])
+    assert rows(branch_conn, "SyncLog") == 0
+
+
+def test_pull_applies_central_rows_without_logging_them(branch, central, make_group, rows):
+    branch_backend, branch_conn = branch
+    central_backend, central_conn = central
+    make_group(central_conn, paid_months=1)
+
+    result = sync.run_sync(branch_backend, central_backend)
+
+    assert result["pulled"] == 3 + 1 + 3 + 3 + 3
+    assert rows(branch_conn, "Installments") == 3
+    assert rows(branch_conn, "SyncLog") == 0
+    # Nothing new: the overlap re-reads recent rows but nothing is pushed back
+    again = sync.run_sync(branch_backend, central_backend)
+    assert again["pushed"] == 0 and again["removed"] == 0
+
+
+def test_central_deletes_are_pulled_with_cascades(branch, central, make_group, rows):
+    branch_backend, branch_conn = branch
+    central_backend, central_conn = central
+    kept = make_group(central_conn, name="Kept", paid_months=1)
+    gone = make_group(central_conn, name="Gone", paid_months=1)
+    sync.run_sync(branch_backend, central_backend)
+    assert rows(branch_conn, "ChitGroups") == 2
+
+    cursor = central_conn.cursor()
+    cursor.execute("DELETE FROM ChitGroups WHERE id = %s", (gone["group"],))
+    cursor.execute("DELETE FROM InstallmentPayments WHERE id = %s", (kept["payments"][0],))
+    central_conn.commit()
+
+    result = sync.run_sync(branch_backend, central_backend)
+
+    # The group, its enrollments, installments and payments, and the single payment
+    assert result["removed"] == 1 + 3 + 3 + 3 + 1
+    assert rows(branch_conn, "ChitGroups") == 1
+    assert rows(branch_conn, "Installments", "WHERE groupId = %s", (gone["group"],)) == 0
+    assert rows(branch_conn, "InstallmentPayments") == 2
+    assert rows(branch_conn, "SyncLog") == 0
+
+
+def test_central_delete_wins_over_pending_local_edit(branch, central, make_group, rows):
+    branch_backend, branch_conn = branch
+    central_backend, central_conn = central
+    made = make_group(central_conn)
+    sync.run_sync(branch_backend, central_backend)
+
+    cursor = branch_conn.cursor()
+    cursor.execute("UPDATE Subscribers SET address = 'Edited at branch' WHERE id = %s", (made["subscribers"][0],))
+    branch_conn.commit()
+    cursor = central_conn.cursor()
+    cursor.execute("DELETE FROM Subscribers WHERE id = %s", (made["subscribers"][0],))
+    central_conn.commit()
+
+    sync.pull_deletes(branch_conn, central_conn)
+
+    assert rows(branch_conn, "Subscribers", "WHERE id = %s", (made["subscribers"][0],)) == 0
+    assert rows(branch_conn, "SyncLog") == 0
+
+
+def test_archived_groups_reach_the_branch_so_installments_are_not_regenerated(branch, central, make_group, rows):
+    branch_backend, branch_conn = branch
+    central_backend, central_conn = central
+    done = make_group(central_conn, paid_months=3)
+    sync.run_sync(branch_backend, central_backend)
+
+    archive.archive_completed_groups(central_conn)
+    sync.run_sync(branch_backend, central_backend)
+
+    # The installments arrive as deletes; the ArchivedGroups row is what write_installments checks
+    assert rows(branch_conn, "Installments", "WHERE groupId = %s", (done["group"],)) == 0
+    cursor = branch_conn.cursor()
+    assert archive.is_group_archived(cursor, done["group"])
+    cursor.close()
+
+    with UnitOfWork(central_conn) as uow:
+        uow.add(archive.write_restore_group, done["group"])
+    sync.run_sync(branch_backend, central_backend)
+
+    assert rows(branch_conn, "ArchivedGroups") == 0
+    assert rows(branch_conn, "Installments", "WHERE groupId = %s", (done["group"],)) == 3
+
+
+def test_branch_deletes_are_pushed(branch, central, make_group, rows):
+    branch_backend, branch_conn = branch
+    central_backend, central_conn = central
+    made = make_group(branch_conn, paid_months=1)
+    sync.run_sync(branch_backend, central_backend)
+
+    cursor = branch_conn.cursor()
+    cursor.execute("DELETE FROM InstallmentPayments WHERE id = %s", (made["payments"][0],))
+    branch_conn.commit()
+    result = sync.run_sync(branch_backend, central_backend)
+
+    assert result["deleted"] == 1
+    assert rows(central_conn, "InstallmentPayments") == len(made["payments"]) - 1
+    assert rows(branch_conn, "InstallmentPayments") == len(made["payments"]) - 1
+
+
+def test_pending_local_edits_are_not_overwritten_by_pull(branch, central, make_group, rows):
+    branch_backend, branch_conn = branch
+    central_backend, central_conn = central
+    made = make_group(central_conn)
+    sync.run_sync(branch_backend, central_backend)
+
+    cursor = branch_conn.cursor()
+    cursor.execute("UPDATE Subscribers SET address = 'Branch' WHERE id = %s", (made["subscribers"][0],))
+    branch_conn.commit()
+    cursor = central_conn.cursor()
+    cursor.execute("UPDATE Subscribers SET address = 'Central' WHERE id = %s", (made["subscribers"][0],))
+    central_conn.commit()
+
+    result = sync.pull_changes(branch_conn, central_conn)
+
+    assert result["skipped"] == 1
+    cursor = branch_conn.cursor()
+    cursor.execute("SELECT address FROM Subscribers WHERE id = %s", (made["subscribers"][0],))
+    assert cursor.fetchone()[0] == "Branch"
+
+
+def test_unique_key_clash_is_a_conflict_not_an_overwrite(branch, central, rows):
+    branch_backend, branch_conn = branch
+    central_backend, central_conn = central
+    central_id, branch_id = uuid.uuid4().bytes, uuid.uuid4().bytes
+    for conn, row_id, name in ((central_conn, central_id, "Central"), (branch_conn, branch_id, "Branch")):
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO Subscribers (id, name, phoneNumber, address, createdDate) VALUES (%s, %s, %s, %s, %s)",
+                       (row_id, name, "9876543210", "", datetime.datetime(2024, 1, 1)))
+        conn.commit()
+
+    result = sync.push_changes(branch_conn, central_conn)
+
+    assert [conflict["id"] for conflict in result["conflicts"]] == [branch_id]
+    cursor = central_conn.cursor()
+    cursor.execute("SELECT id, name FROM Subscribers")
+    assert [(bytes(row_id), name) for row_id, name in cursor.fetchall()] == [(central_id, "Central")]
+    assert rows(branch_conn, "SyncLog", "WHERE rowId = %s", (branch_id,)) == 1
+
+
+def test_write_sql_is_id_only_on_every_dialect():
+    # MySQL's ON DUPLICATE KEY UPDATE would match any unique key and overwrite a different row
+    for table in storage.SYNC_TABLE_ORDER:
+        update, insert = sync._write_sql(table)
+        assert update.endswith("WHERE id = %s")
+        assert "DUPLICATE" not in insert and "CONFLICT" not in insert
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+from mysql.connector import errors
+
+import tenants
+
+
+class FakePool:
+    """Stands in for a MySQLConnectionPool: close() on a handed out connection returns it."""
+
+    def __init__(self, size):
+        self.free = [FakeConnection(self, n) for n in range(size)]
+
+    def get_connection(self):
+        if not self.free:
+            raise errors.PoolError("Failed getting connection; pool exhausted")
+        return self.free.pop()
+
+
+class FakeConnection:
+    def __init__(self, pool, number):
+        self.pool = pool
+        self.number = number
+
+    def close(self):
+        self.pool.free.append(self)
+
+
+def router_with_pool(size):
+    router = tenants.TenantRouter(None, {"node1": {}}, pool_size=size)
+    router._pools["node1"] = FakePool(size)
+    return router
+
+
+def test_default_pool_has_room_beyond_the_cached_connections():
+    assert tenants.DEFAULT_POOL_SIZE == tenants.MAX_POOL_SIZE == 32
+    assert tenants.DEFAULT_POOL_SIZE > 20 # MAX_CACHED_TENANT_CONNECTIONS in foremenapp2.py
+
+
+def test_connect_waits_for_a_retired_connection(monkeypatch):
+    monkeypatch.setattr(tenants, "RETIRE_GRACE_SECONDS", 0.2)
+    router = router_with_pool(1)
+    first = router._get_connection("node1")
+    router.retire(first)
+
+    started = time.monotonic()
+    again = router._get_connection("node1")
+
+    assert again is first
+    assert 0.1 < time.monotonic() - started < 2
+
+
+def test_connect_gives_up_after_the_wait(monkeypatch):
+    monkeypatch.setattr(tenants, "POOL_WAIT_SECONDS", 0.2)
+    router = router_with_pool(1)
+    router._get_connection("node1")
+
+    with pytest.raises(errors.PoolError):
+        router._get_connection("node1")
+
+
+def test_schema_statements_include_the_deletion_triggers():
+    statements = tenants.schema_statements()
+    assert "DeletedRows" in tenants.schema_tables(statements)
+    assert sum(statement.startswith("CREATE TRIGGER") for statement in statements) == 5
+
+
+SECRETS = {
+    "tenants": {},
+    "tenant_directory": {"host": "directory", "database": "foremen_directory", "user": "u", "password": "p"},
+    "shards": {"node1": {"host": "mysql-node1", "user": "u", "password": "p"},
+               "node2": {"host": "mysql-node2", "port": 3307, "user": "u", "password": "p"}},
+}
+
+
+def test_tools_reach_the_tenant_database(monkeypatch):
+    routes = {"acme": tenants.Route("acme", "Acme Chits", "node2", "foremen_acme", False),
+              "moving": tenants.Route("moving", "Moving Chits", "node1", "foremen_moving", True)}
+    monkeypatch.setattr(tenants.TenantRouter, "route", lambda router, tenant_id: routes.get(tenant_id))
+
+    backend = tenants.tenant_backend_from_secrets(SECRETS, "acme")
+
+    assert backend.dialect == "mysql"
+    assert backend.connect_args["host"] == "mysql-node2"
+    assert backend.connect_args["port"] == 3307
+    assert backend.connect_args["database"] == "foremen_acme"
+    for tenant_id in ("moving", "unknown"):
+        with pytest.raises(errors.Error):
+            tenants.tenant_backend_from_secrets(SECRETS, tenant_id)
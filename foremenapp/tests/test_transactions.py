@@ -0,0 +1,96 @@
+import datetime
+import uuid
+
+import pytest
+from mysql.connector import errors
+
+import transactions
+
+
+def write_subscriber(cursor, name, phone):
+    subscriber_id = uuid.uuid4().bytes
+    cursor.execute("INSERT INTO Subscribers (id, name, phoneNumber, address, createdDate) VALUES (%s, %s, %s, %s, %s)",
+                   (subscriber_id, name, phone, "", datetime.datetime(2024, 1, 1)))
+    return subscriber_id
+
+
+def fail_first(errno, failures=1):
+    """A write operation raising a MySQL error with errno on its first calls."""
+    calls = []
+
+    def write(cursor):
+        calls.append(1)
+        if len(calls) <= failures:
+            raise errors.DatabaseError(msg="simulated", errno=errno)
+        return len(calls)
+    return write, calls
+
+
+def test_unit_of_work_commits_all_operations_once(central, rows):
+    _, conn = central
+    metrics = transactions.TransactionMetrics()
+    with transactions.UnitOfWork(conn, metrics=metrics) as uow:
+        uow.add(write_subscriber, "A", "1000000001")
+        uow.add(write_subscriber, "B", "1000000002")
+
+    assert len(uow.results) == 2
+    assert rows(conn, "Subscribers") == 2
+    assert metrics.snapshot()["commits"] == 1 and metrics.snapshot()["statements"] == 2
+
+
+@pytest.mark.parametrize("errno", [1213, 1205])
+def test_deadlocks_and_lock_timeouts_replay_the_whole_transaction(central, rows, errno):
+    _, conn = central
+    metrics = transactions.TransactionMetrics()
+    flaky, calls = fail_first(errno, failures=2)
+    with transactions.UnitOfWork(conn, metrics=metrics, base_delay=0) as uow:
+        uow.add(write_subscriber, "A", "1000000001")
+        uow.add(flaky)
+
+    # The first write was rolled back and replayed with the rest, so it exists once
+    assert rows(conn, "Subscribers") == 1
+    assert len(calls) == 3
+    assert metrics.snapshot()["retries_by_errno"] == {errno: 2}
+
+
+def test_retries_give_up_after_max_attempts(central, rows):
+    _, conn = central
+    metrics = transactions.TransactionMetrics()
+    flaky, calls = fail_first(1213, failures=10)
+    with pytest.raises(errors.DatabaseError):
+        with transactions.UnitOfWork(conn, metrics=metrics, base_delay=0, max_attempts=3) as uow:
+            uow.add(write_subscriber, "A", "1000000001")
+            uow.add(flaky)
+
+    assert len(calls) == 3
+    assert rows(conn, "Subscribers") == 0
+    assert metrics.snapshot()["failures"] == 1
+
+
+def test_other_errors_are_not_retried(central, rows):
+    _, conn = central
+    flaky, calls = fail_first(1062)
+    with pytest.raises(errors.DatabaseError):
+        with transactions.UnitOfWork(conn, base_delay=0) as uow:
+            uow.add(write_subscriber, "A", "1000000001")
+            uow.add(flaky)
+
+    assert len(calls) == 1
+    assert rows(conn, "Subscribers") == 0
+
+
+@pytest.mark.parametrize("exception", [ValueError, KeyboardInterrupt])
+def test_any_exception_rolls_back(central, rows, exception):
+    _, conn = central
+
+    def broken(cursor):
+        raise exception("not a database error")
+
+    with pytest.raises(exception):
+        with transactions.UnitOfWork(conn) as uow:
+            uow.add(write_subscriber, "A", "1000000001")
+            uow.add(broken)
+
+    # Nothing is left open on the shared connection: a later commit does not write the first row
+    conn.commit()
+    assert rows(conn, "Subscribers") == 0
@@ -0,0 +1,154 @@
+"""
+Transaction handling for Foremen Choice Digital Records Manager.
+
+Every write runs through run_transaction(), which commits once and automatically
+retries the whole transaction (with exponential backoff and jitter) when MySQL reports
+a transient error: a deadlock (1213) or a lock wait timeout (1205).
+
+Several writes can be grouped into ONE transaction (one commit, one fsync) with a UnitOfWork:
+
+    with UnitOfWork(conn) as uow:
+        uow.add(write_payment, installment_id, subscriber_a, 500.0, "")
+        uow.add(write_payment, installment_id, subscriber_b, 500.0, "")
+    # Both payments are committed together here, or neither is.
+
+Write operations are functions taking a cursor as their first argument. They are queued,
+not run, by add(), so the whole batch can be replayed if the transaction has to be retried.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+from mysql.connector import Error
+
+# MySQL errors worth retrying: the transaction was rolled back (or never got its locks)
+# through no fault of its own, and running it again usually succeeds.
+RETRYABLE_ERRNOS = {
+    1213, # ER_LOCK_DEADLOCK
+    1205, # ER_LOCK_WAIT_TIMEOUT
+}
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.05 # Seconds before the first retry, doubled for every further attempt
+DEFAULT_MAX_DELAY = 1.0
+
+
+class TransactionMetrics:
+    """Thread-safe counters for transactions, retries and commit latency (shared by all sessions)."""
+
+    def __init__(self, latency_samples=1000):
+        self._lock = threading.Lock()
+        self.commits = 0 # Transactions committed
+        self.statements = 0 # Write operations committed (more than commits when batching)
+        self.retries = 0 # Attempts repeated after a retryable error
+        self.failures = 0 # Transactions that gave up (non-retryable error or out of attempts)
+        self.retries_by_errno = {}
+        self._commit_latencies = deque(maxlen=latency_samples) # Seconds, most recent commits only
+
+    def record_commit(self, operations, seconds):
+        with self._lock:
+            self.commits += 1
+            self.statements += operations
+            self._commit_latencies.append(seconds)
+
+    def record_retry(self, errno):
+        with self._lock:
+            self.retries += 1
+            self.retries_by_errno[errno] = self.retries_by_errno.get(errno, 0) + 1
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self):
+        """Returns the current metrics as a dict (commit latencies in milliseconds)."""
+        with self._lock:
+            latencies = sorted(self._commit_latencies)
+            result = {
+                "commits": self.commits,
+                "statements": self.statements,
+                "retries": self.retries,
+                "failures": self.failures,
+                "retries_by_errno": dict(self.retries_by_errno),
+            }
+        for name, pct in (("commit_p50_ms", 0.50), ("commit_p95_ms", 0.95), ("commit_p99_ms", 0.99)):
+            result[name] = round(latencies[min(len(latencies) - 1, int(pct * len(latencies)))] * 1000, 2) if latencies else None
+        return result
+
+
+METRICS = TransactionMetrics() # Process-wide metrics used unless a caller passes its own
+
+
+def _backoff_delay(attempt, base_delay, max_delay):
+    """Exponential backoff with full jitter, so retrying sessions don't collide again."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def run_transaction(conn, operations, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                    max_delay=DEFAULT_MAX_DELAY, metrics=METRICS, cursor_factory=None):
+    """
+    Runs a list of (function, args, kwargs) write operations in a single transaction and commits once.
+    Each function is called as function(cursor, *args, **kwargs).
+    Retries the whole list on deadlocks/lock wait timeouts; any other error or exception
+    (including KeyboardInterrupt) is rolled back and raised.
+    Returns the list of values returned by the operations.
+
+    cursor_factory supplies the cursor instead of conn.cursor(), e.g. a prepared cursor from
+    statements.REGISTRY. Such cursors belong to the caller and are not closed here.
+    """
+    attempt = 1
+    while True:
+        cursor = cursor_factory() if cursor_factory else conn.cursor()
+        try:
+            results = [function(cursor, *args, **kwargs) for function, args, kwargs in operations]
+            started = time.perf_counter()
+            conn.commit()
+            metrics.record_commit(len(operations), time.perf_counter() - started)
+            return results
+        except BaseException as e:
+            # Never leave a half-done transaction open on a shared connection
+            conn.rollback()
+            errno = e.errno if isinstance(e, Error) else None
+            if errno in RETRYABLE_ERRNOS and attempt < max_attempts:
+                metrics.record_retry(errno)
+                time.sleep(_backoff_delay(attempt, base_delay, max_delay))
+                attempt += 1
+                continue
+            metrics.record_failure()
+            raise
+        finally:
+            if cursor_factory is None:
+                cursor.close()
+
+
+class UnitOfWork:
+    """Collects write operations and runs them as one retried transaction when the with-block ends."""
+
+    def __init__(self, conn, **retry_options):
+        self.conn = conn
+        self.retry_options = retry_options # max_attempts, base_delay, max_delay, metrics, cursor_factory
+        self.operations = []
+        self.results = None # Return values of the operations, set after a successful commit
+
+    def add(self, function, *args, **kwargs):
+        """Queues function(cursor, *args, **kwargs) to run inside the transaction."""
+        self.operations.append((function, args, kwargs))
+
+    def commit(self):
+        """Runs and commits all queued operations now. Called automatically at the end of the with-block."""
+        operations, self.operations = self.operations, []
+        if operations:
+            self.results = run_transaction(self.conn, operations, **self.retry_options)
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.operations = [] # The block failed before committing, nothing has been written
+        return False